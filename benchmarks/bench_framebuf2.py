@@ -0,0 +1,328 @@
+# this code is distributed under the MIT licence.
+
+"""
+Benchmarks for the framebuf2 drawing methods.
+
+Each case is timed on a FrameBuffer of the class under test and then run once
+more on an instrumented subclass to count the primitive (pixel, hline, vline,
+fill_rect, line and blit) calls it makes.  Allocations are measured with
+tracemalloc on CPython, or gc.mem_alloc() on MicroPython.
+
+Usage:
+    python benchmarks/bench_framebuf2.py run [--quick] [--output results.json]
+        [--fbclass framebuf2:FrameBuffer] [--min-time 0.05]
+    python benchmarks/bench_framebuf2.py compare old.json new.json [--threshold 0.1]
+
+compare exits with status 1 if any case got slower by more than the threshold,
+made more primitive calls, or allocated more memory.
+"""
+
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+
+try:
+    from time import perf_counter_ns
+
+    def _now_us():
+        return perf_counter_ns() // 1000
+
+except ImportError:
+    from time import ticks_us as _now_us
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+    import gc
+
+PRIMITIVES = ("pixel", "hline", "vline", "fill_rect", "line", "blit")
+
+FORMATS = {
+    "MONO_VLSB": framebuf2.MONO_VLSB,
+    "MONO_HLSB": framebuf2.MONO_HLSB,
+    "MONO_HMSB": framebuf2.MONO_HMSB,
+    "RGB565": framebuf2.RGB565,
+    "GS2_HMSB": framebuf2.GS2_HMSB,
+    "GS4_HMSB": framebuf2.GS4_HMSB,
+    "GS8": framebuf2.GS8,
+}
+
+WIDTH = 128
+HEIGHT = 128
+
+TEXT = "12:34"
+WRAP_TEXT = "The quick brown fox jumps over the lazy dog while the display refreshes."
+
+TRIANGLES = {
+    "flat": (0, 100, 127, 100, 64, 127),
+    "tall": (60, 0, 70, 127, 20, 64),
+    "wide": (0, 0, 127, 64, 0, 127),
+}
+
+POLYGONS = {
+    "arrow": (0, 40, 80, 40, 80, 10, 127, 64, 80, 117, 80, 88, 0, 88),
+    "star": (64, 0, 101, 115, 3, 44, 125, 44, 27, 115),
+    "octagon": (40, 4, 88, 4, 124, 40, 124, 88, 88, 124, 40, 124, 4, 88, 4, 40),
+}
+
+
+def counting_class(cls):
+    """
+    Returns a subclass of the frame buffer class cls that counts its primitive calls.
+    """
+
+    class CountingFrameBuffer(cls):
+        def reset_counts(self):
+            self.counts = {}
+            for name in PRIMITIVES:
+                self.counts[name] = 0
+
+        def pixel(self, *args):
+            self.counts["pixel"] += 1
+            return super().pixel(*args)
+
+        def hline(self, *args):
+            self.counts["hline"] += 1
+            return super().hline(*args)
+
+        def vline(self, *args):
+            self.counts["vline"] += 1
+            return super().vline(*args)
+
+        def fill_rect(self, *args):
+            self.counts["fill_rect"] += 1
+            return super().fill_rect(*args)
+
+        def line(self, *args):
+            self.counts["line"] += 1
+            return super().line(*args)
+
+        def blit(self, *args):
+            self.counts["blit"] += 1
+            return super().blit(*args)
+
+    return CountingFrameBuffer
+
+
+def cases(quick=False):
+    """
+    Yields (name, format name, method name, args) for every benchmark case.
+    """
+    formats = ("MONO_VLSB", "RGB565") if quick else tuple(FORMATS)
+    sizes = (1, 2, 4) if quick else range(1, 9)
+    rotations = (0, 90) if quick else (0, 90, 180, 270)
+    radii = (8, 32) if quick else (4, 8, 16, 32, 63)
+    for fmt in formats:
+        for m in sizes:
+            for r in rotations:
+                name = "large_text/" + fmt + "/m" + str(m) + "/r" + str(r)
+                yield name, fmt, "large_text", (TEXT, 0, 0, m, 1, r)
+        for radius in radii:
+            name = "circle/" + fmt + "/r" + str(radius)
+            yield name, fmt, "circle", (64, 64, radius, 1, True)
+            name = "ring/" + fmt + "/r" + str(radius)
+            yield name, fmt, "ring", (64, 64, radius, 4, 1)
+            name = "arc/" + fmt + "/r" + str(radius)
+            yield name, fmt, "arc", (64, 64, radius, 135, 405, 1, 4)
+        name = "ellipse/" + fmt + "/60x30"
+        yield name, fmt, "ellipse", (64, 64, 60, 30, 1, True)
+        for shape in TRIANGLES:
+            name = "triangle/" + fmt + "/" + shape
+            yield name, fmt, "triangle", TRIANGLES[shape] + (1, True)
+        for shape in POLYGONS:
+            name = "polygon/" + fmt + "/" + shape
+            yield name, fmt, "polygon", (POLYGONS[shape], 1, True)
+        for m in (1, 2):
+            name = "large_text_wrap/" + fmt + "/m" + str(m)
+            yield name, fmt, "large_text_wrap", (WRAP_TEXT, 0, 0, m, 1, WIDTH)
+        name = "large_text_fit/" + fmt + "/m4"
+        yield name, fmt, "large_text_fit", (WRAP_TEXT, 0, 0, 4, WIDTH, HEIGHT, 1)
+
+
+def _make(cls, fmt):
+    buf = bytearray(WIDTH * HEIGHT * 2)
+    return cls(buf, WIDTH, HEIGHT, FORMATS[fmt])
+
+
+def _time_call(fn, args, min_time_us):
+    """
+    Calls fn repeatedly for at least min_time_us.  Returns (calls, elapsed microseconds).
+    """
+    calls = 0
+    start = _now_us()
+    elapsed = 0
+    while calls == 0 or elapsed < min_time_us:
+        fn(*args)
+        calls += 1
+        elapsed = _now_us() - start
+    return calls, elapsed
+
+
+def _allocated(fn, args) -> int:
+    """
+    Returns the number of bytes allocated by a single call of fn.
+    """
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            fn(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return max(0, peak - before)
+    gc.collect()
+    gc.disable()
+    try:
+        before = gc.mem_alloc()
+        fn(*args)
+        return gc.mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def run(cls=framebuf2.FrameBuffer, quick=False, min_time=0.05) -> dict:
+    """
+    Runs every benchmark case against the frame buffer class cls.
+
+    Arguments:
+    cls -- FrameBuffer class to benchmark.
+    quick -- Run a reduced set of formats, sizes and radii.
+    min_time -- Minimum time in seconds to spend timing each case.
+
+    Returns a dictionary of results keyed by case name.
+    """
+    counting = counting_class(cls)
+    results = {}
+    for name, fmt, method, args in cases(quick):
+        fb = _make(cls, fmt)
+        fn = getattr(fb, method)
+        # one untimed call so that lazily built tables are not counted.
+        fn(*args)
+        calls, elapsed = _time_call(fn, args, int(min_time * 1000000))
+        counted = _make(counting, fmt)
+        counted.reset_counts()
+        getattr(counted, method)(*args)
+        counted.reset_counts()
+        getattr(counted, method)(*args)
+        seconds = elapsed / 1000000 / calls
+        results[name] = {
+            "seconds": seconds,
+            "calls_per_sec": calls * 1000000 / elapsed if elapsed else 0,
+            "primitives": counted.counts,
+            "allocated": _allocated(fn, args),
+        }
+    return results
+
+
+def compare(old, new, threshold=0.1) -> list:
+    """
+    Compares two sets of results from run().
+
+    Arguments:
+    old -- Baseline results.
+    new -- Results to check.
+    threshold -- Fractional slow down tolerated before a case is flagged.
+
+    Returns a list of (case name, reason) tuples, one for each regression.
+    """
+    regressions = []
+    for name in sorted(new):
+        if name not in old:
+            continue
+        before = old[name]
+        after = new[name]
+        if after["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append(
+                (
+                    name,
+                    "time "
+                    + str(round(after["seconds"] / before["seconds"], 2))
+                    + "x slower",
+                )
+            )
+        calls_before = sum(before["primitives"].values())
+        calls_after = sum(after["primitives"].values())
+        if calls_after > calls_before:
+            regressions.append(
+                (
+                    name,
+                    "primitive calls "
+                    + str(calls_before)
+                    + " -> "
+                    + str(calls_after),
+                )
+            )
+        if after["allocated"] > before["allocated"]:
+            regressions.append(
+                (
+                    name,
+                    "allocated "
+                    + str(before["allocated"])
+                    + " -> "
+                    + str(after["allocated"])
+                    + " bytes",
+                )
+            )
+    return regressions
+
+
+def _load_class(spec):
+    module_name, class_name = spec.split(":")
+    module = __import__(module_name)
+    return getattr(module, class_name)
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="framebuf2 benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--quick", action="store_true")
+    run_parser.add_argument("--output", help="write the results as JSON to this file")
+    run_parser.add_argument("--fbclass", default="framebuf2:FrameBuffer")
+    run_parser.add_argument("--min-time", type=float, default=0.05)
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(_load_class(args.fbclass), args.quick, args.min_time)
+        for name in results:
+            result = results[name]
+            print(
+                "{:40s} {:10.1f} us {:10.0f}/s {:6d} calls {:8d} bytes".format(
+                    name,
+                    result["seconds"] * 1000000,
+                    result["calls_per_sec"],
+                    sum(result["primitives"].values()),
+                    result["allocated"],
+                )
+            )
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"fbclass": args.fbclass, "results": results}, f, indent=1)
+        return 0
+
+    with open(args.old) as f:
+        old = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+    regressions = compare(old, new, args.threshold)
+    for name, reason in regressions:
+        print("REGRESSION " + name + ": " + reason)
+    if not regressions:
+        print("no regressions in " + str(len(new)) + " cases")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,8 +18,46 @@ License: MIT License (https://opensource.org/licenses/MIT)
 __version__ = "v210"
 __repo__ = "https://github.com/peter-l5/framebuf2"
 
-import framebuf
-from framebuf2.micro_text_wrapper import MicroTextWrapper
+try:
+    import framebuf
+except ImportError:
+    # not running on MicroPython: use the pure-Python reference implementation.
+    try:
+        from framebuf2 import framebuf_host as framebuf
+    except ImportError:
+        import framebuf_host as framebuf
+
+# True when drawing through the pure-Python framebuf_host rather than the native module.
+_HOST_FRAMEBUF = framebuf.__name__.endswith("framebuf_host")
+
+try:
+    from framebuf2.micro_text_wrapper import MicroTextWrapper, HYPHEN
+except ImportError:
+    from micro_text_wrapper import MicroTextWrapper, HYPHEN
+
+import math
+from array import array
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(end, start):
+        return end - start
 
 # constants available in MicroPython 1.19.1
 MONO_VLSB = framebuf.MONO_VLSB
@@ -30,18 +68,2002 @@ GS2_HMSB = framebuf.GS2_HMSB
 GS4_HMSB = framebuf.GS4_HMSB
 GS8 = framebuf.GS8
 
-# Number of pixels per character in the default font size.
-DEF_CHAR_PIX = 8
+# Number of pixels per character in the default font size.
+DEF_CHAR_PIX = 8
+
+# Number of pixels between each line of text.  Line height of text
+# is calculated based on the DEF_CHAR_PIX value.
+LINE_LEADING_PIX = 4
+
+# Characters that demark a word.
+WORD_DELIM = " -.\t"
+
+# Inherited framebuf primitives that are wrapped while damage tracking is on.
+_PRIMITIVES = ("pixel", "hline", "vline", "fill_rect", "rect", "line", "text", "blit", "fill", "scroll")
+
+# Fill rules for polygon().
+EVEN_ODD = 0
+NON_ZERO = 1
+
+# Display list opcodes.  Each command is stored as op, x, y, w, h, colour, object index,
+# where x, y, w, h is the area the command draws on.
+_DL_RECT = 0
+_DL_HLINE = 1
+_DL_VLINE = 2
+_DL_PIXEL = 3
+# line commands add 1 if the line starts at the right and 2 if it starts at the bottom.
+_DL_LINE = 4
+_DL_TEXT = 8
+_DL_BLIT = 9
+_DL_STRIDE = 7
+
+# Start of a packed font file, and the sizes of its header and of each index entry.
+FONT_MAGIC = b"FB2F"
+_FONT_VERSION = 1
+_FONT_HEADER = 14
+_FONT_ENTRY = 6
+
+# Maximum number of separate dirty rectangles kept before they are folded into one.
+MAX_DIRTY_RECTS = 16
+
+# drawing methods timed by a Profiler.
+_PROFILED = (
+    "large_text", "large_text_wrap", "large_text_fit", "circle", "ellipse", "ring", "arc", "pie",
+    "triangle", "polygon", "blit_scaled",
+)
+
+# Maximum number of messages, such as the sizes tried by large_text_fit, a Profiler keeps.
+MAX_PROFILE_TRACE = 32
+
+# Time in microseconds the async drawing methods draw for before they yield to the event loop.
+ASYNC_BUDGET_US = 5000
+
+# Number of rows the async shape methods fill between checks of the time.
+_ASYNC_ROWS = 8
+
+# Glyph rows of the built-in font for code points 32 to 127, one table per
+# character rotation (0, 90, 180 and 270 degrees).  Each glyph is 8 bytes, one
+# per row, with the left-most pixel in bit 0.  Tables are built on first use.
+_font_tables = [None, None, None, None]
+
+
+def _font_table(t) -> bytes:
+    """
+    Returns the glyph row table for characters rotated by t quarter turns.
+    """
+    table = _font_tables[t]
+    if table is None:
+        if t == 0:
+            # a MONO_HMSB buffer with an 8 pixel stride holds exactly one row per byte.
+            smallbuffer = bytearray(8)
+            letter = framebuf.FrameBuffer(smallbuffer, 8, 8, framebuf.MONO_HMSB)
+            table = bytearray(96 * 8)
+            for code in range(32, 128):
+                letter.fill(0)
+                letter.text(chr(code), 0, 0, 1)
+                table[(code - 32) * 8 : (code - 31) * 8] = smallbuffer
+        else:
+            upright = _font_table(0)
+            table = bytearray(96 * 8)
+            for o in range(0, 96 * 8, 8):
+                rows = upright[o : o + 8]
+                for i in range(0, t):
+                    rows = _rotate_glyph(rows, 8, 8)
+                table[o : o + 8] = bytes(rows)
+        table = bytes(table)
+        _font_tables[t] = table
+    return table
+
+
+def _glyph_offset(character) -> int:
+    """
+    Returns the offset of a character's rows in a font table.  Characters outside
+    the font are drawn with the code point 127 glyph, as framebuf.text() does.
+    """
+    code = ord(character)
+    if code < 32 or code > 127:
+        code = 127
+    return (code - 32) << 3
+
+
+def _buffer_bytes(width, height, format):
+    """
+    Returns the number of bytes needed for a frame buffer of the given size and format.
+    """
+    if format == MONO_VLSB:
+        return width * ((height + 7) // 8)
+    if format in (MONO_HLSB, MONO_HMSB):
+        return ((width + 7) // 8) * height
+    if format == GS2_HMSB:
+        return ((width + 3) // 4) * height
+    if format == GS4_HMSB:
+        return ((width + 1) // 2) * height
+    if format == GS8:
+        return width * height
+    return 2 * width * height
+
+
+def _draw_glyph(fill_rect, hline, table, o, x, y, m, colour, rows=8):
+    """
+    Draws the glyph at offset o of a font table, or a colour layer of a Sprite, with the
+    given fill_rect and hline functions, scaled by m.  The glyph is the given number of
+    rows tall.
+
+    Each horizontal run of set pixels in a row is drawn with one fill_rect (or hline
+    when m is 1), and identical consecutive rows are merged into a single taller
+    rectangle, so a glyph costs one call per run rather than one per pixel.
+    """
+    end = o + rows
+    while o < end:
+        row = table[o]
+        n = 1
+        while o + n < end and table[o + n] == row:
+            n += 1
+        h = n * m
+        p = x
+        while row:
+            if row & 1:
+                start = p
+                while row & 1:
+                    row >>= 1
+                    p += m
+                if h == 1:
+                    hline(start, y, p - start, colour)
+                else:
+                    fill_rect(start, y, p - start, h, colour)
+            else:
+                row >>= 1
+                p += m
+        y += h
+        o += n
+
+
+class _CallCounter:
+    """
+    Stand-in drawing target that counts the primitive calls made on it.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def fill_rect(self, x, y, w, h, c):
+        self.calls += 1
+
+    def hline(self, x, y, w, c):
+        self.calls += 1
+
+
+def large_text_calls(s, t=0) -> tuple:
+    """
+    Counts the drawing primitive calls that large_text makes for a string.
+
+    Arguments:
+    s -- String to measure.
+    t -- Rotation of each character: 0, 90, 180, or 270 degrees.
+
+    Returns a (per_pixel, merged) tuple: the number of calls made when drawing one
+    pixel or fill_rect per lit pixel, and the number made with run merging.  The
+    counts do not depend on the size multiple.
+    """
+    table = _font_table(t % 360 // 90)
+    counter = _CallCounter()
+    per_pixel = 0
+    for character in s:
+        o = _glyph_offset(character)
+        for q in range(o, o + 8):
+            row = table[q]
+            while row:
+                per_pixel += row & 1
+                row >>= 1
+        _draw_glyph(counter.fill_rect, counter.hline, table, o, 0, 0, 1, 1)
+    return (per_pixel, counter.calls)
+
+
+class _LRUCache:
+    """
+    Bounded cache that evicts the least recently used entry when it is full.
+
+    Arguments:
+    max_bytes -- Maximum total size of the cached entries in bytes.
+    """
+
+    # name used for the entry count in stats().
+    _entries = "entries"
+
+    def __init__(self, max_bytes):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive number of bytes.")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None if it is not cached.
+        """
+        item = self._items.pop(key, None)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items[key] = item
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, nbytes) -> bool:
+        """
+        Adds a value of size nbytes, evicting the least recently used entries to make room.
+        Returns False if the value is larger than the whole cache.
+        """
+        if nbytes > self.max_bytes:
+            return False
+        self.invalidate(key)
+        while self.size + nbytes > self.max_bytes:
+            oldest = next(iter(self._items))
+            self.size -= self._items.pop(oldest)[1]
+            self.evictions += 1
+        self._items[key] = (value, nbytes)
+        self.size += nbytes
+        return True
+
+    def invalidate(self, key):
+        """
+        Removes the entry for key, if it is cached.
+        """
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self):
+        """
+        Removes all entries from the cache.  The counters are left unchanged.
+        """
+        self._items = OrderedDict()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Returns a dictionary of the cache counters, for sizing the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            self._entries: len(self._items),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class GlyphCache(_LRUCache):
+    """
+    Bounded cache of scaled and rotated glyphs, ready to be drawn with a single blit.
+    The least recently used glyph is evicted when the cache is full.
+
+    Arguments:
+    max_bytes -- Maximum number of bytes of glyph buffers to hold in the cache.
+    """
+
+    _entries = "glyphs"
+
+
+class LayoutCache(_LRUCache):
+    """
+    Bounded cache of wrapped text layouts used by large_text_wrap and large_text_fit.
+    Each entry holds the chosen size multiple and the line spans of one string laid out
+    in one window.  The least recently used layout is evicted when the cache is full.
+
+    Arguments:
+    max_bytes -- Maximum number of bytes of layouts to hold in the cache.
+    """
+
+    _entries = "layouts"
+
+    def invalidate_text(self, s=None):
+        """
+        Removes every layout of the string s, or all layouts if s is None.
+        """
+        if s is None:
+            self.clear()
+            return
+        for key in [key for key in self._items if key[0] == s]:
+            self.invalidate(key)
+
+
+def _rotate_glyph(rows, w, h) -> list:
+    """
+    Rotates a w x h glyph, given as h row integers with the left-most pixel in bit 0,
+    by 90 degrees clockwise.  Returns the w rows of the h pixel wide rotated glyph.
+    """
+    rotated = [0] * w
+    for j in range(0, h):
+        row = rows[j]
+        bit = 1 << (h - 1 - j)
+        i = 0
+        while row:
+            if row & 1:
+                rotated[i] |= bit
+            row >>= 1
+            i += 1
+    return rotated
+
+
+class PackedFont:
+    """
+    Bitmap font in the packed format written by framebuf_bdf, drawn by large_text and the
+    text methods built on it once set with FrameBuffer.set_font().  Only the header is
+    read when the font is opened; each glyph is read from the font when it is first
+    needed, and the most recently used glyphs are kept in a small cache.
+
+    Arguments:
+    source -- Name of a font file, an open binary file, or a bytes-like object holding
+            the font.  A named file is memory-mapped where the mmap module is available,
+            and read a glyph at a time otherwise.
+    cache_bytes -- Size in bytes of the cache of glyphs read from the font, 0 for none.
+
+    Throws a ValueError exception if source does not hold a packed font.
+    """
+
+    def __init__(self, source, cache_bytes: int = 2048):
+        self._file = None
+        self._data = None
+        if isinstance(source, str):
+            f = open(source, "rb")
+            if mmap is not None:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                f.close()
+            else:
+                self._file = f
+        elif hasattr(source, "readinto"):
+            self._file = source
+        else:
+            self._data = memoryview(source)
+        header = self._read(0, _FONT_HEADER)
+        if len(header) < _FONT_HEADER or header[0:4] != FONT_MAGIC or header[4] != _FONT_VERSION:
+            raise ValueError("not a packed font")
+        self.height = header[5]
+        self.max_width = header[6]
+        self.first = header[8] | (header[9] << 8)
+        self.count = header[10] | (header[11] << 8)
+        self.default = header[12] | (header[13] << 8)
+        self._cache = _LRUCache(cache_bytes) if cache_bytes else None
+
+    def close(self):
+        """
+        Closes the font file.
+        """
+        if self._file is not None:
+            self._file.close()
+        elif isinstance(self._data, memoryview):
+            self._data.release()
+        elif self._data is not None:
+            self._data.close()
+
+    def _read(self, offset, n) -> bytes:
+        if self._file is None:
+            return bytes(self._data[offset : offset + n])
+        self._file.seek(offset)
+        return self._file.read(n)
+
+    def _entry(self, code) -> tuple:
+        """
+        Returns the (offset, width, advance) index entry of a code point, with the offset
+        0 if the font has no glyph for it.
+        """
+        i = code - self.first
+        if i < 0 or i >= self.count:
+            return (0, 0, 0)
+        e = self._read(_FONT_HEADER + i * _FONT_ENTRY, _FONT_ENTRY)
+        return (e[0] | (e[1] << 8) | (e[2] << 16) | (e[3] << 24), e[4], e[5])
+
+    def glyph(self, character, t: int = 0) -> tuple:
+        """
+        Returns a (rows, width, height, advance) tuple for a character rotated clockwise
+        by t quarter turns: the width and height in pixels of its rotated bitmap, one row
+        integer per pixel row with the left-most pixel in bit 0, and the distance in pixels
+        to the next character of unrotated text.  Characters not in the font are drawn
+        with the font's default glyph.
+        """
+        key = (character, t)
+        cache = self._cache
+        if cache is not None:
+            glyph = cache.get(key)
+            if glyph is not None:
+                return glyph
+        if t:
+            rows, w, h, advance = self.glyph(character, t - 1)
+            glyph = (_rotate_glyph(rows, w, h), h, w, advance)
+        else:
+            offset, w, advance = self._entry(ord(character))
+            if offset == 0:
+                offset, w, advance = self._entry(self.default)
+            h = self.height
+            stride = (w + 7) // 8
+            data = self._read(offset, stride * h) if offset else b""
+            rows = [0] * h
+            for j in range(0, len(data) // stride if stride else 0):
+                row = 0
+                for k in range(stride - 1, -1, -1):
+                    row = (row << 8) | data[j * stride + k]
+                rows[j] = row
+            glyph = (rows, w, h, advance)
+        if cache is not None:
+            cache.put(key, glyph, 4 * len(glyph[0]) + 32)
+        return glyph
+
+    def advance(self, character) -> int:
+        """
+        Returns the distance in pixels from the start of character to the next one.
+        """
+        return self.glyph(character)[3]
+
+
+class Sprite:
+    """
+    Image prepared for FrameBuffer.blit_scaled: the pixels of a blit source split into one
+    row bitmask per colour, after the palette and key colour are applied, so that it is
+    drawn by the same run-merging path as the glyphs of large_text.  Rotated copies are
+    made on first use and kept.  Later changes to the source are not seen.
+
+    Arguments:
+    source -- framebuf2 FrameBuffer, or a (buffer, width, height, format [, stride]) tuple.
+    key -- Colour that is not drawn, compared after the palette, or None to draw every pixel.
+    palette -- FrameBuffer, or a tuple as for source, giving the colour of each source
+            colour c as its pixel (c, 0).
+
+    Throws a ValueError exception if the size of source cannot be found.
+    """
+
+    def __init__(self, source, key=None, palette=None):
+        size = _blit_size(source)
+        if size is None:
+            raise ValueError("the size of the sprite source cannot be found.")
+        if isinstance(source, tuple):
+            source = framebuf.FrameBuffer(*source)
+        if isinstance(palette, tuple):
+            palette = framebuf.FrameBuffer(*palette)
+        w, h = size
+        colours = {}
+        pixel = source.pixel
+        for y in range(0, h):
+            for x in range(0, w):
+                c = pixel(x, y)
+                if palette is not None:
+                    c = palette.pixel(c, 0)
+                if c != key:
+                    rows = colours.get(c)
+                    if rows is None:
+                        rows = [0] * h
+                        colours[c] = rows
+                    rows[y] |= 1 << x
+        self.width = w
+        self.height = h
+        self._layers = [list(colours.items()), None, None, None]
+
+    def layers(self, rotation) -> list:
+        """
+        Returns the (colour, rows) layers of the sprite rotated clockwise by rotation
+        quarter turns, one row integer per pixel row with the left-most pixel in bit 0.
+        """
+        layers = self._layers[rotation]
+        if layers is None:
+            if rotation % 2:
+                w, h = self.width, self.height
+            else:
+                w, h = self.height, self.width
+            layers = [(c, _rotate_glyph(rows, w, h)) for c, rows in self.layers(rotation - 1)]
+            self._layers[rotation] = layers
+        return layers
+
+
+def _pack_spans(spans, n):
+    """
+    Packs the (start, end, hyphenate) line spans of a string of length n into a flat array.
+    """
+    packed = array("H" if n <= 0xFFFF else "I")
+    for start, end, hyphenate in spans:
+        packed.append(start)
+        packed.append(end)
+        packed.append(1 if hyphenate else 0)
+    return packed
+
+
+def _unpack_spans(packed):
+    """
+    Generator yielding the (start, end, hyphenate) line spans held in a packed array.
+    """
+    for i in range(0, len(packed), 3):
+        yield (packed[i], packed[i + 1], packed[i + 2] == 1)
+
+
+def _disc_table(radius):
+    """
+    Returns the half-width of each row of a filled circle, for row offsets 0 to radius.
+
+    The rows are those covered by the vertical lines of the midpoint circle algorithm,
+    so the disc has exactly the pixels of the outline circle and its interior.
+    """
+    top = array("H", [0]) * (radius + 1)
+    g = 1 - radius
+    ddG_x = 1
+    ddG_y = -2 * radius
+    x = 0
+    y = radius
+    while x < y:
+        if g >= 0:
+            y -= 1
+            ddG_y += 2
+            g += ddG_y
+        x += 1
+        ddG_x += 2
+        g += ddG_x
+        # column x reaches row y, and column y reaches row x.
+        if top[y] < x:
+            top[y] = x
+        if top[x] < y:
+            top[x] = y
+    # a row is as wide as the widest column reaching it or any row further out.
+    widest = 0
+    for dy in range(radius, -1, -1):
+        if top[dy] > widest:
+            widest = top[dy]
+        top[dy] = widest
+    return top
+
+
+def _ellipse_points(xr, yr):
+    """
+    Generator yielding the first quadrant points of an ellipse with radii xr and yr,
+    using the integer algorithm of MicroPython's framebuf.ellipse().
+    """
+    two_asquare = 2 * xr * xr
+    two_bsquare = 2 * yr * yr
+    x = xr
+    y = 0
+    xchange = yr * yr * (1 - 2 * xr)
+    ychange = xr * xr
+    ellipse_error = 0
+    stoppingx = two_bsquare * xr
+    stoppingy = 0
+    while stoppingx >= stoppingy:
+        yield x, y
+        y += 1
+        stoppingy += two_asquare
+        ellipse_error += ychange
+        ychange += two_asquare
+        if (2 * ellipse_error + xchange) > 0:
+            x -= 1
+            stoppingx -= two_bsquare
+            ellipse_error += xchange
+            xchange += two_bsquare
+    x = 0
+    y = yr
+    xchange = yr * yr
+    ychange = xr * xr * (1 - 2 * yr)
+    ellipse_error = 0
+    stoppingx = 0
+    stoppingy = two_asquare * yr
+    while stoppingx <= stoppingy:
+        yield x, y
+        x += 1
+        stoppingx += two_bsquare
+        ellipse_error += xchange
+        xchange += two_bsquare
+        if (2 * ellipse_error + ychange) > 0:
+            y -= 1
+            stoppingy -= two_asquare
+            ellipse_error += ychange
+            ychange += two_asquare
+
+
+def _ellipse_table(xr, yr):
+    """
+    Returns the half-width of each row of a filled ellipse, for row offsets 0 to yr, or
+    -1 for the rows of thin ellipses that MicroPython's ellipse() leaves empty.
+    """
+    table = array("h", [-1]) * (yr + 1)
+    for x, y in _ellipse_points(xr, yr):
+        if table[y] < x:
+            table[y] = x
+    return table
+
+
+def _in_sector(x, y, start, sweep) -> bool:
+    """
+    Determines whether the pixel at offset x, y from the centre lies in the sector that
+    runs clockwise for sweep degrees from the angle start.
+    """
+    if x == 0 and y == 0:
+        return True
+    angle = math.atan2(y, x) * 180 / math.pi
+    return (angle - start) % 360 <= sweep + 1e-9
+
+
+def _polygon_points(points) -> tuple:
+    """
+    Returns the x and y coordinates of a polygon's vertices as two lists.  The points
+    are either a flat sequence x0, y0, x1, y1, ... (as for MicroPython's poly()) or a
+    sequence of (x, y) pairs.
+    """
+    if len(points) == 0:
+        return [], []
+    if isinstance(points[0], int):
+        if len(points) % 2:
+            raise ValueError("polygon points must be x, y pairs")
+        return list(points[0::2]), list(points[1::2])
+    return [p[0] for p in points], [p[1] for p in points]
+
+
+def _clipped_line(pixel, x1, y1, x2, y2, c, left, top, right, bottom):
+    """
+    Draws the line from x1, y1 to x2, y2 one pixel at a time, with the same steps as
+    framebuf's line(), skipping the pixels outside the clip rectangle.
+    """
+    dx = x2 - x1
+    sx = 1
+    if dx < 0:
+        dx = -dx
+        sx = -1
+    dy = y2 - y1
+    sy = 1
+    if dy <= 0:
+        dy = -dy
+        sy = -1
+    steep = dy > dx
+    if steep:
+        x1, y1 = y1, x1
+        dx, dy = dy, dx
+        sx, sy = sy, sx
+    e = 2 * dy - dx
+    for _ in range(dx):
+        if steep:
+            px, py = y1, x1
+        else:
+            px, py = x1, y1
+        if left <= px < right and top <= py < bottom:
+            pixel(px, py, c)
+        while e >= 0:
+            y1 += sy
+            e -= 2 * dx
+        x1 += sx
+        e += 2 * dy
+    if left <= x2 < right and top <= y2 < bottom:
+        pixel(x2, y2, c)
+
+
+def _blit_size(fbuf):
+    """
+    Returns the (width, height) of a blit source, or None if it cannot be found.
+    """
+    if isinstance(fbuf, tuple):
+        return (fbuf[1], fbuf[2])
+    if hasattr(fbuf, "width"):
+        return (fbuf.width, fbuf.height)
+    return None
+
+
+def _clipped_blit(pixel, fbuf, x, y, w, h, key, palette, left, top, right, bottom):
+    """
+    Copies the part of the w x h blit source inside the clip rectangle one pixel at a
+    time, honouring the key colour and palette as framebuf's blit() does.
+    """
+    if isinstance(fbuf, tuple):
+        fbuf = framebuf.FrameBuffer(*fbuf)
+    if isinstance(palette, tuple):
+        palette = framebuf.FrameBuffer(*palette)
+    for j in range(max(top - y, 0), min(bottom - y, h)):
+        for i in range(max(left - x, 0), min(right - x, w)):
+            c = fbuf.pixel(i, j)
+            if palette is not None:
+                c = palette.pixel(c, 0)
+            if c != key:
+                pixel(x + i, y + j, c)
+
+
+class TextField:
+    """
+    Fixed-size text area drawn with large_text that redraws only the characters that change.
+    Usually created with FrameBuffer.text_field().
+
+    Arguments:
+    fb -- FrameBuffer to draw on.
+    x -- x coordinate of the upper-left corner of the field.
+    y -- y coordinate of the upper-left corner of the field.
+    m -- Size multiple of the text.
+    capacity -- Number of character cells in the field.  Longer values are truncated and
+            shorter ones are padded with spaces.
+    c -- Colour of the text.
+    bg -- Colour used to clear character cells.
+    r -- Rotation of the text: 0, 90, 180, or 270 degrees.
+    t -- Rotation of each character within the text: 0, 90, 180, or 270 degrees.
+
+    The field is drawn in the font set on fb by set_font, and is capacity of its widest
+    characters long.  Setting a value after the font has changed redraws the whole field.
+    """
+
+    def __init__(self, fb, x, y, m, capacity, c=1, bg=0, r=0, t=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1 character.")
+        self.fb = fb
+        self.x = x
+        self.y = y
+        self.m = m
+        self.capacity = capacity
+        self.c = c
+        self.bg = bg
+        self.r = r % 360 // 90
+        self.t = t
+        self.value = None
+        self._font = fb.font
+        self._damage = []
+
+    def invalidate(self):
+        """
+        Forces every cell to be redrawn by the next set().
+        """
+        self.value = None
+
+    def set(self, value) -> int:
+        """
+        Shows value in the field, clearing and redrawing only the cells whose character or
+        position changed.  With a proportional font set by set_font, a character of a new
+        width moves the cells after it, so they are redrawn too.
+        Returns the number of cells redrawn.
+        """
+        value = str(value)[: self.capacity]
+        value = value + " " * (self.capacity - len(value))
+        old = self.value
+        if self.fb.font is not self._font:
+            old = None
+        self.value = value
+        self._font = self.fb.font
+        capacity = self.capacity
+        # cells are compared in the order large_text draws them, which with r = 180 or 270
+        # runs backwards from the far end of the field.
+        new = self._offsets(value)
+        if old is None:
+            self._draw_run(value, 0, capacity, 0, capacity * self._cell()[0])
+            return capacity
+        previous = self._offsets(old)
+        reverse = self.r >= 2
+        redrawn = 0
+        k = 0
+        while k < capacity:
+            i = capacity - 1 - k if reverse else k
+            if old[i] == value[i] and previous[k] == new[k]:
+                k += 1
+                continue
+            # draw each run of consecutive changed cells with one clear and one large_text.
+            n = k + 1
+            while n < capacity:
+                i = capacity - 1 - n if reverse else n
+                if old[i] == value[i] and previous[n] == new[n]:
+                    break
+                n += 1
+            # an unchanged cell after the run starts where it did, so the run fills the same
+            # stretch before and after; the last run ends at the further of its two ends.
+            end = new[n] if n < capacity else max(previous[n], new[n])
+            if reverse:
+                self._draw_run(value, capacity - n, capacity - k, new[k], end)
+            else:
+                self._draw_run(value, k, n, new[k], end)
+            redrawn += n - k
+            k = n
+        return redrawn
+
+    def _quarters(self) -> tuple:
+        """
+        Returns the rotations r and t of the text in quarter turns.
+        """
+        return (self.r, self.r if self.t is None else self.t % 360 // 90)
+
+    def _offsets(self, value) -> list:
+        """
+        Returns the distance along the line to the start of each cell of value, in the order
+        large_text draws them, followed by the length of the whole line.
+        """
+        r, t = self._quarters()
+        along = (t - r) % 2 == 0
+        if r >= 2:
+            value = self.fb._reverse(value)
+        offsets = [0]
+        for character in value:
+            offsets.append(offsets[-1] + self.fb._advance(character, self.m, along))
+        return offsets
+
+    def _cell(self) -> tuple:
+        """
+        Returns the widest step along the line and the depth across it of a character cell
+        in the current font.
+        """
+        r, t = self._quarters()
+        font = self.fb.font
+        if font is None:
+            return (DEF_CHAR_PIX * self.m, DEF_CHAR_PIX * self.m)
+        if (t - r) % 2 == 0:
+            return (font.max_width * self.m, font.height * self.m)
+        return (font.height * self.m, font.max_width * self.m)
+
+    def _draw_run(self, value, i, j, start, end):
+        """
+        Clears the stretch of the line from start to end and draws the characters of cells
+        i to j - 1 on it.
+        """
+        across = self._cell()[1]
+        if self.r % 2 == 0:
+            x = self.x + start
+            y = self.y
+            w = end - start
+            h = across
+        else:
+            x = self.x
+            y = self.y + start
+            w = across
+            h = end - start
+        self.fb.fill_rect(x, y, w, h, self.bg)
+        run = value[i:j]
+        if run.strip():
+            self.fb.large_text(run, x, y, self.m, self.c, self.r * 90, self.t)
+        self._damage.append((x, y, w, h))
+
+    def damage(self) -> list:
+        """
+        Returns the areas redrawn since the last call as a list of (x, y, w, h) tuples, and clears it.
+        """
+        damage = self._damage
+        self._damage = []
+        return damage
+
+
+class DisplayList:
+    """
+    Drawing commands recorded from a FrameBuffer, for replaying on any FrameBuffer.
+    Usually created with FrameBuffer.begin_record() and FrameBuffer.end_record().
+
+    Drawing methods are recorded already broken down into rectangles, lines, pixels,
+    text and blits, so replaying a list skips the text layout, glyph lookup and span
+    calculations of the original calls.  The commands are held in a flat array with the
+    area each command draws on, so commands outside the replayed area are skipped cheaply.
+    """
+
+    def __init__(self):
+        self.commands = array("i")
+        # text strings and blit sources, referred to by index from the commands.
+        self.objects = []
+        # bounding box of all commands as (left, top, right, bottom).
+        self.bounds = None
+
+    def __len__(self):
+        return len(self.commands) // _DL_STRIDE
+
+    def _add(self, op, x, y, w, h, c, obj=None):
+        """
+        Appends a command.  A rectangle or horizontal line directly below one of the same
+        x, width and colour is merged into it.
+        """
+        if w <= 0 or h <= 0:
+            return
+        commands = self.commands
+        n = len(commands) - _DL_STRIDE
+        if (
+            op <= _DL_HLINE
+            and n >= 0
+            and commands[n] <= _DL_HLINE
+            and commands[n + 1] == x
+            and commands[n + 3] == w
+            and commands[n + 5] == c
+            and commands[n + 2] + commands[n + 4] == y
+        ):
+            commands[n] = _DL_RECT
+            commands[n + 4] += h
+        else:
+            i = 0
+            if obj is not None:
+                i = len(self.objects)
+                self.objects.append(obj)
+            commands.extend((op, x, y, w, h, c, i))
+        bounds = self.bounds
+        if bounds is None:
+            self.bounds = (x, y, x + w, y + h)
+        else:
+            self.bounds = (
+                min(bounds[0], x),
+                min(bounds[1], y),
+                max(bounds[2], x + w),
+                max(bounds[3], y + h),
+            )
+
+    def replay(self, fb, dx: int = 0, dy: int = 0, area=None):
+        """
+        Draws the recorded commands on a FrameBuffer.
+
+        Arguments:
+        fb -- framebuf2 FrameBuffer to draw on.
+        dx -- Horizontal offset added to every command.
+        dy -- Vertical offset added to every command.
+        area -- Optional (x, y, w, h) rectangle.  Commands wholly outside it are skipped.
+                Commands are always skipped when wholly outside the clip rectangle of fb,
+                and are trimmed to it.
+        """
+        if self.bounds is None:
+            return
+        left, top, right, bottom = fb._clip
+        if area is not None:
+            left = max(left, area[0])
+            top = max(top, area[1])
+            right = min(right, area[0] + area[2])
+            bottom = min(bottom, area[1] + area[3])
+        bounds = self.bounds
+        if (
+            bounds[0] + dx >= right
+            or bounds[1] + dy >= bottom
+            or bounds[2] + dx <= left
+            or bounds[3] + dy <= top
+        ):
+            return
+        if fb._dirty is not None:
+            fb._mark(
+                bounds[0] + dx, bounds[1] + dy, bounds[2] - bounds[0], bounds[3] - bounds[1]
+            )
+        self._run(fb, range(0, len(self.commands), _DL_STRIDE), dx, dy, left, top, right, bottom)
+
+    def _tile_index(self, tile_width, tile_height, columns, rows) -> list:
+        """
+        Returns, for each tile of a frame divided into rows x columns tiles of the given
+        size, an array of the offsets of the commands that draw on that tile.  Tiles are
+        listed row by row.
+        """
+        commands = self.commands
+        typecode = "H" if len(commands) <= 0xFFFF else "I"
+        index = []
+        for i in range(columns * rows):
+            index.append(array(typecode))
+        for i in range(0, len(commands), _DL_STRIDE):
+            x = commands[i + 1]
+            y = commands[i + 2]
+            first_column = max(x // tile_width, 0)
+            last_column = min((x + commands[i + 3] - 1) // tile_width, columns - 1)
+            first_row = max(y // tile_height, 0)
+            last_row = min((y + commands[i + 4] - 1) // tile_height, rows - 1)
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    index[row * columns + column].append(i)
+        return index
+
+    def _run(self, fb, offsets, dx, dy, left, top, right, bottom):
+        """
+        Draws the commands at the given offsets on fb, skipping those wholly outside the
+        rectangle left, top, right, bottom.
+        """
+        commands = self.commands
+        objects = self.objects
+        fill_rect = fb._fill_rect
+        hline = fb._hline
+        vline = fb._vline
+        pixel = fb._pixel
+        line = fb._line
+        for i in offsets:
+            x = commands[i + 1] + dx
+            y = commands[i + 2] + dy
+            w = commands[i + 3]
+            h = commands[i + 4]
+            if x >= right or y >= bottom or x + w <= left or y + h <= top:
+                continue
+            op = commands[i]
+            c = commands[i + 5]
+            if op == _DL_RECT:
+                fill_rect(x, y, w, h, c)
+            elif op == _DL_HLINE:
+                hline(x, y, w, c)
+            elif op == _DL_VLINE:
+                vline(x, y, h, c)
+            elif op == _DL_PIXEL:
+                pixel(x, y, c)
+            elif op < _DL_TEXT:
+                # the line runs between opposite corners of its area.
+                x1 = x
+                x2 = x + w - 1
+                if op & 1:
+                    x1, x2 = x2, x1
+                y1 = y
+                y2 = y + h - 1
+                if op & 2:
+                    y1, y2 = y2, y1
+                line(x1, y1, x2, y2, c)
+            elif op == _DL_TEXT:
+                clip = fb._clip
+                if x >= clip[0] and y >= clip[1] and x + w <= clip[2] and y + h <= clip[3]:
+                    fb.text(objects[commands[i + 6]], x, y, c)
+                else:
+                    # text() is not clipped, so text cut by the clip is drawn glyph by glyph.
+                    table = _font_table(0)
+                    for b in objects[commands[i + 6]].encode():
+                        _draw_glyph(fill_rect, hline, table, _glyph_offset(chr(b)), x, y, 1, c)
+                        x += DEF_CHAR_PIX
+            else:
+                source, key, palette = objects[commands[i + 6]]
+                fb._blit(source, x, y, key, palette)
+
+
+class Profiler:
+    """
+    Call counts, time, primitive calls and pixels of the drawing methods of a FrameBuffer,
+    grouped by region.  Usually created with FrameBuffer.profile().
+
+    Only the outermost drawing method is timed, so the lines drawn by large_text_wrap
+    count towards large_text_wrap and not also towards large_text.  Pixels are the area
+    asked of the primitives, before clipping.
+    """
+
+    def __init__(self):
+        # [calls, microseconds, primitive calls, pixels] keyed by (region, method).
+        self.stats = {}
+        # name of the region being drawn, set with FrameBuffer.region().
+        self.current_region = None
+        # messages such as the sizes tried by large_text_fit, oldest first.
+        self.trace = []
+        # running totals of the primitives, read before and after each timed call.
+        self.primitives = 0
+        self.pixels = 0
+        self._depth = 0
+
+    def reset(self):
+        """
+        Clears the counts and messages collected so far.
+        """
+        self.stats = {}
+        self.trace = []
+
+    def note(self, message):
+        """
+        Adds a message to the trace, dropping the oldest once MAX_PROFILE_TRACE are kept.
+        """
+        if len(self.trace) >= MAX_PROFILE_TRACE:
+            self.trace.pop(0)
+        self.trace.append(message)
+
+    def _wrap(self, name, method):
+        """
+        Returns method wrapped so that each outermost call is counted under name.
+        """
+        profiler = self
+
+        def profiled(*args, **kwargs):
+            if profiler._depth:
+                return method(*args, **kwargs)
+            profiler._depth = 1
+            primitives = profiler.primitives
+            pixels = profiler.pixels
+            start = ticks_us()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = ticks_diff(ticks_us(), start)
+                profiler._depth = 0
+                key = (profiler.current_region, name)
+                entry = profiler.stats.get(key)
+                if entry is None:
+                    entry = profiler.stats[key] = [0, 0, 0, 0]
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += profiler.primitives - primitives
+                entry[3] += profiler.pixels - pixels
+
+        return profiled
+
+    def results(self) -> list:
+        """
+        Returns a list of dictionaries, one for each region and method, with the keys
+        region, method, calls, us, primitives and pixels, most time consuming first.
+        """
+        results = []
+        for key in self.stats:
+            entry = self.stats[key]
+            results.append(
+                {
+                    "region": key[0],
+                    "method": key[1],
+                    "calls": entry[0],
+                    "us": entry[1],
+                    "primitives": entry[2],
+                    "pixels": entry[3],
+                }
+            )
+        results.sort(key=lambda result: -result["us"])
+        return results
+
+    def regions(self) -> dict:
+        """
+        Returns a dictionary of [calls, microseconds, primitive calls, pixels] totals for
+        each region.
+        """
+        totals = {}
+        for key in self.stats:
+            total = totals.get(key[0])
+            if total is None:
+                total = totals[key[0]] = [0, 0, 0, 0]
+            entry = self.stats[key]
+            for i in range(4):
+                total[i] += entry[i]
+        return totals
+
+    def report(self) -> str:
+        """
+        Returns a table of the results, followed by the totals for each region.  Drawing
+        outside any region is shown under "-".
+        """
+        row = "{:12s} {:16s} {:>6} {:>9} {:>7} {:>9}"
+        lines = [row.format("region", "method", "calls", "us", "prims", "pixels")]
+        for result in self.results():
+            lines.append(
+                row.format(
+                    _region_name(result["region"]),
+                    result["method"],
+                    result["calls"],
+                    result["us"],
+                    result["primitives"],
+                    result["pixels"],
+                )
+            )
+        totals = self.regions()
+        for region in totals:
+            total = totals[region]
+            lines.append(row.format(_region_name(region), "total", total[0], total[1], total[2], total[3]))
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        """
+        Returns the results and the trace as a JSON string.
+        """
+        import json
+
+        return json.dumps({"results": self.results(), "trace": self.trace})
+
+
+def _region_name(region) -> str:
+    return "-" if region is None else str(region)
+
+
+class _Region:
+    """
+    Context manager that sets the region a Profiler counts drawing under.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.previous = None
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.previous = self.profiler.current_region
+            self.profiler.current_region = self.name
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.current_region = self.previous
+
+
+# returned by FrameBuffer.region() while profiling is off.
+_NO_REGION = _Region(None, None)
+
+
+def _asyncio():
+    try:
+        import asyncio
+    except ImportError:
+        import uasyncio as asyncio
+    return asyncio
+
+
+class _Slicer:
+    """
+    Yields an async drawing method to the event loop once it has drawn for its time budget.
+    """
+
+    def __init__(self, budget_us):
+        self.budget_us = ASYNC_BUDGET_US if budget_us is None else budget_us
+        self.sleep = _asyncio().sleep
+        self.start = ticks_us()
+
+    async def pause(self):
+        if ticks_diff(ticks_us(), self.start) >= self.budget_us:
+            await self.sleep(0)
+            self.start = ticks_us()
+
+
+class FrameBuffer(framebuf.FrameBuffer):
+    def __init__(self, buffer, width, height, format, stride=None):
+        if stride is None:
+            super().__init__(buffer, width, height, format)
+        else:
+            super().__init__(buffer, width, height, format, stride)
+        self.width = width
+        self.height = height
+        self._format = format
+        if stride is None:
+            stride = width
+        # stride in bytes for MONO_HLSB rows, or in pixels for MONO_VLSB pages.
+        self._direct_stride = (stride + 7) >> 3 if format == MONO_HLSB else stride
+        # a monochrome bytearray is written directly where whole bytes can be set at once,
+        # which only pays off over the pure-Python framebuf_host: the native fill_rect
+        # already sets whole bytes in C.
+        self._direct = None
+        if (
+            _HOST_FRAMEBUF
+            and format in (MONO_HLSB, MONO_VLSB)
+            and isinstance(buffer, bytearray)
+        ):
+            self._direct = memoryview(buffer)
+        self.glyph_cache = None
+        self.layout_cache = None
+        self.font = None
+        self.profiler = None
+        self._dirty = None
+        # clip rectangle as (left, top, right, bottom), right and bottom exclusive.
+        self._clip = (0, 0, width, height)
+        # drawing coordinates of the top left corner of the buffer.
+        self._origin = (0, 0)
+        # display list being recorded, and the dirty record put aside while recording.
+        self._recording = None
+        self._recording_dirty = None
+        self._rebind()
+
+    def _rebind(self):
+        """
+        Sets up the primitives used internally by the drawing methods, and installs
+        damage-tracking wrappers over the inherited primitives when tracking is enabled.
+        The internal primitives are trimmed to the clip rectangle when it is smaller than
+        the buffer, and all primitives are moved when the origin is set.  The internal
+        primitives are counted while profiling.  Nothing is wrapped while tracking,
+        clipping, the origin and profiling are off, so the primitives run at full speed.
+        """
+        for name in _PRIMITIVES:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                pass
+        self._pixel = self.pixel
+        self._hline = self.hline
+        self._vline = self.vline
+        self._fill_rect = self.fill_rect
+        self._line = self.line
+        self._blit = self.blit
+        if self._direct is not None and self._plain_primitives():
+            self._direct_primitives()
+        if self._recording is not None:
+            self._record_primitives()
+        else:
+            if self._dirty is not None:
+                self._track_primitives()
+            if self._origin != (0, 0):
+                self._translate_primitives()
+                self._clip_primitives()
+            elif self._clip != (0, 0, self.width, self.height):
+                self._clip_primitives()
+        if self.profiler is not None:
+            self._count_primitives()
+
+    def _plain_primitives(self) -> bool:
+        """
+        Returns True unless a subclass overrides fill_rect, hline or vline, in which case
+        the drawing methods keep calling them.
+        """
+        cls = type(self)
+        for name in ("fill_rect", "hline", "vline"):
+            if getattr(cls, name) is not getattr(FrameBuffer, name):
+                return False
+        return True
+
+    def _direct_primitives(self):
+        """
+        Replaces the internal fill_rect of MONO_HLSB and MONO_VLSB buffers with one that
+        sets or clears whole bytes of the buffer at once: the whole bytes of each row for
+        MONO_HLSB, and the whole 8 pixel pages of each column for MONO_VLSB.  The framebuf
+        primitives draw the partly covered bytes at the edges, in one call for all the
+        rows or pages.  Short MONO_HLSB rectangles of fewer than 8 rows and single
+        MONO_VLSB columns, and so hline and vline, are left to framebuf, which draws them
+        in one call already.  Scaled glyphs with m a multiple
+        of 8 and aligned to whole bytes are drawn with byte writes only.
+        """
+        buf = self._direct
+        stride = self._direct_stride
+        width = self.width
+        height = self.height
+        fill_rect = self._fill_rect
+
+        if self._format == MONO_HLSB:
+
+            def direct_fill_rect(x, y, w, h, c):
+                if x < 0:
+                    w += x
+                    x = 0
+                if x + w > width:
+                    w = width - x
+                if y < 0:
+                    h += y
+                    y = 0
+                if y + h > height:
+                    h = height - y
+                if w <= 0 or h <= 0:
+                    return
+                x1 = x + w
+                # whole bytes first to last - 1 of each row.
+                first = (x + 7) >> 3
+                last = x1 >> 3
+                if h < 8 or last <= first:
+                    fill_rect(x, y, w, h, c)
+                    return
+                if x & 7:
+                    fill_rect(x, y, (first << 3) - x, h, c)
+                if x1 & 7:
+                    fill_rect(last << 3, y, x1 & 7, h, c)
+                n = last - first
+                fill = (b"\xff" if c else b"\x00") * n
+                i = y * stride + first
+                for _ in range(h):
+                    buf[i : i + n] = fill
+                    i += stride
+
+            self._fill_rect = direct_fill_rect
+        else:
+
+            def direct_fill_rect(x, y, w, h, c):
+                if x < 0:
+                    w += x
+                    x = 0
+                if x + w > width:
+                    w = width - x
+                if y < 0:
+                    h += y
+                    y = 0
+                if y + h > height:
+                    h = height - y
+                if w <= 0 or h <= 0:
+                    return
+                y1 = y + h
+                # whole pages first to last - 1 of each column.
+                first = (y + 7) >> 3
+                last = y1 >> 3
+                if w == 1 or last <= first:
+                    fill_rect(x, y, w, h, c)
+                    return
+                if y & 7:
+                    fill_rect(x, y, w, (first << 3) - y, c)
+                if y1 & 7:
+                    fill_rect(x, last << 3, w, y1 & 7, c)
+                fill = (b"\xff" if c else b"\x00") * w
+                i = first * stride + x
+                for _ in range(last - first):
+                    buf[i : i + w] = fill
+                    i += stride
+
+            self._fill_rect = direct_fill_rect
+
+    def _track_primitives(self):
+        """
+        Wraps each inherited primitive so that it records the area it draws on.
+        """
+        mark = self._mark_area
+        pixel = self._pixel
+        hline = self._hline
+        vline = self._vline
+        fill_rect = self._fill_rect
+        line = self._line
+        blit = self._blit
+        rect = self.rect
+        text = self.text
+        fill = self.fill
+        scroll = self.scroll
+        width = self.width
+        height = self.height
+
+        def tracked_pixel(x, y, *c):
+            if c:
+                mark(x, y, 1, 1)
+            return pixel(x, y, *c)
+
+        def tracked_hline(x, y, w, c):
+            mark(x, y, w, 1)
+            hline(x, y, w, c)
+
+        def tracked_vline(x, y, h, c):
+            mark(x, y, 1, h)
+            vline(x, y, h, c)
+
+        def tracked_fill_rect(x, y, w, h, c):
+            mark(x, y, w, h)
+            fill_rect(x, y, w, h, c)
+
+        def tracked_rect(x, y, w, h, c, f=False):
+            if f:
+                mark(x, y, w, h)
+            else:
+                # the four sides as framebuf draws them, even when w or h is 0 or less.
+                mark(x, y, w, 1)
+                mark(x, y + h - 1, w, 1)
+                mark(x, y, 1, h)
+                mark(x + w - 1, y, 1, h)
+            rect(x, y, w, h, c, f)
+
+        def tracked_line(x1, y1, x2, y2, c):
+            mark(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+            line(x1, y1, x2, y2, c)
+
+        def tracked_text(s, x, y, *c):
+            mark(x, y, len(s.encode()) * DEF_CHAR_PIX, DEF_CHAR_PIX)
+            text(s, x, y, *c)
+
+        def tracked_blit(fbuf, x, y, *args):
+            size = _blit_size(fbuf)
+            if size is None:
+                mark(0, 0, width, height)
+            else:
+                mark(x, y, size[0], size[1])
+            blit(fbuf, x, y, *args)
+
+        def tracked_fill(c):
+            mark(0, 0, width, height)
+            fill(c)
+
+        def tracked_scroll(xstep, ystep):
+            mark(0, 0, width, height)
+            scroll(xstep, ystep)
+
+        self.pixel = tracked_pixel
+        self.hline = tracked_hline
+        self.vline = tracked_vline
+        self.fill_rect = tracked_fill_rect
+        self.rect = tracked_rect
+        self.line = tracked_line
+        self.text = tracked_text
+        self.blit = tracked_blit
+        self.fill = tracked_fill
+        self.scroll = tracked_scroll
+
+    def _count_primitives(self):
+        """
+        Wraps the internal primitives so that the profiler counts the calls made and the
+        pixels asked for.
+        """
+        profiler = self.profiler
+        pixel = self._pixel
+        hline = self._hline
+        vline = self._vline
+        fill_rect = self._fill_rect
+        line = self._line
+        blit = self._blit
+
+        def counted_pixel(x, y, *c):
+            profiler.primitives += 1
+            profiler.pixels += 1
+            return pixel(x, y, *c)
+
+        def counted_hline(x, y, w, c):
+            profiler.primitives += 1
+            profiler.pixels += w
+            hline(x, y, w, c)
+
+        def counted_vline(x, y, h, c):
+            profiler.primitives += 1
+            profiler.pixels += h
+            vline(x, y, h, c)
+
+        def counted_fill_rect(x, y, w, h, c):
+            profiler.primitives += 1
+            profiler.pixels += w * h
+            fill_rect(x, y, w, h, c)
+
+        def counted_line(x1, y1, x2, y2, c):
+            profiler.primitives += 1
+            profiler.pixels += max(abs(x2 - x1), abs(y2 - y1)) + 1
+            line(x1, y1, x2, y2, c)
+
+        def counted_blit(fbuf, x, y, *args):
+            profiler.primitives += 1
+            size = _blit_size(fbuf)
+            if size is not None:
+                profiler.pixels += size[0] * size[1]
+            blit(fbuf, x, y, *args)
+
+        self._pixel = counted_pixel
+        self._hline = counted_hline
+        self._vline = counted_vline
+        self._fill_rect = counted_fill_rect
+        self._line = counted_line
+        self._blit = counted_blit
+
+    def _clip_primitives(self):
+        """
+        Wraps the internal pixel, hline, vline, fill_rect, line and blit primitives so
+        that they only draw inside the clip rectangle, and move what they draw by the
+        origin.  Lines and blits that are cut by the clip rectangle are drawn one pixel at
+        a time.  A blit source of unknown size is drawn whole.
+        """
+        left, top, right, bottom = self._clip
+        ox, oy = self._origin
+        pixel = self._pixel
+        hline = self._hline
+        vline = self._vline
+        fill_rect = self._fill_rect
+        line = self._line
+        blit = self._blit
+
+        def clipped_pixel(x, y, *c):
+            if c and (x < left or x >= right or y < top or y >= bottom):
+                return
+            return pixel(x - ox, y - oy, *c)
+
+        def clipped_hline(x, y, w, c):
+            if y < top or y >= bottom:
+                return
+            if x < left:
+                w -= left - x
+                x = left
+            if x + w > right:
+                w = right - x
+            if w > 0:
+                hline(x - ox, y - oy, w, c)
+
+        def clipped_vline(x, y, h, c):
+            if x < left or x >= right:
+                return
+            if y < top:
+                h -= top - y
+                y = top
+            if y + h > bottom:
+                h = bottom - y
+            if h > 0:
+                vline(x - ox, y - oy, h, c)
+
+        def clipped_fill_rect(x, y, w, h, c):
+            if x < left:
+                w -= left - x
+                x = left
+            if x + w > right:
+                w = right - x
+            if y < top:
+                h -= top - y
+                y = top
+            if y + h > bottom:
+                h = bottom - y
+            if w > 0 and h > 0:
+                fill_rect(x - ox, y - oy, w, h, c)
+
+        def clipped_line(x1, y1, x2, y2, c):
+            if x1 < x2:
+                x_min, x_max = x1, x2
+            else:
+                x_min, x_max = x2, x1
+            if y1 < y2:
+                y_min, y_max = y1, y2
+            else:
+                y_min, y_max = y2, y1
+            if x_max < left or x_min >= right or y_max < top or y_min >= bottom:
+                return
+            if x_min >= left and x_max < right and y_min >= top and y_max < bottom:
+                line(x1 - ox, y1 - oy, x2 - ox, y2 - oy, c)
+            else:
+                _clipped_line(clipped_pixel, x1, y1, x2, y2, c, left, top, right, bottom)
+
+        def clipped_blit(fbuf, x, y, key=-1, palette=None):
+            size = _blit_size(fbuf)
+            if size is None:
+                blit(fbuf, x - ox, y - oy, key, palette)
+                return
+            w, h = size
+            if x >= right or y >= bottom or x + w <= left or y + h <= top:
+                return
+            if x >= left and y >= top and x + w <= right and y + h <= bottom:
+                blit(fbuf, x - ox, y - oy, key, palette)
+            else:
+                _clipped_blit(
+                    clipped_pixel, fbuf, x, y, w, h, key, palette, left, top, right, bottom
+                )
+
+        self._pixel = clipped_pixel
+        self._hline = clipped_hline
+        self._vline = clipped_vline
+        self._fill_rect = clipped_fill_rect
+        self._line = clipped_line
+        self._blit = clipped_blit
+
+    def _translate_primitives(self):
+        """
+        Wraps the inherited primitives so that they draw moved by the origin.  The buffer
+        itself clips what they draw.
+        """
+        ox, oy = self._origin
+        pixel = self.pixel
+        hline = self.hline
+        vline = self.vline
+        fill_rect = self.fill_rect
+        rect = self.rect
+        line = self.line
+        text = self.text
+        blit = self.blit
+
+        def moved_pixel(x, y, *c):
+            return pixel(x - ox, y - oy, *c)
+
+        def moved_hline(x, y, w, c):
+            hline(x - ox, y - oy, w, c)
+
+        def moved_vline(x, y, h, c):
+            vline(x - ox, y - oy, h, c)
+
+        def moved_fill_rect(x, y, w, h, c):
+            fill_rect(x - ox, y - oy, w, h, c)
+
+        def moved_rect(x, y, w, h, c, *f):
+            rect(x - ox, y - oy, w, h, c, *f)
+
+        def moved_line(x1, y1, x2, y2, c):
+            line(x1 - ox, y1 - oy, x2 - ox, y2 - oy, c)
+
+        def moved_text(s, x, y, *c):
+            text(s, x - ox, y - oy, *c)
+
+        def moved_blit(fbuf, x, y, *args):
+            blit(fbuf, x - ox, y - oy, *args)
+
+        self.pixel = moved_pixel
+        self.hline = moved_hline
+        self.vline = moved_vline
+        self.fill_rect = moved_fill_rect
+        self.rect = moved_rect
+        self.line = moved_line
+        self.text = moved_text
+        self.blit = moved_blit
+
+    def _record_primitives(self):
+        """
+        Replaces the inherited and internal primitives with ones that add commands to the
+        display list being recorded instead of drawing.  rect() and fill() are recorded as
+        the lines and rectangles they draw.  Reading a pixel still reads the buffer.
+        """
+        add = self._recording._add
+        pixel = self.pixel
+        width = self.width
+        height = self.height
+
+        def record_pixel(x, y, *c):
+            if not c:
+                return pixel(x, y)
+            add(_DL_PIXEL, x, y, 1, 1, c[0])
+
+        def record_hline(x, y, w, c):
+            add(_DL_HLINE, x, y, w, 1, c)
+
+        def record_vline(x, y, h, c):
+            add(_DL_VLINE, x, y, 1, h, c)
+
+        def record_fill_rect(x, y, w, h, c):
+            add(_DL_RECT, x, y, w, h, c)
+
+        def record_rect(x, y, w, h, c, f=False):
+            if f:
+                add(_DL_RECT, x, y, w, h, c)
+            else:
+                # the four sides exactly as framebuf draws them, even when w or h is 0.
+                add(_DL_HLINE, x, y, w, 1, c)
+                add(_DL_HLINE, x, y + h - 1, w, 1, c)
+                add(_DL_VLINE, x, y, 1, h, c)
+                add(_DL_VLINE, x + w - 1, y, 1, h, c)
+
+        def record_line(x1, y1, x2, y2, c):
+            op = _DL_LINE
+            if x1 > x2:
+                op += 1
+            if y1 > y2:
+                op += 2
+            add(op, min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1, c)
+
+        def record_text(s, x, y, c=1):
+            add(_DL_TEXT, x, y, len(s.encode()) * DEF_CHAR_PIX, DEF_CHAR_PIX, c, s)
+
+        def record_blit(fbuf, x, y, key=-1, palette=None):
+            size = _blit_size(fbuf)
+            if size is None:
+                # unknown size: replayed whenever the buffer origin is in the area.
+                size = (width - x, height - y)
+            add(_DL_BLIT, x, y, size[0], size[1], 0, (fbuf, key, palette))
+
+        def record_fill(c):
+            add(_DL_RECT, 0, 0, width, height, c)
+
+        def record_scroll(xstep, ystep):
+            raise ValueError("scroll() cannot be recorded in a display list.")
+
+        self.pixel = self._pixel = record_pixel
+        self.hline = self._hline = record_hline
+        self.vline = self._vline = record_vline
+        self.fill_rect = self._fill_rect = record_fill_rect
+        self.rect = record_rect
+        self.line = self._line = record_line
+        self.text = record_text
+        self.blit = self._blit = record_blit
+        self.fill = record_fill
+        self.scroll = record_scroll
 
-# Number of pixels between each line of text.  Line height of text
-# is calculated based on the DEF_CHAR_PIX value.
-LINE_LEADING_PIX = 4
+    def begin_record(self):
+        """
+        Starts recording drawing into a display list instead of drawing on the buffer.
+        Every drawing method, including the inherited framebuf primitives, is recorded
+        until end_record() is called.  Commands are recorded without clipping, and are
+        clipped when replayed by the clip rectangle of the buffer they are drawn on.  The
+        framebuf2 drawing methods still skip parts, such as characters, that lie wholly
+        outside the clip rectangle set while recording.
+        """
+        if self._recording is not None:
+            raise ValueError("Already recording a display list.")
+        self._recording = DisplayList()
+        # nothing is drawn while recording, so nothing is dirty.
+        self._recording_dirty = self._dirty
+        self._dirty = None
+        self._rebind()
 
-# Characters that demark a word.
-WORD_DELIM = " -.\t"
+    def end_record(self) -> DisplayList:
+        """
+        Stops recording and returns the recorded DisplayList.
+        """
+        if self._recording is None:
+            raise ValueError("Not recording a display list.")
+        recording = self._recording
+        self._recording = None
+        self._dirty = self._recording_dirty
+        self._recording_dirty = None
+        self._rebind()
+        return recording
+
+    def render_bands(self, source, sink, width, height, bg: int = 0):
+        """
+        Draws a frame larger than this buffer through it, one band (or tile) the size of
+        the buffer at a time, so the memory needed is set by the buffer rather than the
+        frame.  Each band is cleared, drawn with the origin moved to its position, and
+        passed to sink.  Drawing that crosses band edges is split exactly.  When source is
+        a display list, each band only visits the commands that draw on it.
 
+        Arguments:
+        source -- DisplayList to replay, or a function called as source(fb) to draw the
+                frame in frame coordinates.
+        sink -- Function called as sink(fb, x, y, w, h) with each finished band, where
+                x, y, w, h is the part of the frame held in the top left corner of fb.
+        width -- Width of the frame in pixels.
+        height -- Height of the frame in pixels.
+        bg -- Colour each band is cleared to before drawing.
+        """
+        columns = (width + self.width - 1) // self.width
+        rows = (height + self.height - 1) // self.height
+        index = None
+        if isinstance(source, DisplayList):
+            index = source._tile_index(self.width, self.height, columns, rows)
+        try:
+            for row in range(rows):
+                y = row * self.height
+                for column in range(columns):
+                    x = column * self.width
+                    self.set_origin(x, y)
+                    self.fill(bg)
+                    if index is None:
+                        source(self)
+                    else:
+                        tile = index[row * columns + column]
+                        source._run(self, tile, 0, 0, x, y, x + self.width, y + self.height)
+                    sink(self, x, y, min(self.width, width - x), min(self.height, height - y))
+        finally:
+            self.set_origin()
+
+    def set_origin(self, x: int = 0, y: int = 0):
+        """
+        Moves the drawing coordinates so that the point x, y is drawn at the top left
+        corner of the buffer.  All drawing methods, including the inherited framebuf
+        primitives, are moved.  The clip rectangle is reset to the whole buffer at its new
+        position.  Used to draw a large frame through a small buffer, one part at a time.
+
+        Arguments:
+        x -- Drawing x coordinate of the left edge of the buffer.
+        y -- Drawing y coordinate of the top edge of the buffer.
+        """
+        self._origin = (x, y)
+        self._clip = (x, y, x + self.width, y + self.height)
+        self._rebind()
+
+    def set_clip(self, x: int = 0, y: int = 0, w: int = None, h: int = None):
+        """
+        Restricts the framebuf2 drawing methods to the rectangle x, y, w, h.  Text, shapes
+        and scanlines wholly outside it are skipped before any drawing call, and spans
+        are trimmed to it.  Call with no arguments to clip to the whole buffer again.
+        The inherited framebuf primitives are not clipped.  The rectangle is in drawing
+        coordinates, so it moves with the origin.
+
+        Arguments:
+        x -- Left edge of the clip rectangle.
+        y -- Top edge of the clip rectangle.
+        w -- Width of the clip rectangle, or None to reach the right edge of the buffer.
+        h -- Height of the clip rectangle, or None to reach the bottom of the buffer.
+        """
+        ox, oy = self._origin
+        if w is None:
+            w = ox + self.width - x
+        if h is None:
+            h = oy + self.height - y
+        right = min(x + w, ox + self.width)
+        bottom = min(y + h, oy + self.height)
+        x = max(x, ox)
+        y = max(y, oy)
+        # an empty clip rectangle is kept empty rather than turned inside out.
+        self._clip = (x, y, max(x, right), max(y, bottom))
+        self._rebind()
+
+    def get_clip(self) -> tuple:
+        """
+        Returns the clip rectangle as an (x, y, w, h) tuple.
+        """
+        left, top, right, bottom = self._clip
+        return (left, top, right - left, bottom - top)
+
+    def _outside_clip(self, x, y, w, h) -> bool:
+        """
+        Returns True if the rectangle x, y, w, h lies wholly outside the clip rectangle.
+        """
+        clip = self._clip
+        return x >= clip[2] or y >= clip[3] or x + w <= clip[0] or y + h <= clip[1]
+
+    def track_dirty(self, enable: bool = True):
+        """
+        Turns recording of the areas changed by drawing methods on or off.  Turning
+        tracking off discards any areas not yet collected with take_dirty().
+        """
+        if enable:
+            if self._dirty is None:
+                self._dirty = []
+                self._rebind()
+        elif self._dirty is not None:
+            self._dirty = None
+            self._rebind()
+
+    def profile(self, enable: bool = True) -> Profiler:
+        """
+        Turns profiling of the drawing methods on or off.  While it is on, the calls,
+        time, primitive calls and pixels of large_text, large_text_wrap, large_text_fit
+        and the shape methods are collected in the profiler attribute, and the sizes
+        large_text_fit tries are added to its trace.  The async methods are not counted,
+        as the time they take is shared with other tasks.  Nothing is wrapped while it is
+        off.
+
+        Arguments:
+        enable -- True to start profiling, False to stop and discard the results.
+
+        Returns the Profiler, or None when profiling is turned off.
+        """
+        if enable:
+            if self.profiler is None:
+                self.profiler = Profiler()
+                for name in _PROFILED:
+                    setattr(self, name, self.profiler._wrap(name, getattr(self, name)))
+                self._rebind()
+        elif self.profiler is not None:
+            self.profiler = None
+            for name in _PROFILED:
+                delattr(self, name)
+            self._rebind()
+        return self.profiler
+
+    def region(self, name):
+        """
+        Returns a context manager that counts the drawing done inside it under the
+        region name, for example: with fb.region("header"): ...
+        Does nothing while profiling is off.
+        """
+        if self.profiler is None:
+            return _NO_REGION
+        return _Region(self.profiler, name)
+
+    def _mark(self, x, y, w, h):
+        """
+        Records the rectangle x, y, w, h in drawing coordinates as changed.
+        """
+        self._mark_area(x - self._origin[0], y - self._origin[1], w, h)
+
+    def _mark_area(self, x, y, w, h):
+        """
+        Records the rectangle x, y, w, h of the buffer as changed, merging it with any
+        recorded rectangles it overlaps or touches.
+        """
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        x = max(x, 0)
+        y = max(y, 0)
+        if x >= x1 or y >= y1:
+            return
+        dirty = self._dirty
+        i = 0
+        while i < len(dirty):
+            d = dirty[i]
+            if x <= d[2] and d[0] <= x1 and y <= d[3] and d[1] <= y1:
+                x = min(x, d[0])
+                y = min(y, d[1])
+                x1 = max(x1, d[2])
+                y1 = max(y1, d[3])
+                dirty.pop(i)
+                # the grown rectangle may now reach ones already checked.
+                i = 0
+            else:
+                i += 1
+        if len(dirty) >= MAX_DIRTY_RECTS:
+            # too many separate areas: fold them all into one bounding box.
+            for d in dirty:
+                x = min(x, d[0])
+                y = min(y, d[1])
+                x1 = max(x1, d[2])
+                y1 = max(y1, d[3])
+            dirty.clear()
+        dirty.append((x, y, x1, y1))
+
+    def take_dirty(self) -> list:
+        """
+        Returns the areas changed since the last call as a list of (x, y, w, h) tuples
+        and clears the record.  For MONO_VLSB buffers the areas are expanded to whole
+        8-pixel pages, so y and h are multiples of 8 and can be flushed page by page.
+        Returns an empty list when tracking is off.
+        """
+        dirty = self._dirty
+        if not dirty:
+            return []
+        self._dirty = []
+        if self._format == MONO_VLSB:
+            for d in dirty:
+                self._mark_area(d[0], d[1] & ~7, d[2] - d[0], ((d[3] + 7) & ~7) - (d[1] & ~7))
+            dirty = self._dirty
+            self._dirty = []
+        areas = []
+        for d in dirty:
+            areas.append((d[0], d[1], d[2] - d[0], d[3] - d[1]))
+        return areas
+
+    def set_glyph_cache(self, max_bytes):
+        """
+        Enables caching of scaled glyphs drawn by large_text.
+
+        Arguments:
+        max_bytes -- Size of the cache in bytes.  A value of 0 or None disables the cache.
+        """
+        self.glyph_cache = GlyphCache(max_bytes) if max_bytes else None
+
+    def text_field(self, x, y, m, capacity, c: int = 1, bg: int = 0, r: int = 0, t=None):
+        """
+        Creates a TextField on this frame buffer: a fixed-size area of large text that
+        only redraws the characters that change when its value is set.
+        See TextField for the arguments.
+        """
+        return TextField(self, x, y, m, capacity, c, bg, r, t)
+
+    def set_layout_cache(self, max_bytes):
+        """
+        Enables caching of the wrapped lines and chosen size computed by large_text_wrap
+        and large_text_fit, so repeated calls with the same text and window go straight
+        to drawing the glyphs.
+
+        Arguments:
+        max_bytes -- Size of the cache in bytes.  A value of 0 or None disables the cache.
+        """
+        self.layout_cache = LayoutCache(max_bytes) if max_bytes else None
+
+    def set_font(self, font=None):
+        """
+        Draws large_text, and the text methods built on it, with a PackedFont instead of
+        the built-in 8x8 font.  The text is scaled, rotated and wrapped as before, using the
+        advance width of each glyph.  The glyph cache is not used for packed fonts.
+
+        Arguments:
+        font -- PackedFont to draw with, or None to draw with the built-in font again.
+        """
+        self.font = font
 
-class FrameBuffer(framebuf.FrameBuffer):
     def _reverse(self, s: str) -> str:
         t = ""
         for i in range(0, len(s)):
@@ -58,35 +2080,182 @@ class FrameBuffer(framebuf.FrameBuffer):
         optional parameter, r is rotation of the text: 0, 90, 180, or 270 degrees
         optional parameter, t is rotation of each character within the text: 0, 90, 180, or 270 degrees
         """
+        if self.font is not None:
+            self._large_text_font(s, x, y, m, c, r % 360 // 90, r % 360 // 90 if t is None else t % 360 // 90)
+            return
         colour = c
-        smallbuffer = bytearray(8)
-        letter = framebuf.FrameBuffer(smallbuffer, 8, 8, framebuf.MONO_HMSB)
         r = r % 360 // 90
         dx = DEF_CHAR_PIX * m if r in (0, 2) else 0
         dy = DEF_CHAR_PIX * m if r in (1, 3) else 0
-        if r in (2, 3):
-            s = self._reverse(s)
         t = r if t is None else t % 360 // 90
-        a, b, c, d = 1, 0, 0, 1
-        for i in range(0, t):
-            a, b, c, d = c, d, -a, -b
-        x0 = 0 if a + c > 0 else 7
-        y0 = 0 if b + d > 0 else 7
+        size = DEF_CHAR_PIX * m
+        n = len(s)
+        if self._dirty is not None:
+            self._mark(x, y, n * size if dx else size, n * size if dy else size)
+        # only the characters inside the clip rectangle are looked at.
+        left, top, right, bottom = self._clip
+        if dx:
+            if y >= bottom or y + size <= top:
+                return
+            first = (left - x) // size
+            last = (right - x + size - 1) // size
+        else:
+            if x >= right or x + size <= left:
+                return
+            first = (top - y) // size
+            last = (bottom - y + size - 1) // size
+        first = max(first, 0)
+        last = min(last, n)
+        if first >= last:
+            return
+        if r in (2, 3):
+            s = self._reverse(s[n - last : n - first])
+        elif first > 0 or last < n:
+            s = s[first:last]
+        x += first * dx
+        y += first * dy
+        # a blit cut by the clip rectangle is copied pixel by pixel, so cached glyphs cut by
+        # it are drawn directly instead.  blit itself clips to the buffer.
+        clipped = self._clip != (0, 0, self.width, self.height)
+        table = _font_table(t)
+        fill_rect = self._fill_rect
+        hline = self._hline
+        cache = self.glyph_cache
+        if self._recording is not None:
+            # display lists keep the runs of each glyph rather than a cached glyph of unknown size.
+            cache = None
         for character in s:
-            letter.fill(0)
-            letter.text(character, 0, 0, 1)
-            for i in range(0, 8):
-                for j in range(0, 8):
-                    if letter.pixel(i, j) == 1:
-                        p = x0 + a * i + c * j
-                        q = y0 + b * i + d * j
-                        if m == 1:
-                            self.pixel(x + p, y + q, colour)
-                        else:
-                            self.fill_rect(x + p * m, y + q * m, m, m, colour)
+            if cache is None or clipped and (
+                x < left or y < top or x + size > right or y + size > bottom
+            ):
+                _draw_glyph(fill_rect, hline, table, _glyph_offset(character), x, y, m, colour)
+            else:
+                key = (character, m, t, colour, self._format)
+                glyph = cache.get(key)
+                if glyph is None:
+                    glyph = self._make_glyph(table, character, m, colour)
+                    if not cache.put(key, glyph, glyph[2]):
+                        _draw_glyph(
+                            fill_rect, hline, table, _glyph_offset(character), x, y, m, colour
+                        )
+                        x += dx
+                        y += dy
+                        continue
+                self._blit(glyph[0], x, y, glyph[1])
             x += dx
             y += dy
 
+    def _large_text_font(self, s, x, y, m, colour, r, t):
+        """
+        Draws large_text with the font set by set_font, given the rotations r and t in
+        quarter turns.  Characters wholly outside the clip rectangle are skipped, and
+        drawing stops at the far edge of the clip rectangle.
+        """
+        if self._dirty is not None:
+            self._mark(*self._text_area(s, x, y, m, r, t))
+        if r in (2, 3):
+            s = self._reverse(s)
+        font = self.font
+        # glyphs turned sideways to the line are one font height apart.
+        along = (t - r) % 2 == 0
+        left, top, right, bottom = self._clip
+        fill_rect = self._fill_rect
+        hline = self._hline
+        for character in s:
+            if x >= right or y >= bottom:
+                break
+            rows, w, h, advance = font.glyph(character, t)
+            if x + w * m > left and y + h * m > top:
+                _draw_glyph(fill_rect, hline, rows, 0, x, y, m, colour, h)
+            step = (advance if along else font.height) * m
+            if r in (0, 2):
+                x += step
+            else:
+                y += step
+
+    def _advance(self, character, m, along) -> int:
+        """
+        Returns the distance large_text moves along the line after character at size m.
+        """
+        font = self.font
+        if font is None:
+            return DEF_CHAR_PIX * m
+        return (font.advance(character) if along else font.height) * m
+
+    def _text_area(self, s, x, y, m, r, t) -> tuple:
+        """
+        Returns the x, y, w, h area that large_text draws s on, given the rotations r and t
+        in quarter turns.
+        """
+        font = self.font
+        along = (t - r) % 2 == 0
+        length = 0
+        for character in s:
+            length += self._advance(character, m, along)
+        if font is None:
+            across = DEF_CHAR_PIX * m
+        else:
+            across = (font.height if along else font.max_width) * m
+        if r in (0, 2):
+            return (x, y, length, across)
+        return (x, y, across, length)
+
+    def blit_scaled(self, src, x, y, m: int = 1, rotation: int = 0, key=None, palette=None):
+        """
+        Blit function that scales the source by m and rotates it clockwise.  Each run of
+        pixels of one colour in a row is drawn with one fill_rect (or hline when m is 1),
+        and identical rows are merged, as for the glyphs of large_text.
+
+        Arguments:
+        src -- Sprite, framebuf2 FrameBuffer, or a (buffer, width, height, format [, stride])
+                tuple.  Make a Sprite of a source that is drawn often, to keep its colour
+                masks and rotated copies.
+        x -- x coordinate of the upper-left corner of the scaled image.
+        y -- y coordinate of the upper-left corner of the scaled image.
+        m -- Factor to scale the source by.
+        rotation -- Rotation of the source: 0, 90, 180, or 270 degrees.
+        key -- Colour that is not drawn, compared after the palette.
+        palette -- FrameBuffer, or a tuple as for src, giving the colour of each source
+                colour c as its pixel (c, 0).
+
+        Throws a ValueError exception if a key or palette is given with a Sprite, which has its own.
+        """
+        if isinstance(src, Sprite):
+            if key is not None or palette is not None:
+                raise ValueError("the key and palette of a Sprite are set when it is made.")
+        else:
+            src = Sprite(src, key, palette)
+        rotation = rotation % 360 // 90
+        if rotation % 2:
+            w, h = src.height, src.width
+        else:
+            w, h = src.width, src.height
+        if self._outside_clip(x, y, w * m, h * m):
+            return
+        if self._dirty is not None:
+            self._mark(x, y, w * m, h * m)
+        fill_rect = self._fill_rect
+        hline = self._hline
+        for colour, rows in src.layers(rotation):
+            _draw_glyph(fill_rect, hline, rows, 0, x, y, m, colour, h)
+
+    def _make_glyph(self, table, character, m, colour):
+        """
+        Renders a character into a new buffer in this frame buffer's format, ready for blit.
+        Returns a (glyph, key colour, size in bytes) tuple for the glyph cache.
+        """
+        size = DEF_CHAR_PIX * m
+        nbytes = _buffer_bytes(size, size, self._format)
+        glyph = framebuf.FrameBuffer(bytearray(nbytes), size, size, self._format)
+        # the key colour must differ from the colour value actually stored for c.
+        glyph.pixel(0, 0, colour)
+        key = 1 if glyph.pixel(0, 0) == 0 else 0
+        glyph.fill(key)
+        _draw_glyph(
+            glyph.fill_rect, glyph.hline, table, _glyph_offset(character), 0, 0, m, colour
+        )
+        return (glyph, key, nbytes)
+
     def large_text_wrap(self, s, x, y, m, c: int = 1, max_line_pixels=0):
         """
         Text drawing function that supports larger text and wraps the text to the next line at the specified maximum width.
@@ -101,27 +2270,133 @@ class FrameBuffer(framebuf.FrameBuffer):
         c -- Color of the text.
         max_line_pixels -- Maximum line size before wrapping text expressed in number of pixels.
         """
+        self._draw_lines(s, x, y, m, c, self._wrap_layout(s, m, max_line_pixels))
+
+    def _wrap_layout(self, s, m, max_line_pixels):
+        """
+        Returns the (start, end, hyphenate) spans of the lines large_text_wrap draws, from
+        the layout cache if there is one.
+        """
         if max_line_pixels <= 0:
             raise ValueError(
                 "line_width_pixels must be a non-zero number reflecting the maximum line width in pixels."
             )
 
-        max_chars = self._calc_line_width(m, max_line_pixels)
+        cache = self.layout_cache
+        if cache is not None:
+            key = (s, m, max_line_pixels, 0, self.font)
+            layout = cache.get(key)
+            if layout is None:
+                layout = self._cache_layout(key, m, max_line_pixels)
+            return _unpack_spans(layout[1])
+
+        # lines are wrapped as they are drawn; none are computed below the buffer.
+        return self._wrap(s, m, max_line_pixels)
+
+    def _wrap(self, s, m, max_line_pixels):
+        """
+        Generator yielding the (start, end, hyphenate) spans of s wrapped at size m, by
+        character count for the built-in font or by advance width for a packed font.
+        """
+        font = self.font
+        return MicroTextWrapper().wrap_spans(
+            s, self._calc_line_width(m, max_line_pixels), None if font is None else font.advance
+        )
+
+    def _cache_layout(self, key, m, max_line_pixels) -> tuple:
+        """
+        Wraps the text of a layout cache key at size m and stores the (m, spans) layout.
+        """
+        s = key[0]
+        layout = (m, _pack_spans(self._wrap(s, m, max_line_pixels), len(s)))
+        nbytes = len(s) + len(layout[1]) * (2 if len(s) <= 0xFFFF else 4) + 64
+        self.layout_cache.put(key, layout, nbytes)
+        return layout
+
+    def _draw_lines(self, s, x, y, m, c, spans):
+        """
+        Draws the lines of s given by (start, end, hyphenate) spans, from x, y down.
+        Stops at the bottom of the clip rectangle.
+        """
+        for line, curr_y in self._lines(s, y, m, spans):
+            self.large_text(line, x, curr_y, m, c)
 
-        wrapper = MicroTextWrapper()
-        wrapped_lines = wrapper.wrap_text(s, max_chars)
+    def _lines(self, s, y, m, spans):
+        """
+        Yields the (text, y) of each non-empty line of s given by (start, end, hyphenate)
+        spans, from y down.  Stops at the bottom of the clip rectangle.
+        """
         curr_y = y
         line_y = self._calc_line_space(m)
-        for line in wrapped_lines:
-            if line.strip != "":
-                self.large_text(line, x, curr_y, m, c)
+        bottom = self._clip[3]
+        for start, end, hyphenate in spans:
+            if curr_y >= bottom:
+                break
+            if hyphenate:
+                yield (s[start:end] + HYPHEN, curr_y)
+            elif end > start:
+                yield (s[start:end], curr_y)
             curr_y += line_y
 
+    def measure_text(self, s, m, max_line_pixels) -> tuple:
+        """
+        Measures the text that large_text_wrap would draw, without drawing or building the lines.
+
+        Arguments:
+        s -- String to measure.
+        m -- Factor to increase the default font size.
+        max_line_pixels -- Maximum line size before wrapping text expressed in number of pixels.
+
+        Returns a (lines, width, height) tuple: the number of wrapped lines and the width and
+        height in pixels of the area the text covers.
+        """
+        font = self.font
+        lines = 0
+        widest = 0
+        for start, end, hyphenate in self._wrap(s, m, max_line_pixels):
+            lines += 1
+            if font is None:
+                n = (end - start + 1 if hyphenate else end - start) * DEF_CHAR_PIX
+            else:
+                n = font.advance(HYPHEN) if hyphenate else 0
+                for i in range(start, end):
+                    n += font.advance(s[i])
+            if n > widest:
+                widest = n
+        width = widest * m
+        height = (lines - 1) * self._calc_line_space(m) + self._char_height() * m
+        return (lines, width, height)
+
+    def _fits(self, s, m, max_line_pixels, max_num_lines_pixels, verbose) -> bool:
+        """
+        Determines whether s wraps into no more lines than fit in the window at scale m.
+        Stops counting lines as soon as the limit is exceeded.
+        """
+        if max_line_pixels < self._char_width() * m:
+            return False
+        max_lines = self._calc_max_lines(m, max_num_lines_pixels)
+        lines = 0
+        for span in self._wrap(s, m, max_line_pixels):
+            lines += 1
+            if lines > max_lines:
+                break
+        if verbose or self.profiler is not None:
+            message = (
+                "factor = " + str(m) + " max_lines = " + str(max_lines)
+                + " wrapped_lines " + (">" if lines > max_lines else "=") + " " + str(lines)
+            )
+            if self.profiler is not None:
+                self.profiler.note(message)
+            if verbose:
+                print(message)
+        return lines <= max_lines
+
     def large_text_fit(
-        self, s, x, y, m, max_line_pixels, max_num_lines_pixels, c:int = 0 
-    ):
+        self, s, x, y, m, max_line_pixels, max_num_lines_pixels, c: int = 0, verbose: bool = False
+    ) -> int:
         """
-        Draws text that attempts to fit in the specified space.  I will scale the text down by 1 factor to fit as it can.
+        Draws text that attempts to fit in the specified space.  It will draw the text at the largest
+        size, up to m, at which the wrapped text fits.
 
         Rotational parameters (r and t) are not supported.
 
@@ -129,14 +2404,27 @@ class FrameBuffer(framebuf.FrameBuffer):
         s -- String to display and wrap.
         x -- x coordinate to start writing the text.
         y -- y coordinate to start writing the text.
-        m -- Preferred factor to increase the default font size.  It will be scaled down 1 factor if the text is too long to fit.
+        m -- Preferred factor to increase the default font size.  It will be scaled down if the text is too long to fit.
         max_line_pixels -- Maximum line size before wrapping text expressed in number of pixels.
         max_num_lines_pixels -- Maximum number of pixels that can be allocated in the vertical (Y) plane.  Translates to number of lines
                 of text.
         c -- Color of the text.
+        verbose -- Print the scale factors tried to the console.
+
+        Returns the factor the text was drawn at.
 
         Throws a ValueError exception if the string is too long to fit in the window when scaled down to a factor of 1.
         """
+        for layout in self._fit_layout(s, m, max_line_pixels, max_num_lines_pixels, verbose):
+            pass
+        self._draw_lines(s, x, y, layout[0], c, layout[1])
+        return layout[0]
+
+    def _fit_layout(self, s, m, max_line_pixels, max_num_lines_pixels, verbose):
+        """
+        Finds the size large_text_fit draws s at.  Yields None between the sizes tried,
+        then the (size, spans) layout of the lines to draw.
+        """
         if max_line_pixels <= 0:
             raise ValueError(
                 "line_width_pixels must be a non-zero number reflecting the maximum line width in pixels."
@@ -145,52 +2433,80 @@ class FrameBuffer(framebuf.FrameBuffer):
             raise ValueError(
                 "line_width_pixels must be a non-zero number reflecting the maximum line width in pixels."
             )
-        
-        max_chars = self._calc_line_width(m, max_line_pixels)
-        max_lines = self._calc_max_lines(m, max_num_lines_pixels)
-        print ("max_lines=" + str(max_lines) + " factor = " + str(m))
-
-        wrapper = MicroTextWrapper()
-        wrapped_lines = wrapper.wrap_text(s, max_chars)
-        print("wrapped_lines = " + str(len(wrapped_lines)))
-        print("max_lines = " + str(max_lines))
-        while ((len(wrapped_lines) > max_lines) and (m > 1)):
-            m = m - 1
-            print ("factor is now " + str(m))
-            max_chars = self._calc_line_width(m, max_line_pixels)
-            max_lines = self._calc_max_lines(m, max_num_lines_pixels)
-            wrapped_lines = wrapper.wrap_text(s, max_chars)
-            print("max_lines = " + str(max_lines) + "wrapped_lines = " + str(len(wrapped_lines)))
-
-        if len(wrapped_lines) > max_lines:
+
+        cache = self.layout_cache
+        if cache is not None:
+            key = (s, m, max_line_pixels, max_num_lines_pixels, self.font)
+            layout = cache.get(key)
+            if layout is not None:
+                yield (layout[0], _unpack_spans(layout[1]))
+                return
+
+        # fewer lines fit as the factor grows and the text wraps into more lines, so the
+        # largest fitting factor is found with a binary search, trying the preferred one first.
+        best = 0
+        if self._fits(s, m, max_line_pixels, max_num_lines_pixels, verbose):
+            best = m
+        else:
+            low = 1
+            high = m - 1
+            while low <= high:
+                yield None
+                mid = (low + high) // 2
+                if self._fits(s, mid, max_line_pixels, max_num_lines_pixels, verbose):
+                    best = mid
+                    low = mid + 1
+                else:
+                    high = mid - 1
+
+        if best == 0:
             raise ValueError(
                 "The specified string 's' cannot fit is the specified window of " + 
                 str(max_line_pixels) + "x" + str(max_num_lines_pixels)
             )
 
-        curr_y = y
-        line_y = self._calc_line_space(m)
-        for line in wrapped_lines:
-            if line.strip != "":
-                self.large_text(line, x, curr_y, m, c)
-            curr_y += line_y
+        if cache is not None:
+            spans = _unpack_spans(self._cache_layout(key, best, max_line_pixels)[1])
+        else:
+            spans = self._wrap(s, best, max_line_pixels)
+        yield (best, spans)
 
     def _calc_line_space(self, m) -> int:
         """
         Determines the number of pixels to allocate to a single line of text.
         """
-        line_pix = (DEF_CHAR_PIX * m) + LINE_LEADING_PIX
+        line_pix = (self._char_height() * m) + LINE_LEADING_PIX
         return line_pix
 
+    def _char_width(self) -> int:
+        """
+        Returns the width in pixels of the widest character of the font at size 1.
+        """
+        return DEF_CHAR_PIX if self.font is None else self.font.max_width
+
+    def _char_height(self) -> int:
+        """
+        Returns the height in pixels of the font at size 1.
+        """
+        return DEF_CHAR_PIX if self.font is None else self.font.height
+
     def _calc_line_width(self, m, max_line_pixels) -> int:
         """
         Determine how many characters can be written in a single line of text given the specified number pixels.
+        With a packed font, returns the width of the line in pixels at size 1 instead.
 
         Arguments:
         m -- Factor used to increase the default font size.
         max_line_pixels -- Maximum line size before wrapping text expressed in number of pixels.
         """
 
+        if self.font is not None:
+            if max_line_pixels // m < self.font.max_width:
+                raise ValueError(
+                    "line_width_pixels must large enough to accommodate the widest character \
+                             of the font at the specified character size (multiplier)."
+                )
+            return max_line_pixels // m
         max_chars = max_line_pixels // (DEF_CHAR_PIX * m)
         if max_chars < 1:
             raise ValueError(
@@ -207,7 +2523,7 @@ class FrameBuffer(framebuf.FrameBuffer):
         m -- Factor used to increase the default font size.
         max_line_pixels -- Maximum line size before wrapping text expressed in number of pixels.
         """
-        max_lines = max_num_lines_pixels // ((DEF_CHAR_PIX + LINE_LEADING_PIX) * m)
+        max_lines = max_num_lines_pixels // ((self._char_height() + LINE_LEADING_PIX) * m)
         return max_lines
 
     def circle(self, x0, y0, radius, c, f: bool = None):
@@ -217,16 +2533,21 @@ class FrameBuffer(framebuf.FrameBuffer):
         colour c
         fill if f is True
         """
+        if self._outside_clip(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1):
+            return
+        if self._dirty is not None:
+            self._mark(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1)
         if f is None or f != True:
+            pixel = self._pixel
             g = 1 - radius
             ddG_x = 1
             ddG_y = -2 * radius
             x = 0
             y = radius
-            self.pixel(x0, y0 + radius, c)
-            self.pixel(x0, y0 - radius, c)
-            self.pixel(x0 + radius, y0, c)
-            self.pixel(x0 - radius, y0, c)
+            pixel(x0, y0 + radius, c)
+            pixel(x0, y0 - radius, c)
+            pixel(x0 + radius, y0, c)
+            pixel(x0 - radius, y0, c)
             while x < y:
                 if g >= 0:
                     y -= 1
@@ -235,33 +2556,235 @@ class FrameBuffer(framebuf.FrameBuffer):
                 x += 1
                 ddG_x += 2
                 g += ddG_x
-                self.pixel(x0 + x, y0 + y, c)
-                self.pixel(x0 - x, y0 + y, c)
-                self.pixel(x0 + x, y0 - y, c)
-                self.pixel(x0 - x, y0 - y, c)
-                self.pixel(x0 + y, y0 + x, c)
-                self.pixel(x0 - y, y0 + x, c)
-                self.pixel(x0 + y, y0 - x, c)
-                self.pixel(x0 - y, y0 - x, c)
+                pixel(x0 + x, y0 + y, c)
+                pixel(x0 - x, y0 + y, c)
+                pixel(x0 + x, y0 - y, c)
+                pixel(x0 - x, y0 - y, c)
+                pixel(x0 + y, y0 + x, c)
+                pixel(x0 - y, y0 + x, c)
+                pixel(x0 + y, y0 - x, c)
+                pixel(x0 - y, y0 - x, c)
         else:
-            self.vline(x0, y0 - radius, 2 * radius + 1, c)
-            g = 1 - radius
-            ddG_x = 1
-            ddG_y = -2 * radius
-            x = 0
-            y = radius
-            while x < y:
-                if g >= 0:
-                    y -= 1
-                    ddG_y += 2
-                    g += ddG_y
-                x += 1
-                ddG_x += 2
-                g += ddG_x
-                self.vline(x0 + x, y0 - y, 2 * y + 1, c)
-                self.vline(x0 + y, y0 - x, 2 * x + 1, c)
-                self.vline(x0 - x, y0 - y, 2 * y + 1, c)
-                self.vline(x0 - y, y0 - x, 2 * x + 1, c)
+            # one span per row, with rows of equal width drawn as a single rectangle.
+            if radius < 0:
+                return
+            self._fill_spans(x0, y0, _disc_table(radius), c)
+
+    def _fill_spans(self, x0, y0, table, c):
+        """
+        Fills a shape that is symmetric about x0, y0, given the half-width of each row
+        offset in table, where -1 leaves the row empty.  Runs of rows with equal width are drawn as one rectangle, and
+        runs outside the clip rectangle are skipped.
+        """
+        self._fill_span_rows(x0, y0, table, c, self._clip[1], self._clip[3])
+
+    def _fill_span_rows(self, x0, y0, table, c, top, bottom):
+        """
+        Fills the rows from top up to bottom of a shape drawn by _fill_spans.
+        """
+        fill_rect = self._fill_rect
+        # only the offsets from y0 of rows between top and bottom.
+        dy = min(len(table) - 1, max(y0 - top, bottom - 1 - y0))
+        low = max(top - y0, y0 - bottom + 1, 0)
+        while dy > 0 and dy >= low:
+            w = table[dy]
+            k = dy - 1
+            while k > 0 and table[k] == w:
+                k -= 1
+            # rows k + 1 to dy, above and below the centre, trimmed to top and bottom.
+            a = max(y0 - dy, top)
+            b = min(y0 - k, bottom)
+            if a < b and w >= 0:
+                fill_rect(x0 - w, a, 2 * w + 1, b - a, c)
+            a = max(y0 + k + 1, top)
+            b = min(y0 + dy + 1, bottom)
+            if a < b and w >= 0:
+                fill_rect(x0 - w, a, 2 * w + 1, b - a, c)
+            dy = k
+        if top <= y0 < bottom:
+            w = table[0]
+            fill_rect(x0 - w, y0, 2 * w + 1, 1, c)
+
+    def ellipse(self, x0, y0, xr, yr, c, f: bool = False, m: int = 0b1111):
+        """
+        Ellipse drawing function.  Draws an ellipse centred at x0, y0 with horizontal
+        radius xr and vertical radius yr, with the same pixels as MicroPython's ellipse().
+        colour c
+        fill if f is True
+        quadrants drawn m [optional parameter, default value m=0b1111]: bit 0 for the
+        top right (Q1), bit 1 for the top left (Q2), bit 2 for the bottom left (Q3) and
+        bit 3 for the bottom right (Q4)
+        """
+        m &= 0b1111
+        if xr == 0 and yr == 0:
+            # the algorithm would never end, so MicroPython draws just the centre.
+            points = ((0, 0),)
+        elif xr < 0 or yr < 0:
+            # negative radii draw a few stray points on MicroPython; reach them all.
+            points = list(_ellipse_points(xr, yr))
+        else:
+            points = None
+        if points is None:
+            w, h = xr, yr
+        elif points:
+            w = max(abs(x) for x, y in points)
+            h = max(abs(y) for x, y in points)
+        else:
+            return
+        if not m or self._outside_clip(x0 - w, y0 - h, 2 * w + 1, 2 * h + 1):
+            return
+        if self._dirty is not None:
+            self._mark(x0 - w, y0 - h, 2 * w + 1, 2 * h + 1)
+        if xr == 0 and yr == 0:
+            self._pixel(x0, y0, c)
+        elif f and points is None:
+            table = _ellipse_table(xr, yr)
+            if m == 0b1111:
+                self._fill_spans(x0, y0, table, c)
+            else:
+                self._fill_quadrants(x0, y0, table, c, m)
+        elif f:
+            fill_rect = self._fill_rect
+            for x, y in points:
+                if m & 1:
+                    fill_rect(x0, y0 - y, x + 1, 1, c)
+                if m & 2:
+                    fill_rect(x0 - x, y0 - y, x + 1, 1, c)
+                if m & 4:
+                    fill_rect(x0 - x, y0 + y, x + 1, 1, c)
+                if m & 8:
+                    fill_rect(x0, y0 + y, x + 1, 1, c)
+        else:
+            if points is None:
+                points = _ellipse_points(xr, yr)
+            pixel = self._pixel
+            for x, y in points:
+                if m & 1:
+                    pixel(x0 + x, y0 - y, c)
+                if m & 2:
+                    pixel(x0 - x, y0 - y, c)
+                if m & 4:
+                    pixel(x0 - x, y0 + y, c)
+                if m & 8:
+                    pixel(x0 + x, y0 + y, c)
+
+    def _fill_quadrants(self, x0, y0, table, c, m):
+        """
+        Fills the quadrants selected by m, as for ellipse(), of a shape given as for
+        _fill_spans, one rectangle per row.  Rows outside the clip rectangle are skipped.
+        """
+        fill_rect = self._fill_rect
+        top = self._clip[1]
+        bottom = self._clip[3]
+        for dy in range(len(table)):
+            w = table[dy]
+            if w < 0:
+                continue
+            if dy == 0:
+                rows = ((y0, m & 0b0110, m & 0b1001),)
+            else:
+                rows = ((y0 - dy, m & 0b0010, m & 0b0001), (y0 + dy, m & 0b0100, m & 0b1000))
+            for y, left, right in rows:
+                if top <= y < bottom and (left or right):
+                    x = x0 - w if left else x0
+                    fill_rect(x, y, (x0 + w if right else x0) - x + 1, 1, c)
+
+    def ring(self, x0, y0, radius, thickness, c):
+        """
+        Ring (annulus) drawing function.  Fills the area between the circle centred at x0, y0
+        with the specified radius and a circle thickness pixels smaller, drawing each pixel once.
+        colour c
+        """
+        self._sector(x0, y0, radius, thickness, 0, 360, c)
+
+    def arc(self, x0, y0, radius, start, end, c, thickness: int = 1):
+        """
+        Arc drawing function.  Draws the part of a ring centred at x0, y0 that runs clockwise
+        from the angle start to the angle end.  Angles are in degrees, with 0 degrees pointing
+        right (3 o'clock) and 90 degrees pointing down (6 o'clock).
+        colour c
+        thickness of the arc in pixels [optional parameter, default value thickness=1]
+        """
+        self._sector(x0, y0, radius, thickness, start, end, c)
+
+    def pie(self, x0, y0, radius, start, end, c, f: bool = True):
+        """
+        Pie (circle sector) drawing function.  Draws the slice of the circle centred at x0, y0
+        that runs clockwise from the angle start to the angle end, with angles as for arc().
+        colour c
+        fill unless f is False, in which case only the arc and the two radii are drawn
+        """
+        if f:
+            self._sector(x0, y0, radius, radius + 1, start, end, c)
+            return
+        self._sector(x0, y0, radius, 1, start, end, c)
+        line = self._line
+        for angle in (start, end):
+            a = angle * math.pi / 180
+            line(x0, y0, x0 + round(radius * math.cos(a)), y0 + round(radius * math.sin(a)), c)
+
+    def _sector(self, x0, y0, radius, thickness, start, end, c):
+        """
+        Fills the pixels of a circle of the given radius that are not in the circle thickness
+        pixels smaller, and that lie clockwise between the angles start and end.  Each row is
+        drawn as at most a few spans: the ring and sector boundaries are the only places where
+        a row can change between drawn and not drawn.
+        """
+        if radius < 0 or thickness < 1:
+            return
+        if self._outside_clip(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1):
+            return
+        if self._dirty is not None:
+            self._mark(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1)
+        outer = _disc_table(radius)
+        inner_radius = radius - thickness
+        inner = _disc_table(inner_radius) if inner_radius >= 0 else None
+        sweep = end - start
+        whole = sweep >= 360 or sweep <= -360
+        start = start % 360
+        sweep = sweep % 360
+        rays = []
+        if not whole:
+            for angle in (start, start + sweep):
+                a = angle * math.pi / 180
+                rays.append((math.cos(a), math.sin(a)))
+        hline = self._hline
+        # only the rows inside the clip rectangle.
+        for dy in range(max(-radius, self._clip[1] - y0), min(radius, self._clip[3] - 1 - y0) + 1):
+            w = outer[abs(dy)]
+            cuts = [-w, w + 1]
+            hole = inner is not None and abs(dy) <= inner_radius
+            if hole:
+                cuts.append(-inner[abs(dy)])
+                cuts.append(inner[abs(dy)] + 1)
+            if not whole:
+                if dy == 0:
+                    cuts.append(0)
+                    cuts.append(1)
+                else:
+                    for ca, sa in rays:
+                        # the boundary ray crosses this row once if it points towards it.
+                        if (sa > 1e-9 and dy > 0) or (sa < -1e-9 and dy < 0):
+                            b = round(dy * ca / sa)
+                            cuts.append(b)
+                            cuts.append(b + 1)
+            cuts = sorted(set(cuts))
+            run = None
+            for i in range(0, len(cuts) - 1):
+                a = cuts[i]
+                if a < -w or a > w:
+                    continue
+                drawn = not (hole and -inner[abs(dy)] <= a <= inner[abs(dy)])
+                if drawn and not whole:
+                    drawn = _in_sector(a, dy, start, sweep)
+                if drawn:
+                    if run is None:
+                        run = a
+                elif run is not None:
+                    hline(x0 + run, y0 + dy, a - run, c)
+                    run = None
+            if run is not None:
+                hline(x0 + run, y0 + dy, w + 1 - run, c)
 
     def triangle(self, x0, y0, x1, y1, x2, y2, c, f: bool = None):
         """
@@ -270,72 +2793,373 @@ class FrameBuffer(framebuf.FrameBuffer):
         colour c
         fill if f is True
         """
+        left = min(x0, x1, x2)
+        top = min(y0, y1, y2)
+        w = max(x0, x1, x2) - left + 1
+        h = max(y0, y1, y2) - top + 1
+        if self._outside_clip(left, top, w, h):
+            return
+        if self._dirty is not None:
+            self._mark(left, top, w, h)
         if f is None or f != True:
-            self.line(x0, y0, x1, y1, c)
-            self.line(x1, y1, x2, y2, c)
-            self.line(x2, y2, x0, y0, c)
+            line = self._line
+            line(x0, y0, x1, y1, c)
+            line(x1, y1, x2, y2, c)
+            line(x2, y2, x0, y0, c)
         else:
-            if y0 > y1:
-                y0, y1 = y1, y0
-                x0, x1 = x1, x0
-            if y1 > y2:
-                y2, y1 = y1, y2
-                x2, x1 = x1, x2
-            if y0 > y1:
-                y0, y1 = y1, y0
-                x0, x1 = x1, x0
-            a = 0
-            b = 0
-            last = 0
-            if y0 == y2:
-                a = x0
-                b = x0
-                if x1 < a:
-                    a = x1
-                elif x1 > b:
-                    b = x1
-                if x2 < a:
-                    a = x2
-                elif x2 > b:
-                    b = x2
-                self.hline(a, y0, b - a + 1, c)
-                return
-            dx01 = x1 - x0
-            dy01 = y1 - y0
-            dx02 = x2 - x0
-            dy02 = y2 - y0
-            dx12 = x2 - x1
-            dy12 = y2 - y1
-            if dy01 == 0:
-                dy01 = 1
-            if dy02 == 0:
-                dy02 = 1
-            if dy12 == 0:
-                dy12 = 1
-            sa = 0
-            sb = 0
-            y = y0
-            if y0 == y1:
-                last = y1 - 1
+            self._fill_triangle(x0, y0, x1, y1, x2, y2, c, self._clip[1], self._clip[3])
+
+    def _fill_triangle(self, x0, y0, x1, y1, x2, y2, c, top, bottom):
+        """
+        Fills the rows from top up to bottom of a triangle, with one hline per row.
+        """
+        hline = self._hline
+        if y0 > y1:
+            y0, y1 = y1, y0
+            x0, x1 = x1, x0
+        if y1 > y2:
+            y2, y1 = y1, y2
+            x2, x1 = x1, x2
+        if y0 > y1:
+            y0, y1 = y1, y0
+            x0, x1 = x1, x0
+        a = 0
+        b = 0
+        last = 0
+        if y0 == y2:
+            a = x0
+            b = x0
+            if x1 < a:
+                a = x1
+            elif x1 > b:
+                b = x1
+            if x2 < a:
+                a = x2
+            elif x2 > b:
+                b = x2
+            if top <= y0 < bottom:
+                hline(a, y0, b - a + 1, c)
+            return
+        dx01 = x1 - x0
+        dy01 = y1 - y0
+        dx02 = x2 - x0
+        dy02 = y2 - y0
+        dx12 = x2 - x1
+        dy12 = y2 - y1
+        if dy01 == 0:
+            dy01 = 1
+        if dy02 == 0:
+            dy02 = 1
+        if dy12 == 0:
+            dy12 = 1
+        # start at the top row and stop before the bottom one.
+        y = max(y0, top)
+        sa = dx01 * (y - y0)
+        sb = dx02 * (y - y0)
+        if y0 == y1:
+            last = y1 - 1
+        else:
+            last = y1
+        y2 = min(y2, bottom - 1)
+        last = min(last, y2)
+        while y <= last:
+            a = x0 + sa // dy01
+            b = x0 + sb // dy02
+            sa += dx01
+            sb += dx02
+            if a > b:
+                a, b = b, a
+            hline(a, y, b - a + 1, c)
+            y += 1
+        sa = dx12 * (y - y1)
+        sb = dx02 * (y - y0)
+        while y <= y2:
+            a = x1 + sa // dy12
+            b = x0 + sb // dy02
+            sa += dx12
+            sb += dx02
+            if a > b:
+                a, b = b, a
+            hline(a, y, b - a + 1, c)
+            y += 1
+
+    async def large_text_async(self, s, x, y, m, c: int = 1, r: int = 0, t=None, budget_us=None):
+        """
+        Draws the same text as large_text, one character at a time, yielding to the
+        asyncio event loop whenever it has drawn for budget_us microseconds.
+
+        Arguments:
+        s, x, y, m, c, r, t -- As for large_text.
+        budget_us -- Time to draw for before yielding (defaults to ASYNC_BUDGET_US).
+        """
+        await self._large_text_slices(s, x, y, m, c, r, t, _Slicer(budget_us))
+
+    async def _large_text_slices(self, s, x, y, m, c, r, t, slicer):
+        r90 = r % 360 // 90
+        t90 = r90 if t is None else t % 360 // 90
+        along = (t90 - r90) % 2 == 0
+        if self._dirty is not None:
+            # the whole string at once, as large_text marks it.
+            self._mark(*self._text_area(s, x, y, m, r90, t90))
+        if r90 in (2, 3):
+            s = self._reverse(s)
+        # the class method, so that a profiler does not count each character as a call.
+        large_text = type(self).large_text
+        for character in s:
+            large_text(self, character, x, y, m, c, r, t)
+            if r90 in (0, 2):
+                x += self._advance(character, m, along)
+            else:
+                y += self._advance(character, m, along)
+            await slicer.pause()
+
+    async def large_text_wrap_async(self, s, x, y, m, c: int = 1, max_line_pixels=0, budget_us=None):
+        """
+        Draws the same text as large_text_wrap, one character at a time, yielding to the
+        asyncio event loop whenever it has drawn for budget_us microseconds.
+
+        Arguments:
+        s, x, y, m, c, max_line_pixels -- As for large_text_wrap.
+        budget_us -- Time to draw for before yielding (defaults to ASYNC_BUDGET_US).
+        """
+        slicer = _Slicer(budget_us)
+        for line, curr_y in self._lines(s, y, m, self._wrap_layout(s, m, max_line_pixels)):
+            await self._large_text_slices(line, x, curr_y, m, c, 0, None, slicer)
+
+    async def large_text_fit_async(
+        self, s, x, y, m, max_line_pixels, max_num_lines_pixels, c: int = 0, verbose: bool = False,
+        budget_us=None,
+    ) -> int:
+        """
+        Draws the same text as large_text_fit, yielding to the asyncio event loop between
+        the sizes tried and between characters whenever it has run for budget_us microseconds.
+
+        Arguments:
+        s, x, y, m, max_line_pixels, max_num_lines_pixels, c, verbose -- As for large_text_fit.
+        budget_us -- Time to draw for before yielding (defaults to ASYNC_BUDGET_US).
+
+        Returns the factor the text was drawn at.
+
+        Throws a ValueError exception if the string is too long to fit in the window when scaled down to a factor of 1.
+        """
+        slicer = _Slicer(budget_us)
+        for layout in self._fit_layout(s, m, max_line_pixels, max_num_lines_pixels, verbose):
+            await slicer.pause()
+        for line, curr_y in self._lines(s, y, layout[0], layout[1]):
+            await self._large_text_slices(line, x, curr_y, layout[0], c, 0, None, slicer)
+        return layout[0]
+
+    async def circle_async(self, x0, y0, radius, c, f: bool = None, budget_us=None):
+        """
+        Draws the same circle as circle, filling it a few rows at a time and yielding to
+        the asyncio event loop whenever it has drawn for budget_us microseconds.  Outlines
+        are drawn at once.
+
+        Arguments:
+        x0, y0, radius, c, f -- As for circle.
+        budget_us -- Time to draw for before yielding (defaults to ASYNC_BUDGET_US).
+        """
+        if f is None or f != True or radius < 0:
+            self.circle(x0, y0, radius, c, f)
+            return
+        if self._outside_clip(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1):
+            return
+        if self._dirty is not None:
+            self._mark(x0 - radius, y0 - radius, 2 * radius + 1, 2 * radius + 1)
+        args = (x0, y0, _disc_table(radius), c)
+        await self._fill_slices(self._fill_span_rows, args, y0 - radius, y0 + radius + 1, budget_us)
+
+    async def triangle_async(self, x0, y0, x1, y1, x2, y2, c, f: bool = None, budget_us=None):
+        """
+        Draws the same triangle as triangle, filling it a few rows at a time and yielding
+        to the asyncio event loop whenever it has drawn for budget_us microseconds.
+        Outlines are drawn at once.
+
+        Arguments:
+        x0, y0, x1, y1, x2, y2, c, f -- As for triangle.
+        budget_us -- Time to draw for before yielding (defaults to ASYNC_BUDGET_US).
+        """
+        if f is None or f != True:
+            self.triangle(x0, y0, x1, y1, x2, y2, c, f)
+            return
+        left = min(x0, x1, x2)
+        top = min(y0, y1, y2)
+        w = max(x0, x1, x2) - left + 1
+        h = max(y0, y1, y2) - top + 1
+        if self._outside_clip(left, top, w, h):
+            return
+        if self._dirty is not None:
+            self._mark(left, top, w, h)
+        args = (x0, y0, x1, y1, x2, y2, c)
+        await self._fill_slices(self._fill_triangle, args, top, top + h, budget_us)
+
+    async def _fill_slices(self, fill, args, top, bottom, budget_us):
+        """
+        Calls fill with args and the top and bottom of each band of _ASYNC_ROWS rows from
+        top up to bottom inside the clip rectangle, pausing between the bands.
+        """
+        slicer = _Slicer(budget_us)
+        top = max(top, self._clip[1])
+        bottom = min(bottom, self._clip[3])
+        while top < bottom:
+            end = min(top + _ASYNC_ROWS, bottom)
+            fill(*(args + (top, end)))
+            top = end
+            await slicer.pause()
+
+    def polygon(self, points, c, f: bool = None, rule: int = EVEN_ODD):
+        """
+        Polygon drawing function.  Will draw a single pixel wide polygon through the
+        points, closing it from the last point back to the first.
+        points as a flat sequence x0, y0, x1, y1, ... or a sequence of (x, y) pairs
+        colour c
+        fill if f is True, with the fill rule EVEN_ODD or NON_ZERO deciding which parts
+        of a self-intersecting polygon are inside
+        """
+        xs, ys = _polygon_points(points)
+        n = len(xs)
+        if n == 0:
+            return
+        left = min(xs)
+        top = min(ys)
+        w = max(xs) - left + 1
+        h = max(ys) - top + 1
+        if self._outside_clip(left, top, w, h):
+            return
+        if self._dirty is not None:
+            self._mark(left, top, w, h)
+        if f is None or f != True:
+            line = self._line
+            for i in range(1 if n == 2 else n):
+                line(xs[i - 1], ys[i - 1], xs[i], ys[i], c)
+        else:
+            self._fill_polygon(xs, ys, c, rule == NON_ZERO)
+
+    def _fill_polygon(self, xs, ys, c, nonzero):
+        """
+        Scanline polygon fill using an active edge table.  Edges are stepped down the rows
+        with the same integer accumulators as triangle(), so a three point polygon fills
+        exactly the pixels of a filled triangle.  The crossings on each row are paired by
+        the fill rule, merged with any horizontal edges and edge ends on that row, and drawn
+        with one hline per span.  Rows outside the clip rectangle are skipped before any edge is
+        stepped; hline clips the spans horizontally.
+        """
+        top = max(min(ys), self._clip[1])
+        bottom = min(max(ys), self._clip[3] - 1)
+        if top > bottom:
+            return
+        # edge table: [top y, bottom y, top x, dx, dy, direction], sorted by top y.
+        edges = []
+        # spans of horizontal edges and the bottom ends of the other edges, by row.
+        ends = {}
+        for i in range(len(xs)):
+            xa = xs[i - 1]
+            ya = ys[i - 1]
+            xb = xs[i]
+            yb = ys[i]
+            direction = 1
+            if ya > yb:
+                xa, ya, xb, yb = xb, yb, xa, ya
+                direction = -1
+            if yb < top or ya > bottom:
+                continue
+            if ya == yb:
+                span = (xa, xb) if xa < xb else (xb, xa)
             else:
-                last = y1
-            while y <= last:
-                a = x0 + sa // dy01
-                b = x0 + sb // dy02
-                sa += dx01
-                sb += dx02
-                if a > b:
-                    a, b = b, a
-                self.hline(a, y, b - a + 1, c)
+                span = (xb, xb)
+                edges.append([ya, yb, xa, xb - xa, yb - ya, direction])
+            if yb <= bottom:
+                if yb in ends:
+                    ends[yb].append(span)
+                else:
+                    ends[yb] = [span]
+        edges.sort()
+        hline = self._hline
+        active = []
+        k = 0
+        y = top
+        while y <= bottom:
+            # the active edges only change where an edge starts or ends, which is also
+            # the only place where a row can have horizontal edges or edge ends.
+            active = [e for e in active if e[0] > y]
+            while k < len(edges) and edges[k][0] <= y:
+                e = edges[k]
+                k += 1
+                if e[1] > y:
+                    # edges are half open, so that a vertex is only crossed once.
+                    # [bottom y, top x, accumulator, dx, dy, direction]
+                    active.append([e[1], e[2], e[3] * (y - e[0]), e[3], e[4], e[5]])
+            stop = edges[k][0] if k < len(edges) else bottom + 1
+            for e in active:
+                if e[0] < stop:
+                    stop = e[0]
+            if stop > bottom + 1:
+                stop = bottom + 1
+            if y in ends:
+                self._fill_polygon_row(active, ends[y], y, c, nonzero)
                 y += 1
-            sa = dx12 * (y - y1)
-            sb = dx02 * (y - y0)
-            while y <= y2:
-                a = x1 + sa // dy12
-                b = x0 + sb // dy02
-                sa += dx12
-                sb += dx02
-                if a > b:
-                    a, b = b, a
-                self.hline(a, y, b - a + 1, c)
+            if len(active) == 2:
+                # rows crossed by two edges are one span whatever the fill rule.
+                e = active[0]
+                xa = e[1]
+                sa = e[2]
+                dxa = e[3]
+                dya = e[4]
+                g = active[1]
+                xb = g[1]
+                sb = g[2]
+                dxb = g[3]
+                dyb = g[4]
+                while y < stop:
+                    a = xa + sa // dya
+                    b = xb + sb // dyb
+                    sa += dxa
+                    sb += dxb
+                    if a > b:
+                        a, b = b, a
+                    hline(a, y, b - a + 1, c)
+                    y += 1
+                e[2] = sa
+                g[2] = sb
+                continue
+            while y < stop:
+                self._fill_polygon_row(active, None, y, c, nonzero)
                 y += 1
+
+    def _fill_polygon_row(self, active, spans, y, c, nonzero):
+        """
+        Fills one row of a polygon from its active edges and the list of spans of any
+        horizontal edges and edge ends on the row.
+        """
+        crossings = []
+        for e in active:
+            crossings.append((e[1] + e[2] // e[4], e[5]))
+            e[2] += e[3]
+        crossings.sort()
+        if spans is None:
+            spans = []
+        winding = 0
+        start = 0
+        for x, direction in crossings:
+            if nonzero:
+                inside = winding + direction
+            else:
+                inside = winding ^ 1
+            if winding == 0:
+                start = x
+            elif inside == 0:
+                spans.append((start, x))
+            winding = inside
+        if not spans:
+            return
+        spans.sort()
+        hline = self._hline
+        a, b = spans[0]
+        for i in range(1, len(spans) + 1):
+            if i < len(spans) and spans[i][0] <= b + 1:
+                if spans[i][1] > b:
+                    b = spans[i][1]
+                continue
+            hline(a, y, b - a + 1, c)
+            if i < len(spans):
+                a, b = spans[i]
@@ -0,0 +1,133 @@
+# this code is distributed under the MIT licence.
+
+"""
+framebuf_batch: renders many framebuf2 frames in parallel on a host computer
+
+render_frames() takes a list of frame descriptions, each a list of drawing
+commands such as ("large_text_fit", (s, x, y, m, w, h, c)), and draws them
+across a pool of worker processes.  The frames are drawn straight into one
+block of shared memory, so only the commands and the frame numbers travel
+between processes.  Each worker keeps a layout cache, and optionally a glyph
+cache, for all the frames it draws, so text that repeats across screens, such
+as menu titles in every language, is laid out once per worker.
+
+This module is meant for CPython only.
+"""
+
+import os
+from multiprocessing import Pool, RawArray
+
+import framebuf2
+
+# drawing methods a frame description may use.
+COMMANDS = (
+    "fill", "pixel", "hline", "vline", "fill_rect", "rect", "line", "text",
+    "large_text", "large_text_wrap", "large_text_fit", "circle", "ellipse", "ring", "arc",
+    "pie", "triangle", "polygon", "blit_scaled",
+)
+
+# state of a worker process, set up once by _start_worker.
+_worker = None
+
+
+class _Worker:
+    """
+    The shared frames, frame geometry and caches of one worker process.
+    """
+
+    def __init__(self, frames, width, height, format, fbclass, bg, glyph_cache, layout_cache):
+        self.frames = memoryview(frames).cast("B")
+        self.nbytes = framebuf2._buffer_bytes(width, height, format)
+        self.width = width
+        self.height = height
+        self.format = format
+        self.fbclass = fbclass
+        self.bg = bg
+        self.glyph_cache = framebuf2.GlyphCache(glyph_cache) if glyph_cache else None
+        self.layout_cache = framebuf2.LayoutCache(layout_cache) if layout_cache else None
+
+    def render(self, task) -> int:
+        """
+        Draws the commands of a (frame number, commands) task into its frame.
+        Returns the frame number.
+        """
+        index, commands = task
+        start = index * self.nbytes
+        fb = self.fbclass(
+            self.frames[start : start + self.nbytes], self.width, self.height, self.format
+        )
+        fb.glyph_cache = self.glyph_cache
+        fb.layout_cache = self.layout_cache
+        fb.fill(self.bg)
+        for name, args in commands:
+            if name not in COMMANDS:
+                raise ValueError("unknown drawing command: " + str(name))
+            getattr(fb, name)(*args)
+        if hasattr(fb, "pack"):
+            # engines that draw into their own array, such as framebuf_numpy.
+            fb.pack()
+        return index
+
+
+def _start_worker(*args):
+    global _worker
+    _worker = _Worker(*args)
+
+
+def _render(task) -> int:
+    return _worker.render(task)
+
+
+def render_frames(
+    frames,
+    width,
+    height,
+    format,
+    processes=None,
+    bg: int = 0,
+    fbclass=framebuf2.FrameBuffer,
+    glyph_cache: int = 0,
+    layout_cache: int = 16384,
+) -> list:
+    """
+    Draws a list of frames and returns the buffer of each one, packed in the pixel
+    format, as a list of bytes.
+
+    Arguments:
+    frames -- List of frame descriptions.  Each is a list of (method name, arguments)
+            commands drawn in order on a cleared frame buffer, using the methods in
+            COMMANDS, for example [("large_text_fit", ("Settings", 0, 0, 4, 128, 64, 1))].
+    width -- Width of every frame in pixels.
+    height -- Height of every frame in pixels.
+    format -- One of the framebuf2 format constants.
+    processes -- Number of worker processes.  Defaults to the number of CPUs; 1 draws
+            the frames in this process.
+    bg -- Colour each frame is cleared to before drawing.
+    fbclass -- FrameBuffer class to draw with, such as framebuf_numpy.FrameBuffer.
+    glyph_cache -- Size in bytes of the glyph cache of each worker, 0 for none (the
+            default: framebuf_host blits cached glyphs pixel by pixel, which is slower
+            than drawing them on a host).
+    layout_cache -- Size in bytes of the layout cache of each worker, 0 for none.
+
+    Throws a ValueError exception if a frame uses a command not in COMMANDS.
+    """
+    n = len(frames)
+    nbytes = framebuf2._buffer_bytes(width, height, format)
+    shared = RawArray("B", max(n * nbytes, 1))
+    args = (shared, width, height, format, fbclass, bg, glyph_cache, layout_cache)
+    tasks = list(enumerate(frames))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, n)
+    if processes <= 1:
+        worker = _Worker(*args)
+        for task in tasks:
+            worker.render(task)
+    else:
+        # several frames per task keep the messages between processes few and small.
+        chunksize = max(1, n // (processes * 8))
+        with Pool(processes, _start_worker, args) as pool:
+            for _ in pool.imap_unordered(_render, tasks, chunksize):
+                pass
+    view = memoryview(shared).cast("B")
+    return [bytes(view[i * nbytes : (i + 1) * nbytes]) for i in range(n)]
@@ -0,0 +1,195 @@
+# this code is distributed under the MIT licence.
+
+"""
+framebuf_bdf: converts BDF bitmap fonts to the packed font format of framebuf2
+
+A packed font holds one bitmap per code point in a range, laid out so that
+framebuf2.PackedFont can read a single glyph by seeking into the file rather
+than loading the whole font.  Every glyph is as tall as the font, with the
+font's baseline at the same row, and is drawn from the left edge of its cell.
+
+Packed font layout, with all numbers little endian:
+    header      "FB2F", version 1, glyph height, widest glyph, 0,
+                first code point (16-bit), number of code points (16-bit),
+                default code point (16-bit), drawn for characters not in the font
+    index       for each code point: offset of the glyph bitmap from the start of
+                the font (32-bit, 0 if the font has no glyph for it), bitmap width,
+                advance width
+    bitmaps     for each glyph, height rows of (width + 7) // 8 bytes, with the
+                left-most pixel in bit 0 of the first byte
+
+This module is meant for CPython, to prepare fonts for the device:
+    python framebuf_bdf.py font.bdf font.fnt --first 32 --last 126
+"""
+
+import sys
+
+import framebuf2
+
+
+def read_bdf(lines) -> tuple:
+    """
+    Reads the glyphs of a BDF font.
+
+    Arguments:
+    lines -- Lines of the BDF file, for example an open text file.
+
+    Returns a (height, glyphs) tuple: the height of the font in pixels, and a dictionary
+    mapping each code point to a (rows, width, advance) tuple with one row integer per
+    pixel row, the left-most pixel in bit 0.  Pixels to the left of a glyph's cell or
+    above or below the font are dropped.
+
+    Throws a ValueError exception if lines is not a BDF font.
+    """
+    ascent = None
+    descent = None
+    box = None
+    glyphs = {}
+    glyph = None
+    bitmap = None
+    for line in lines:
+        words = line.split()
+        if not words:
+            continue
+        keyword = words[0]
+        if bitmap is not None:
+            if keyword == "ENDCHAR":
+                _add_glyph(glyphs, glyph, bitmap, ascent, descent)
+                glyph = None
+                bitmap = None
+            else:
+                bitmap.append(words[0])
+        elif keyword == "FONTBOUNDINGBOX":
+            box = [int(word) for word in words[1:5]]
+        elif keyword == "FONT_ASCENT":
+            ascent = int(words[1])
+        elif keyword == "FONT_DESCENT":
+            descent = int(words[1])
+        elif keyword == "STARTCHAR":
+            if box is None:
+                raise ValueError("BDF font has no FONTBOUNDINGBOX")
+            if ascent is None:
+                ascent = box[1] + box[3]
+            if descent is None:
+                descent = -box[3]
+            glyph = {"code": -1, "advance": None, "box": box}
+        elif glyph is not None:
+            if keyword == "ENCODING":
+                glyph["code"] = int(words[1])
+            elif keyword == "DWIDTH":
+                glyph["advance"] = int(words[1])
+            elif keyword == "BBX":
+                glyph["box"] = [int(word) for word in words[1:5]]
+            elif keyword == "BITMAP":
+                bitmap = []
+    if ascent is None:
+        raise ValueError("not a BDF font")
+    return (ascent + descent, glyphs)
+
+
+def _add_glyph(glyphs, glyph, bitmap, ascent, descent):
+    code = glyph["code"]
+    if code < 0:
+        return
+    bw, bh, bx, by = glyph["box"]
+    advance = glyph["advance"]
+    if advance is None:
+        advance = bx + bw
+    height = ascent + descent
+    rows = [0] * height
+    # the top row of the bitmap, counted down from the top of the font.
+    top = ascent - (by + bh)
+    for j in range(0, min(bh, len(bitmap))):
+        y = top + j
+        if y < 0 or y >= height:
+            continue
+        bits = int(bitmap[j], 16)
+        nbits = len(bitmap[j]) * 4
+        row = 0
+        for i in range(0, bw):
+            x = bx + i
+            if x >= 0 and bits & (1 << (nbits - 1 - i)):
+                row |= 1 << x
+        rows[y] = row
+    width = min(max(advance, bx + bw, 0), 255)
+    glyphs[code] = ([row & ((1 << width) - 1) for row in rows], width, min(max(advance, 0), 255))
+
+
+def pack_font(height, glyphs, first: int = 32, last: int = 126, default=None) -> bytes:
+    """
+    Returns the packed font of the glyphs for the code points first to last.
+
+    Arguments:
+    height -- Height of the font in pixels.
+    glyphs -- Dictionary mapping code points to (rows, width, advance) tuples, as
+            returned by read_bdf.
+    first -- First code point to include.
+    last -- Last code point to include.
+    default -- Code point drawn for characters not in the font.  Defaults to "?" if the
+            font has it, and otherwise to the first glyph included.
+
+    Throws a ValueError exception if no glyphs fall between first and last.
+    """
+    codes = [code for code in range(first, last + 1) if code in glyphs]
+    if not codes or height > 255 or last - first >= 0xFFFF:
+        raise ValueError("no glyphs to pack between the first and last code points")
+    if default is None or default not in codes:
+        default = ord("?") if ord("?") in codes else codes[0]
+    count = last - first + 1
+    widest = 0
+    index = bytearray(count * framebuf2._FONT_ENTRY)
+    bitmaps = bytearray()
+    offset = framebuf2._FONT_HEADER + len(index)
+    for code in codes:
+        rows, width, advance = glyphs[code]
+        widest = max(widest, width, advance)
+        e = (code - first) * framebuf2._FONT_ENTRY
+        start = offset + len(bitmaps)
+        index[e : e + framebuf2._FONT_ENTRY] = bytes(
+            (start & 0xFF, (start >> 8) & 0xFF, (start >> 16) & 0xFF, start >> 24, width, advance)
+        )
+        stride = (width + 7) // 8
+        for row in rows:
+            for k in range(0, stride):
+                bitmaps.append((row >> (8 * k)) & 0xFF)
+    header = framebuf2.FONT_MAGIC + bytes(
+        (
+            framebuf2._FONT_VERSION, height, widest, 0,
+            first & 0xFF, first >> 8, count & 0xFF, count >> 8, default & 0xFF, default >> 8,
+        )
+    )
+    return header + bytes(index) + bytes(bitmaps)
+
+
+def convert(bdf_path, font_path, first: int = 32, last: int = 126, default=None) -> int:
+    """
+    Converts the BDF font file bdf_path into the packed font file font_path.
+    See pack_font for the other arguments.
+
+    Returns the size of the packed font in bytes.
+    """
+    with open(bdf_path, "r", encoding="latin-1") as f:
+        height, glyphs = read_bdf(f)
+    data = pack_font(height, glyphs, first, last, default)
+    with open(font_path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="convert a BDF font to a framebuf2 packed font")
+    parser.add_argument("bdf", help="BDF font to read")
+    parser.add_argument("font", help="packed font to write")
+    parser.add_argument("--first", type=int, default=32, help="first code point (default 32)")
+    parser.add_argument("--last", type=int, default=126, help="last code point (default 126)")
+    parser.add_argument("--default", type=int, default=None, help="code point drawn for missing characters")
+    args = parser.parse_args(argv)
+    size = convert(args.bdf, args.font, args.first, args.last, args.default)
+    print(args.font + ": " + str(size) + " bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
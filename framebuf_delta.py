@@ -0,0 +1,262 @@
+# this code is distributed under the MIT licence.
+
+"""
+framebuf_delta: frame-delta encoding of framebuf2 buffers for slow display links
+
+DeltaEncoder compares a frame buffer with the last frame it sent, a page
+(MONO_VLSB) or pixel row (other formats) at a time, and produces an update
+stream of the changed bytes of each page or row, run-length encoded with
+PackBits.  DeltaDecoder patches the buffer on the receiving side in place, from
+data fed to it in chunks of any size, so it can be fed straight from a UART or
+radio read without holding a whole frame.
+
+Stream layout, with all numbers as little endian 16-bit values:
+    frame header    0xD5, unit size in bytes, number of units
+    update          unit, offset, count, PackBits data decoding to count bytes
+    ...
+    end of frame    0xFFFF
+"""
+
+import framebuf2
+
+# first byte of each frame in the stream.
+FRAME_MAGIC = 0xD5
+
+# unit number marking the end of a frame.
+_END = 0xFFFF
+
+# unchanged bytes shorter than an update header (6 bytes) are sent rather than
+# starting a new update.
+_GAP = 6
+
+# decoder states
+_HEADER = 0
+_UPDATE = 1
+_CONTROL = 2
+_LITERAL = 3
+_REPEAT = 4
+
+
+def _units(width, height, format, stride) -> tuple:
+    """
+    Returns the (size in bytes, number) of the units a buffer is compared in: the
+    8 pixel pages of MONO_VLSB, or the pixel rows of the other formats.
+    """
+    if stride is None:
+        stride = width
+    if format == framebuf2.MONO_VLSB:
+        return (stride, (height + 7) // 8)
+    return (framebuf2._buffer_bytes(stride, 1, format), height)
+
+
+def _u16(value) -> bytes:
+    return bytes((value & 0xFF, value >> 8))
+
+
+def packbits(data) -> bytearray:
+    """
+    Returns data run-length encoded with PackBits: a control byte n of 0 to 127 is
+    followed by n + 1 literal bytes, and a control byte n of 129 to 255 by one byte
+    repeated 257 - n times.  Runs of 3 or more equal bytes are repeated.
+    """
+    out = bytearray()
+    n = len(data)
+    literal = 0
+    i = 0
+    while i < n:
+        j = i + 1
+        while j < n and j - i < 128 and data[j] == data[i]:
+            j += 1
+        if j - i < 3:
+            i = j
+            continue
+        _literals(out, data, literal, i)
+        out.append(257 - (j - i))
+        out.append(data[i])
+        i = j
+        literal = i
+    _literals(out, data, literal, n)
+    return out
+
+
+def _literals(out, data, start, end):
+    while start < end:
+        n = min(end - start, 128)
+        out.append(n - 1)
+        out.extend(data[start : start + n])
+        start += n
+
+
+class DeltaEncoder:
+    """
+    Encodes the changes to a frame buffer since the last frame sent.  The encoder
+    keeps a copy of the last frame sent; the first frame is sent in full.
+
+    Arguments:
+    buffer -- Buffer of the frame buffer to send.
+    width -- Width of the frame buffer in pixels.
+    height -- Height of the frame buffer in pixels.
+    format -- One of the framebuf2 format constants.
+    stride -- Number of pixels between each horizontal line (defaults to width).
+    """
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.unit_size, self.units = _units(width, height, format, stride)
+        self._buffer = memoryview(buffer)
+        self._sent = bytearray(self.unit_size * self.units)
+        self._full = True
+
+    def reset(self):
+        """
+        Makes the next frame be sent in full, for example after the receiver restarts.
+        """
+        self._full = True
+
+    def encode(self):
+        """
+        Yields the update stream of the current frame as a series of bytes objects, the
+        largest a single page or row, and remembers the frame as sent.
+        """
+        size = self.unit_size
+        current = self._buffer
+        sent = memoryview(self._sent)
+        full = self._full
+        self._full = False
+        yield bytes((FRAME_MAGIC,)) + _u16(size) + _u16(self.units)
+        for unit in range(self.units):
+            base = unit * size
+            i = 0
+            while i < size:
+                if not full and current[base + i] == sent[base + i]:
+                    i += 1
+                    continue
+                start = i
+                end = i + 1
+                i += 1
+                while i < size and (full or i - end < _GAP):
+                    if full or current[base + i] != sent[base + i]:
+                        end = i + 1
+                    i += 1
+                data = current[base + start : base + end]
+                sent[base + start : base + end] = data
+                yield _u16(unit) + _u16(start) + _u16(end - start) + packbits(data)
+        yield _u16(_END)
+
+
+class DeltaDecoder:
+    """
+    Applies an update stream from a DeltaEncoder to a frame buffer in place.  Data is
+    fed in chunks of any size; no more than the 6 byte header of an update is held.
+
+    Arguments:
+    buffer -- Buffer of the frame buffer to update.
+    width -- Width of the frame buffer in pixels.
+    height -- Height of the frame buffer in pixels.
+    format -- One of the framebuf2 format constants.
+    stride -- Number of pixels between each horizontal line (defaults to width).
+    """
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.unit_size, self.units = _units(width, height, format, stride)
+        self.frames = 0
+        self._buffer = memoryview(buffer)
+        self._state = _HEADER
+        self._head = bytearray(6)
+        self._have = 0
+        # position and bytes left of the update being decoded, and of its current run.
+        self._pos = 0
+        self._left = 0
+        self._run = 0
+
+    def feed(self, data) -> int:
+        """
+        Decodes a chunk of the update stream into the buffer.
+        Returns the number of frames completed by this chunk.
+
+        Throws a ValueError exception if the stream does not match the buffer.
+        """
+        data = memoryview(data)
+        n = len(data)
+        i = 0
+        done = 0
+        buffer = self._buffer
+        while i < n:
+            state = self._state
+            if state == _LITERAL:
+                k = min(self._run, n - i)
+                buffer[self._pos : self._pos + k] = data[i : i + k]
+                self._pos += k
+                self._run -= k
+                i += k
+                if self._run == 0:
+                    self._next()
+            elif state == _CONTROL:
+                control = data[i]
+                i += 1
+                if control < 128:
+                    self._start_run(control + 1, _LITERAL)
+                elif control > 128:
+                    self._start_run(257 - control, _REPEAT)
+            elif state == _REPEAT:
+                k = self._run
+                buffer[self._pos : self._pos + k] = bytes((data[i],)) * k
+                self._pos += k
+                i += 1
+                self._next()
+            else:
+                # gather the frame header, or an update header after its unit number.
+                if state == _HEADER:
+                    need = 5
+                else:
+                    need = 2 if self._have < 2 else 6
+                k = min(need - self._have, n - i)
+                self._head[self._have : self._have + k] = data[i : i + k]
+                self._have += k
+                i += k
+                if self._have < need:
+                    continue
+                if state == _HEADER:
+                    self._have = 0
+                    self._start_frame()
+                elif need == 6:
+                    self._have = 0
+                    self._start_update()
+                elif self._word(0) == _END:
+                    self._have = 0
+                    self._state = _HEADER
+                    self.frames += 1
+                    done += 1
+        return done
+
+    def _word(self, i) -> int:
+        return self._head[i] | (self._head[i + 1] << 8)
+
+    def _start_frame(self):
+        if self._head[0] != FRAME_MAGIC:
+            raise ValueError("not the start of a delta frame")
+        if self._head[1] | (self._head[2] << 8) != self.unit_size or self._head[3] | (
+            self._head[4] << 8
+        ) != self.units:
+            raise ValueError("delta frame does not match the frame buffer")
+        self._state = _UPDATE
+
+    def _start_update(self):
+        unit = self._word(0)
+        offset = self._word(2)
+        count = self._word(4)
+        if unit >= self.units or offset + count > self.unit_size:
+            raise ValueError("delta update outside the frame buffer")
+        self._pos = unit * self.unit_size + offset
+        self._left = count
+        self._next()
+
+    def _start_run(self, k, state):
+        if k > self._left:
+            raise ValueError("delta run longer than its update")
+        self._left -= k
+        self._run = k
+        self._state = state
+
+    def _next(self):
+        # the next run of the update, or the next update once this one is complete.
+        self._state = _CONTROL if self._left else _UPDATE
@@ -0,0 +1,706 @@
+# this code is distributed under the MIT licence.
+
+"""
+framebuf_host: pure-Python reference implementation of MicroPython's framebuf module
+
+Provides a FrameBuffer class that is bit-exact with the native MicroPython
+implementation for the MONO_VLSB, MONO_HLSB, MONO_HMSB, RGB565, GS2_HMSB,
+GS4_HMSB and GS8 formats, with all of its drawing methods (fill, fill_rect,
+pixel, hline, vline, rect, line, ellipse, poly, scroll, text and blit) and the
+built-in 8x8 font.  The frame buffer works directly on the caller's buffer (no
+copies are taken), so the caller can inspect or transmit the buffer exactly as
+it would on a device.
+
+framebuf2 imports this module automatically when the native framebuf module is
+not available, which allows the extension methods to be run, tested and
+benchmarked on a normal CPython host.
+"""
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+# Built-in 8x8 font (code points 32 to 127).  Each character is stored as 8
+# column bytes, least significant bit at the top, as in MicroPython's
+# font_petme128_8x8.h.
+FONT_8X8 = bytes(
+    (
+        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,  # 32=
+        0x00, 0x00, 0x00, 0x4F, 0x4F, 0x00, 0x00, 0x00,  # 33=!
+        0x00, 0x07, 0x07, 0x00, 0x00, 0x07, 0x07, 0x00,  # 34="
+        0x14, 0x7F, 0x7F, 0x14, 0x14, 0x7F, 0x7F, 0x14,  # 35=#
+        0x00, 0x24, 0x2E, 0x6B, 0x6B, 0x3A, 0x12, 0x00,  # 36=$
+        0x00, 0x63, 0x33, 0x18, 0x0C, 0x66, 0x63, 0x00,  # 37=%
+        0x00, 0x32, 0x7F, 0x4D, 0x4D, 0x77, 0x72, 0x50,  # 38=&
+        0x00, 0x00, 0x00, 0x04, 0x06, 0x03, 0x01, 0x00,  # 39='
+        0x00, 0x00, 0x1C, 0x3E, 0x63, 0x41, 0x00, 0x00,  # 40=(
+        0x00, 0x00, 0x41, 0x63, 0x3E, 0x1C, 0x00, 0x00,  # 41=)
+        0x08, 0x2A, 0x3E, 0x1C, 0x1C, 0x3E, 0x2A, 0x08,  # 42=*
+        0x00, 0x08, 0x08, 0x3E, 0x3E, 0x08, 0x08, 0x00,  # 43=+
+        0x00, 0x00, 0x80, 0xE0, 0x60, 0x00, 0x00, 0x00,  # 44=,
+        0x00, 0x08, 0x08, 0x08, 0x08, 0x08, 0x08, 0x00,  # 45=-
+        0x00, 0x00, 0x00, 0x60, 0x60, 0x00, 0x00, 0x00,  # 46=.
+        0x00, 0x40, 0x60, 0x30, 0x18, 0x0C, 0x06, 0x02,  # 47=/
+        0x00, 0x3E, 0x7F, 0x49, 0x45, 0x7F, 0x3E, 0x00,  # 48=0
+        0x00, 0x40, 0x44, 0x7F, 0x7F, 0x40, 0x40, 0x00,  # 49=1
+        0x00, 0x62, 0x73, 0x51, 0x49, 0x4F, 0x46, 0x00,  # 50=2
+        0x00, 0x22, 0x63, 0x49, 0x49, 0x7F, 0x36, 0x00,  # 51=3
+        0x00, 0x18, 0x18, 0x14, 0x16, 0x7F, 0x7F, 0x10,  # 52=4
+        0x00, 0x27, 0x67, 0x45, 0x45, 0x7D, 0x39, 0x00,  # 53=5
+        0x00, 0x3E, 0x7F, 0x49, 0x49, 0x7B, 0x32, 0x00,  # 54=6
+        0x00, 0x03, 0x03, 0x79, 0x7D, 0x07, 0x03, 0x00,  # 55=7
+        0x00, 0x36, 0x7F, 0x49, 0x49, 0x7F, 0x36, 0x00,  # 56=8
+        0x00, 0x26, 0x6F, 0x49, 0x49, 0x7F, 0x3E, 0x00,  # 57=9
+        0x00, 0x00, 0x00, 0x24, 0x24, 0x00, 0x00, 0x00,  # 58=:
+        0x00, 0x00, 0x80, 0xE4, 0x64, 0x00, 0x00, 0x00,  # 59=;
+        0x00, 0x08, 0x1C, 0x36, 0x63, 0x41, 0x41, 0x00,  # 60=<
+        0x00, 0x14, 0x14, 0x14, 0x14, 0x14, 0x14, 0x00,  # 61==
+        0x00, 0x41, 0x41, 0x63, 0x36, 0x1C, 0x08, 0x00,  # 62=>
+        0x00, 0x02, 0x03, 0x51, 0x59, 0x0F, 0x06, 0x00,  # 63=?
+        0x00, 0x3E, 0x7F, 0x41, 0x4D, 0x4F, 0x2E, 0x00,  # 64=@
+        0x00, 0x7C, 0x7E, 0x0B, 0x0B, 0x7E, 0x7C, 0x00,  # 65=A
+        0x00, 0x7F, 0x7F, 0x49, 0x49, 0x7F, 0x36, 0x00,  # 66=B
+        0x00, 0x3E, 0x7F, 0x41, 0x41, 0x63, 0x22, 0x00,  # 67=C
+        0x00, 0x7F, 0x7F, 0x41, 0x63, 0x3E, 0x1C, 0x00,  # 68=D
+        0x00, 0x7F, 0x7F, 0x49, 0x49, 0x41, 0x41, 0x00,  # 69=E
+        0x00, 0x7F, 0x7F, 0x09, 0x09, 0x01, 0x01, 0x00,  # 70=F
+        0x00, 0x3E, 0x7F, 0x41, 0x49, 0x7B, 0x3A, 0x00,  # 71=G
+        0x00, 0x7F, 0x7F, 0x08, 0x08, 0x7F, 0x7F, 0x00,  # 72=H
+        0x00, 0x00, 0x41, 0x7F, 0x7F, 0x41, 0x00, 0x00,  # 73=I
+        0x00, 0x20, 0x60, 0x41, 0x7F, 0x3F, 0x01, 0x00,  # 74=J
+        0x00, 0x7F, 0x7F, 0x1C, 0x36, 0x63, 0x41, 0x00,  # 75=K
+        0x00, 0x7F, 0x7F, 0x40, 0x40, 0x40, 0x40, 0x00,  # 76=L
+        0x00, 0x7F, 0x7F, 0x06, 0x0C, 0x06, 0x7F, 0x7F,  # 77=M
+        0x00, 0x7F, 0x7F, 0x0E, 0x1C, 0x7F, 0x7F, 0x00,  # 78=N
+        0x00, 0x3E, 0x7F, 0x41, 0x41, 0x7F, 0x3E, 0x00,  # 79=O
+        0x00, 0x7F, 0x7F, 0x09, 0x09, 0x0F, 0x06, 0x00,  # 80=P
+        0x00, 0x1E, 0x3F, 0x21, 0x61, 0x7F, 0x5E, 0x00,  # 81=Q
+        0x00, 0x7F, 0x7F, 0x19, 0x39, 0x6F, 0x46, 0x00,  # 82=R
+        0x00, 0x26, 0x6F, 0x49, 0x49, 0x7B, 0x32, 0x00,  # 83=S
+        0x00, 0x01, 0x01, 0x7F, 0x7F, 0x01, 0x01, 0x00,  # 84=T
+        0x00, 0x3F, 0x7F, 0x40, 0x40, 0x7F, 0x3F, 0x00,  # 85=U
+        0x00, 0x1F, 0x3F, 0x60, 0x60, 0x3F, 0x1F, 0x00,  # 86=V
+        0x00, 0x7F, 0x7F, 0x30, 0x18, 0x30, 0x7F, 0x7F,  # 87=W
+        0x00, 0x63, 0x77, 0x1C, 0x1C, 0x77, 0x63, 0x00,  # 88=X
+        0x00, 0x07, 0x0F, 0x78, 0x78, 0x0F, 0x07, 0x00,  # 89=Y
+        0x00, 0x61, 0x71, 0x59, 0x4D, 0x47, 0x43, 0x00,  # 90=Z
+        0x00, 0x00, 0x7F, 0x7F, 0x41, 0x41, 0x00, 0x00,  # 91=[
+        0x00, 0x02, 0x06, 0x0C, 0x18, 0x30, 0x60, 0x40,  # 92=\
+        0x00, 0x00, 0x41, 0x41, 0x7F, 0x7F, 0x00, 0x00,  # 93=]
+        0x00, 0x08, 0x0C, 0x06, 0x06, 0x0C, 0x08, 0x00,  # 94=^
+        0xC0, 0xC0, 0xC0, 0xC0, 0xC0, 0xC0, 0xC0, 0xC0,  # 95=_
+        0x00, 0x00, 0x01, 0x03, 0x06, 0x04, 0x00, 0x00,  # 96=`
+        0x00, 0x20, 0x74, 0x54, 0x54, 0x7C, 0x78, 0x00,  # 97=a
+        0x00, 0x7F, 0x7F, 0x44, 0x44, 0x7C, 0x38, 0x00,  # 98=b
+        0x00, 0x38, 0x7C, 0x44, 0x44, 0x6C, 0x28, 0x00,  # 99=c
+        0x00, 0x38, 0x7C, 0x44, 0x44, 0x7F, 0x7F, 0x00,  # 100=d
+        0x00, 0x38, 0x7C, 0x54, 0x54, 0x5C, 0x58, 0x00,  # 101=e
+        0x00, 0x08, 0x7E, 0x7F, 0x09, 0x03, 0x02, 0x00,  # 102=f
+        0x00, 0x98, 0xBC, 0xA4, 0xA4, 0xFC, 0x7C, 0x00,  # 103=g
+        0x00, 0x7F, 0x7F, 0x04, 0x04, 0x7C, 0x78, 0x00,  # 104=h
+        0x00, 0x00, 0x00, 0x7D, 0x7D, 0x00, 0x00, 0x00,  # 105=i
+        0x00, 0x40, 0xC0, 0x80, 0x80, 0xFD, 0x7D, 0x00,  # 106=j
+        0x00, 0x7F, 0x7F, 0x30, 0x38, 0x6C, 0x44, 0x00,  # 107=k
+        0x00, 0x00, 0x41, 0x7F, 0x7F, 0x40, 0x00, 0x00,  # 108=l
+        0x00, 0x7C, 0x7C, 0x18, 0x30, 0x18, 0x7C, 0x7C,  # 109=m
+        0x00, 0x7C, 0x7C, 0x04, 0x04, 0x7C, 0x78, 0x00,  # 110=n
+        0x00, 0x38, 0x7C, 0x44, 0x44, 0x7C, 0x38, 0x00,  # 111=o
+        0x00, 0xFC, 0xFC, 0x24, 0x24, 0x3C, 0x18, 0x00,  # 112=p
+        0x00, 0x18, 0x3C, 0x24, 0x24, 0xFC, 0xFC, 0x00,  # 113=q
+        0x00, 0x7C, 0x7C, 0x04, 0x04, 0x0C, 0x08, 0x00,  # 114=r
+        0x00, 0x48, 0x5C, 0x54, 0x54, 0x74, 0x24, 0x00,  # 115=s
+        0x00, 0x04, 0x04, 0x3E, 0x7E, 0x44, 0x44, 0x00,  # 116=t
+        0x00, 0x3C, 0x7C, 0x40, 0x40, 0x7C, 0x7C, 0x00,  # 117=u
+        0x00, 0x1C, 0x3C, 0x60, 0x60, 0x3C, 0x1C, 0x00,  # 118=v
+        0x00, 0x1C, 0x7C, 0x70, 0x38, 0x70, 0x7C, 0x1C,  # 119=w
+        0x00, 0x44, 0x6C, 0x38, 0x38, 0x6C, 0x44, 0x00,  # 120=x
+        0x00, 0x9C, 0xBC, 0xA0, 0xE0, 0x7C, 0x3C, 0x00,  # 121=y
+        0x00, 0x44, 0x64, 0x74, 0x5C, 0x4C, 0x44, 0x00,  # 122=z
+        0x00, 0x08, 0x08, 0x3E, 0x77, 0x41, 0x41, 0x00,  # 123={
+        0x00, 0x00, 0x00, 0xFF, 0xFF, 0x00, 0x00, 0x00,  # 124=|
+        0x00, 0x41, 0x41, 0x77, 0x3E, 0x08, 0x08, 0x00,  # 125=}
+        0x00, 0x02, 0x03, 0x01, 0x03, 0x02, 0x03, 0x01,  # 126=~
+        0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55, 0xAA, 0x55,  # 127
+    )
+)
+
+
+def _buffer_size(width, height, format, stride):
+    """
+    Returns the number of bytes needed to hold a frame buffer of the given geometry.
+    """
+    if format == MONO_VLSB:
+        return ((height + 7) >> 3) * stride
+    if format in (MONO_HLSB, MONO_HMSB):
+        return (stride >> 3) * height
+    if format == GS2_HMSB:
+        return (stride >> 2) * height
+    if format == GS4_HMSB:
+        return (stride >> 1) * height
+    if format == GS8:
+        return stride * height
+    if format == RGB565:
+        return stride * height * 2
+    raise ValueError("invalid format")
+
+
+def _cdiv(a, b):
+    # integer division rounding towards zero, as in C.
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+class FrameBuffer:
+    """
+    Pure-Python frame buffer with the same constructor and methods as framebuf.FrameBuffer.
+
+    Arguments:
+    buffer -- Object supporting the buffer protocol (bytearray, array or memoryview).  It is written in place.
+    width -- Width of the frame buffer in pixels.
+    height -- Height of the frame buffer in pixels.
+    format -- One of the format constants defined in this module.
+    stride -- Number of pixels between each horizontal line (defaults to width).
+    """
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        if width < 1 or height < 1 or width > 0xFFFF or height > 0xFFFF:
+            raise ValueError("invalid size")
+        if stride is None:
+            stride = width
+        if format in (MONO_HLSB, MONO_HMSB):
+            stride = (stride + 7) & ~7
+        elif format == GS2_HMSB:
+            stride = (stride + 3) & ~3
+        elif format == GS4_HMSB:
+            stride = (stride + 1) & ~1
+        mv = memoryview(buffer)
+        if mv.format != "B" or mv.itemsize != 1:
+            mv = mv.cast("B")
+        if len(mv) < _buffer_size(width, height, format, stride):
+            raise ValueError("buffer too small")
+        self._buf = mv
+        self._width = width
+        self._height = height
+        self._format = format
+        self._stride = stride
+        if format == MONO_VLSB:
+            self._set = self._set_vlsb
+            self._get = self._get_vlsb
+            self._rect = self._rect_vlsb
+        elif format == MONO_HLSB:
+            self._set = self._set_hlsb
+            self._get = self._get_hlsb
+            self._rect = self._rect_hlsb
+        elif format == MONO_HMSB:
+            self._set = self._set_hmsb
+            self._get = self._get_hmsb
+            self._rect = self._rect_hmsb
+        elif format == RGB565:
+            self._set = self._set_rgb565
+            self._get = self._get_rgb565
+            self._rect = self._rect_rgb565
+        elif format == GS2_HMSB:
+            self._set = self._set_gs2
+            self._get = self._get_gs2
+            self._rect = self._rect_gs2
+        elif format == GS4_HMSB:
+            self._set = self._set_gs4
+            self._get = self._get_gs4
+            self._rect = self._rect_gs4
+        elif format == GS8:
+            self._set = self._set_gs8
+            self._get = self._get_gs8
+            self._rect = self._rect_gs8
+        else:
+            raise ValueError("invalid format")
+
+    # per format pixel access (no bounds checking)
+
+    def _set_vlsb(self, x, y, c):
+        i = (y >> 3) * self._stride + x
+        if c:
+            self._buf[i] |= 1 << (y & 7)
+        else:
+            self._buf[i] &= ~(1 << (y & 7))
+
+    def _get_vlsb(self, x, y):
+        return (self._buf[(y >> 3) * self._stride + x] >> (y & 7)) & 1
+
+    def _set_hlsb(self, x, y, c):
+        i = (x + y * self._stride) >> 3
+        if c:
+            self._buf[i] |= 0x80 >> (x & 7)
+        else:
+            self._buf[i] &= ~(0x80 >> (x & 7))
+
+    def _get_hlsb(self, x, y):
+        return (self._buf[(x + y * self._stride) >> 3] >> (7 - (x & 7))) & 1
+
+    def _set_hmsb(self, x, y, c):
+        i = (x + y * self._stride) >> 3
+        if c:
+            self._buf[i] |= 1 << (x & 7)
+        else:
+            self._buf[i] &= ~(1 << (x & 7))
+
+    def _get_hmsb(self, x, y):
+        return (self._buf[(x + y * self._stride) >> 3] >> (x & 7)) & 1
+
+    def _set_rgb565(self, x, y, c):
+        i = (x + y * self._stride) << 1
+        self._buf[i] = c & 0xFF
+        self._buf[i + 1] = (c >> 8) & 0xFF
+
+    def _get_rgb565(self, x, y):
+        i = (x + y * self._stride) << 1
+        return self._buf[i] | (self._buf[i + 1] << 8)
+
+    def _set_gs2(self, x, y, c):
+        i = (x + y * self._stride) >> 2
+        shift = (x & 3) << 1
+        self._buf[i] = (self._buf[i] & ~(3 << shift)) | ((c & 3) << shift)
+
+    def _get_gs2(self, x, y):
+        return (self._buf[(x + y * self._stride) >> 2] >> ((x & 3) << 1)) & 3
+
+    def _set_gs4(self, x, y, c):
+        i = (x + y * self._stride) >> 1
+        if x & 1:
+            self._buf[i] = (c & 0x0F) | (self._buf[i] & 0xF0)
+        else:
+            self._buf[i] = ((c << 4) & 0xF0) | (self._buf[i] & 0x0F)
+
+    def _get_gs4(self, x, y):
+        v = self._buf[(x + y * self._stride) >> 1]
+        return v & 0x0F if x & 1 else v >> 4
+
+    def _set_gs8(self, x, y, c):
+        self._buf[x + y * self._stride] = c & 0xFF
+
+    def _get_gs8(self, x, y):
+        return self._buf[x + y * self._stride]
+
+    # per format rectangle fills (arguments already clipped to the buffer)
+
+    def _rect_vlsb(self, x, y, w, h, c):
+        buf = self._buf
+        stride = self._stride
+        yend = y + h
+        while y < yend:
+            page = y >> 3
+            bits = min(8 - (y & 7), yend - y)
+            mask = ((1 << bits) - 1) << (y & 7)
+            start = page * stride + x
+            if mask == 0xFF:
+                buf[start : start + w] = (b"\xff" if c else b"\x00") * w
+            else:
+                pattern = int.from_bytes(bytes((mask,)) * w, "little")
+                value = int.from_bytes(buf[start : start + w], "little")
+                value = value | pattern if c else value & ~pattern
+                buf[start : start + w] = value.to_bytes(w, "little")
+            y += bits
+
+    def _rect_horiz(self, x, y, w, h, c, msb_left):
+        # shared by MONO_HLSB and MONO_HMSB: full bytes in the middle of each row
+        # are written with one slice assignment, partial bytes at the edges are masked.
+        buf = self._buf
+        stride = self._stride
+        xend = x + w
+        first = (x + 7) >> 3
+        last = xend >> 3
+        if first > last:
+            # the span lies inside a single byte
+            bits = ((1 << w) - 1) << (x & 7)
+            head = 0
+            tail = 0
+        else:
+            bits = 0
+            head = (0xFF << (x & 7)) & 0xFF if x & 7 else 0
+            tail = (1 << (xend & 7)) - 1
+        if msb_left:
+            bits = _REVERSE[bits & 0xFF]
+            head = _REVERSE[head]
+            tail = _REVERSE[tail]
+        fill = (b"\xff" if c else b"\x00") * (last - first) if last > first else b""
+        for row in range(y, y + h):
+            base = (row * stride) >> 3
+            if bits:
+                i = base + (x >> 3)
+                buf[i] = buf[i] | bits if c else buf[i] & ~bits
+                continue
+            if head:
+                i = base + (x >> 3)
+                buf[i] = buf[i] | head if c else buf[i] & ~head
+            if fill:
+                buf[base + first : base + last] = fill
+            if tail:
+                i = base + last
+                buf[i] = buf[i] | tail if c else buf[i] & ~tail
+
+    def _rect_hlsb(self, x, y, w, h, c):
+        self._rect_horiz(x, y, w, h, c, True)
+
+    def _rect_hmsb(self, x, y, w, h, c):
+        self._rect_horiz(x, y, w, h, c, False)
+
+    def _rect_bytes(self, x, y, w, h, pattern, bpp):
+        # shared by GS8 and RGB565: whole pixels are whole bytes.
+        buf = self._buf
+        row_bytes = self._stride * bpp
+        if x == 0 and w == self._stride:
+            start = y * row_bytes
+            buf[start : start + h * row_bytes] = pattern * (w * h)
+            return
+        span = pattern * w
+        start = (x + y * self._stride) * bpp
+        n = w * bpp
+        for _ in range(h):
+            buf[start : start + n] = span
+            start += row_bytes
+
+    def _rect_gs8(self, x, y, w, h, c):
+        self._rect_bytes(x, y, w, h, bytes((c & 0xFF,)), 1)
+
+    def _rect_rgb565(self, x, y, w, h, c):
+        self._rect_bytes(x, y, w, h, bytes((c & 0xFF, (c >> 8) & 0xFF)), 2)
+
+    def _rect_packed(self, x, y, w, h, c, ppb):
+        # shared by GS2_HMSB and GS4_HMSB: whole bytes are written with a slice
+        # assignment, pixels in partially covered bytes go through _set.
+        xend = x + w
+        first = (x + ppb - 1) // ppb * ppb
+        last = xend // ppb * ppb
+        if first >= last:
+            for row in range(y, y + h):
+                for col in range(x, xend):
+                    self._set(col, row, c)
+            return
+        if ppb == 2:
+            value = ((c & 0x0F) << 4) | (c & 0x0F)
+        else:
+            c &= 3
+            value = c | (c << 2) | (c << 4) | (c << 6)
+        fill = bytes((value,)) * ((last - first) // ppb)
+        buf = self._buf
+        stride = self._stride
+        for row in range(y, y + h):
+            for col in range(x, first):
+                self._set(col, row, c)
+            start = (first + row * stride) // ppb
+            buf[start : start + len(fill)] = fill
+            for col in range(last, xend):
+                self._set(col, row, c)
+
+    def _rect_gs2(self, x, y, w, h, c):
+        self._rect_packed(x, y, w, h, c, 4)
+
+    def _rect_gs4(self, x, y, w, h, c):
+        self._rect_packed(x, y, w, h, c, 2)
+
+    # public framebuf API
+
+    def fill(self, c):
+        self._rect(0, 0, self._width, self._height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        self._clipped_rect(x, y, w, h, c)
+
+    def _clipped_rect(self, x, y, w, h, c):
+        # shared by the public methods so that they do not dispatch through each other.
+        if (
+            h < 1
+            or w < 1
+            or x + w <= 0
+            or y + h <= 0
+            or y >= self._height
+            or x >= self._width
+        ):
+            return
+        xend = min(self._width, x + w)
+        yend = min(self._height, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+        self._rect(x, y, xend - x, yend - y, c)
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self._width and 0 <= y < self._height:
+            if c is None:
+                return self._get(x, y)
+            self._set(x, y, c)
+        return None
+
+    def _clipped_pixel(self, x, y, c):
+        if 0 <= x < self._width and 0 <= y < self._height:
+            self._set(x, y, c)
+
+    def hline(self, x, y, w, c):
+        self._clipped_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self._clipped_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self._clipped_rect(x, y, w, h, c)
+        else:
+            self._clipped_rect(x, y, w, 1, c)
+            self._clipped_rect(x, y + h - 1, w, 1, c)
+            self._clipped_rect(x, y, 1, h, c)
+            self._clipped_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        self._clipped_line(x1, y1, x2, y2, c)
+
+    def _clipped_line(self, x1, y1, x2, y2, c):
+        dx = x2 - x1
+        if dx > 0:
+            sx = 1
+        else:
+            dx = -dx
+            sx = -1
+        dy = y2 - y1
+        if dy > 0:
+            sy = 1
+        else:
+            dy = -dy
+            sy = -1
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        width = self._width
+        height = self._height
+        setpixel = self._set
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                if 0 <= y1 < width and 0 <= x1 < height:
+                    setpixel(y1, x1, c)
+            elif 0 <= x1 < width and 0 <= y1 < height:
+                setpixel(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        if 0 <= x2 < width and 0 <= y2 < height:
+            setpixel(x2, y2, c)
+
+    def ellipse(self, x, y, xr, yr, c, f=False, m=0b1111):
+        # m selects the quadrants drawn: bit 0 is the top right, then anticlockwise.
+        m &= 0b1111
+        if xr == 0 and yr == 0:
+            if m:
+                self._clipped_pixel(x, y, c)
+            return
+        if f:
+            points = self._ellipse_spans
+        else:
+            points = self._ellipse_points
+        two_asquare = 2 * xr * xr
+        two_bsquare = 2 * yr * yr
+        # the first set of points, where the slope is steeper than -1.
+        px = xr
+        py = 0
+        xchange = yr * yr * (1 - 2 * xr)
+        ychange = xr * xr
+        error = 0
+        stoppingx = two_bsquare * xr
+        stoppingy = 0
+        while stoppingx >= stoppingy:
+            points(x, y, px, py, c, m)
+            py += 1
+            stoppingy += two_asquare
+            error += ychange
+            ychange += two_asquare
+            if 2 * error + xchange > 0:
+                px -= 1
+                stoppingx -= two_bsquare
+                error += xchange
+                xchange += two_bsquare
+        # the second set of points, where the slope is shallower than -1.
+        px = 0
+        py = yr
+        xchange = yr * yr
+        ychange = xr * xr * (1 - 2 * yr)
+        error = 0
+        stoppingx = 0
+        stoppingy = two_asquare * yr
+        while stoppingx <= stoppingy:
+            points(x, y, px, py, c, m)
+            px += 1
+            stoppingx += two_bsquare
+            error += xchange
+            xchange += two_bsquare
+            if 2 * error + ychange > 0:
+                py -= 1
+                stoppingy -= two_asquare
+                error += ychange
+                ychange += two_asquare
+
+    def _ellipse_points(self, cx, cy, x, y, c, m):
+        if m & 1:
+            self._clipped_pixel(cx + x, cy - y, c)
+        if m & 2:
+            self._clipped_pixel(cx - x, cy - y, c)
+        if m & 4:
+            self._clipped_pixel(cx - x, cy + y, c)
+        if m & 8:
+            self._clipped_pixel(cx + x, cy + y, c)
+
+    def _ellipse_spans(self, cx, cy, x, y, c, m):
+        if m & 1:
+            self._clipped_rect(cx, cy - y, x + 1, 1, c)
+        if m & 2:
+            self._clipped_rect(cx - x, cy - y, x + 1, 1, c)
+        if m & 4:
+            self._clipped_rect(cx - x, cy + y, x + 1, 1, c)
+        if m & 8:
+            self._clipped_rect(cx, cy + y, x + 1, 1, c)
+
+    def poly(self, x, y, coords, c, f=False):
+        # an odd number of values drops the last one.
+        n = len(coords) // 2
+        if n == 0:
+            return
+        if not f:
+            px1 = coords[0]
+            py1 = coords[1]
+            i = n * 2 - 1
+            while i >= 0:
+                py2 = coords[i]
+                px2 = coords[i - 1]
+                i -= 2
+                self._clipped_line(x + px1, y + py1, x + px2, y + py2, c)
+                px1 = px2
+                py1 = py2
+            return
+        # for each scan line, fill between pairs of the x coordinates where it crosses
+        # the edges, as http://alienryderflex.com/polygon_fill/ does.
+        ys = [coords[i * 2 + 1] for i in range(n)]
+        for row in range(min(ys), max(ys) + 1):
+            nodes = []
+            px1 = coords[0]
+            py1 = coords[1]
+            i = n * 2 - 1
+            while i >= 0:
+                py2 = coords[i]
+                px2 = coords[i - 1]
+                i -= 2
+                # the bottom pixel of an edge is left out so that it is not counted
+                # again as the top of the next edge.
+                if py1 != py2 and ((py1 > row and py2 <= row) or (py1 <= row and py2 > row)):
+                    node = _cdiv(32 * (px2 - px1) * (row - py1), py2 - py1)
+                    nodes.append(_cdiv(32 * px1 + node + 16, 32))
+                elif row == max(py1, py2):
+                    # fill in the pixels missed at a local minimum.
+                    if py1 < py2:
+                        self._clipped_pixel(x + px2, y + py2, c)
+                    elif py2 < py1:
+                        self._clipped_pixel(x + px1, y + py1, c)
+                    else:
+                        self._clipped_line(x + px1, y + py1, x + px2, y + py2, c)
+                px1 = px2
+                py1 = py2
+            nodes.sort()
+            for i in range(0, len(nodes) - 1, 2):
+                self._clipped_rect(x + nodes[i], y + row, nodes[i + 1] - nodes[i] + 1, 1, c)
+
+    def scroll(self, xstep, ystep):
+        width = self._width
+        height = self._height
+        if -xstep >= width or xstep >= width or -ystep >= height or ystep >= height:
+            return
+        if xstep < 0:
+            sx, xend, dx = 0, width + xstep, 1
+        else:
+            sx, xend, dx = width - 1, xstep - 1, -1
+        if ystep < 0:
+            y, yend, dy = 0, height + ystep, 1
+        else:
+            y, yend, dy = height - 1, ystep - 1, -1
+        getpixel = self._get
+        setpixel = self._set
+        while y != yend:
+            x = sx
+            while x != xend:
+                setpixel(x, y, getpixel(x - xstep, y - ystep))
+                x += dx
+            y += dy
+
+    def text(self, s, x0, y0, c=1):
+        width = self._width
+        height = self._height
+        setpixel = self._set
+        if isinstance(s, str):
+            s = s.encode()
+        for ch in s:
+            if ch < 32 or ch > 127:
+                ch = 127
+            base = (ch - 32) << 3
+            for j in range(8):
+                if 0 <= x0 < width:
+                    column = FONT_8X8[base + j]
+                    y = y0
+                    while column:
+                        if column & 1 and 0 <= y < height:
+                            setpixel(x0, y, c)
+                        column >>= 1
+                        y += 1
+                x0 += 1
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        if isinstance(palette, tuple):
+            palette = FrameBuffer(*palette)
+        sw = fbuf._width
+        sh = fbuf._height
+        if x >= self._width or y >= self._height or -x >= sw or -y >= sh:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x0end = min(self._width, x + sw)
+        y0end = min(self._height, y + sh)
+        if (
+            key == -1
+            and palette is None
+            and fbuf._format == self._format
+            and self._format in (GS8, RGB565)
+        ):
+            # same byte-per-pixel format: copy whole rows.
+            bpp = 2 if self._format == RGB565 else 1
+            n = (x0end - x0) * bpp
+            dst = (x0 + y0 * self._stride) * bpp
+            src = (x1 + y1 * fbuf._stride) * bpp
+            for _ in range(y0end - y0):
+                self._buf[dst : dst + n] = fbuf._buf[src : src + n]
+                dst += self._stride * bpp
+                src += fbuf._stride * bpp
+            return
+        getpixel = fbuf._get
+        setpixel = self._set
+        lookup = palette._get if palette is not None else None
+        while y0 < y0end:
+            cx1 = x1
+            for cx0 in range(x0, x0end):
+                col = getpixel(cx1, y1)
+                if lookup is not None:
+                    col = lookup(col, 0)
+                if col != key:
+                    setpixel(cx0, y0, col)
+                cx1 += 1
+            y0 += 1
+            y1 += 1
+
+
+# bit reversal table used to convert LSB-first masks to MSB-first masks.
+_REVERSE = bytes(int("{:08b}".format(i)[::-1], 2) for i in range(256))
@@ -0,0 +1,461 @@
+# this code is distributed under the MIT licence.
+
+"""
+framebuf_numpy: NumPy rendering engine for framebuf2 on a host computer
+
+Provides a FrameBuffer class with the same constructor and methods as
+framebuf2.FrameBuffer whose pixels are held in a NumPy array, one element per
+pixel.  The framebuf primitives are array slice operations, and large_text(),
+filled circles, ellipses and triangles are drawn as whole-array masks, so
+screens for previews and test fixtures can be rendered in bulk.  The results
+are pixel-identical to framebuf2 on the framebuf_host reference backend.
+
+The array is the master copy of the image: pack() writes it into the buffer
+given to the constructor in the buffer's pixel format, and to_pnm() exports it
+as a binary PBM, PGM or PPM image.
+
+This module needs NumPy, and is meant for CPython only.
+"""
+
+import numpy as np
+
+import framebuf2
+from framebuf2 import (
+    MONO_VLSB,
+    MONO_HLSB,
+    MONO_HMSB,
+    RGB565,
+    GS2_HMSB,
+    GS4_HMSB,
+    GS8,
+    _font_table,
+    _glyph_offset,
+)
+
+# largest value a pixel holds in each format.
+_MAX_VALUE = {
+    MONO_VLSB: 1,
+    MONO_HLSB: 1,
+    MONO_HMSB: 1,
+    RGB565: 0xFFFF,
+    GS2_HMSB: 3,
+    GS4_HMSB: 15,
+    GS8: 255,
+}
+
+# glyphs of the built-in font as (96, 8, 8) arrays of 0 and 1, one per character
+# rotation, built on first use from the framebuf2 font tables.
+_glyph_arrays = [None, None, None, None]
+
+
+def _glyphs(t) -> np.ndarray:
+    glyphs = _glyph_arrays[t]
+    if glyphs is None:
+        rows = np.frombuffer(bytes(_font_table(t)), dtype=np.uint8).reshape(96, 8)
+        glyphs = (rows[:, :, None] >> np.arange(8, dtype=np.uint8)) & 1
+        _glyph_arrays[t] = glyphs
+    return glyphs
+
+
+def _storage(width, height, format, stride):
+    """
+    Returns (rows, columns, bytes) of the pixels held in a buffer, including the
+    padding pixels of the stride and of the last MONO_VLSB page.
+    """
+    if format == MONO_VLSB:
+        pages = (height + 7) >> 3
+        return (pages * 8, stride, pages * stride)
+    if format in (MONO_HLSB, MONO_HMSB):
+        stride = (stride + 7) & ~7
+        return (height, stride, (stride >> 3) * height)
+    if format == GS2_HMSB:
+        stride = (stride + 3) & ~3
+        return (height, stride, (stride >> 2) * height)
+    if format == GS4_HMSB:
+        stride = (stride + 1) & ~1
+        return (height, stride, (stride >> 1) * height)
+    if format == GS8:
+        return (height, stride, stride * height)
+    if format == RGB565:
+        return (height, stride, stride * height * 2)
+    raise ValueError("invalid format")
+
+
+def unpack(buffer, width, height, format, stride=None) -> np.ndarray:
+    """
+    Returns the pixels of a frame buffer as a (rows, columns) int32 array that covers
+    the whole stride, and for MONO_VLSB every row of the last page.
+
+    Arguments:
+    buffer -- Object supporting the buffer protocol, in the layout of framebuf.
+    width -- Width of the frame buffer in pixels.
+    height -- Height of the frame buffer in pixels.
+    format -- One of the framebuf2 format constants.
+    stride -- Number of pixels between each horizontal line (defaults to width).
+    """
+    if stride is None:
+        stride = width
+    rows, columns, nbytes = _storage(width, height, format, stride)
+    data = np.frombuffer(memoryview(buffer).cast("B")[:nbytes], dtype=np.uint8)
+    if format == MONO_VLSB:
+        pages = data.reshape(rows >> 3, columns)
+        bits = (pages[:, None, :] >> np.arange(8, dtype=np.uint8)[None, :, None]) & 1
+        return bits.reshape(rows, columns).astype(np.int32)
+    if format == RGB565:
+        return data.view("<u2").reshape(rows, columns).astype(np.int32)
+    if format == GS8:
+        return data.reshape(rows, columns).astype(np.int32)
+    shifts, mask = _packing(format)
+    packed = data.reshape(rows, columns // len(shifts))
+    values = (packed[:, :, None] >> shifts) & mask
+    return values.reshape(rows, columns).astype(np.int32)
+
+
+def _packing(format):
+    """
+    Returns the bit shift of each pixel within a byte, left-most pixel first, and the
+    pixel mask of the formats that pack several pixels per byte along a row.
+    """
+    if format == MONO_HLSB:
+        return (np.arange(7, -1, -1, dtype=np.uint8), 1)
+    if format == MONO_HMSB:
+        return (np.arange(8, dtype=np.uint8), 1)
+    if format == GS2_HMSB:
+        return (np.arange(0, 8, 2, dtype=np.uint8), 3)
+    return (np.array((4, 0), dtype=np.uint8), 15)
+
+
+def pack(pixels, format) -> bytes:
+    """
+    Returns the bytes of a (rows, columns) array of pixel values in the layout of
+    framebuf, the inverse of unpack().
+    """
+    rows, columns = pixels.shape
+    if format == MONO_VLSB:
+        bits = pixels.reshape(rows >> 3, 8, columns).astype(np.uint8)
+        weights = (1 << np.arange(8, dtype=np.uint8))[None, :, None]
+        return (bits * weights).sum(axis=1, dtype=np.uint8).tobytes()
+    if format == RGB565:
+        return pixels.astype("<u2").tobytes()
+    if format == GS8:
+        return pixels.astype(np.uint8).tobytes()
+    shifts, mask = _packing(format)
+    values = pixels.reshape(rows, columns // len(shifts), len(shifts)).astype(np.uint8)
+    return ((values & mask) << shifts).sum(axis=2, dtype=np.uint8).tobytes()
+
+
+class FrameBuffer(framebuf2.FrameBuffer):
+    """
+    framebuf2 FrameBuffer that draws into a NumPy array of pixel values.
+
+    The pixels attribute is a (height, width) view of the array; call pack() to write
+    it into the buffer in the buffer's pixel format.  Drawing goes through the
+    framebuf2 clip rectangle, origin, dirty tracking, recording and profiling as
+    usual; large_text() and the filled shapes are drawn as whole-array masks while
+    none of those are in use.
+
+    Arguments:
+    buffer -- Object supporting the buffer protocol.  Its contents are read as the
+            initial image, and it is only written by pack().
+    width -- Width of the frame buffer in pixels.
+    height -- Height of the frame buffer in pixels.
+    format -- One of the framebuf2 format constants.
+    stride -- Number of pixels between each horizontal line (defaults to width).
+    """
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        super().__init__(buffer, width, height, format, stride)
+        self._buffer = buffer
+        self._stride_pixels = width if stride is None else stride
+        self._array = unpack(buffer, width, height, format, stride)
+        self.pixels = self._array[:height, :width]
+        self._mono = _MAX_VALUE[format] == 1
+
+    def unpack(self):
+        """
+        Reads the buffer into the array again, after the buffer was written elsewhere.
+        """
+        self._array[:] = unpack(
+            self._buffer, self.width, self.height, self._format, self._stride_pixels
+        )
+
+    def pack(self):
+        """
+        Writes the array into the buffer in its pixel format and returns the buffer.
+        """
+        data = pack(self._array, self._format)
+        memoryview(self._buffer).cast("B")[: len(data)] = data
+        return self._buffer
+
+    def to_pnm(self, invert: bool = False) -> bytes:
+        """
+        Returns the image as a binary PBM (P4) for the monochrome formats, PGM (P5) for
+        the greyscale formats or PPM (P6) with 8 bits per channel for RGB565.
+
+        Arguments:
+        invert -- Write set monochrome pixels as white rather than black, for a preview
+                of a display that lights its set pixels.
+        """
+        pixels = self.pixels
+        header = "{} {}\n".format(self.width, self.height)
+        if self._mono:
+            bits = pixels == 0 if invert else pixels != 0
+            data = np.packbits(bits.astype(np.uint8), axis=1).tobytes()
+            return ("P4\n" + header).encode() + data
+        if self._format == RGB565:
+            rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            rgb[:, :, 0] = ((pixels >> 11) & 0x1F) * 255 // 31
+            rgb[:, :, 1] = ((pixels >> 5) & 0x3F) * 255 // 63
+            rgb[:, :, 2] = (pixels & 0x1F) * 255 // 31
+            return ("P6\n" + header + "255\n").encode() + rgb.tobytes()
+        maximum = _MAX_VALUE[self._format]
+        header = "P5\n" + header + str(maximum) + "\n"
+        return header.encode() + pixels.astype(np.uint8).tobytes()
+
+    def save_pnm(self, filename, invert: bool = False):
+        """
+        Writes the image returned by to_pnm() to filename.
+        """
+        with open(filename, "wb") as f:
+            f.write(self.to_pnm(invert))
+
+    def _value(self, c) -> int:
+        """
+        Returns the value a pixel holds after being set to colour c, as framebuf stores it.
+        """
+        if self._mono:
+            return 1 if c else 0
+        return c & _MAX_VALUE[self._format]
+
+    def _values(self, colours) -> np.ndarray:
+        """
+        Returns the values pixels hold after being set to an array of colours.
+        """
+        if self._mono:
+            return colours != 0
+        return colours & _MAX_VALUE[self._format]
+
+    def _paint(self, mask, x, y, c):
+        """
+        Sets the pixels of the buffer under the set elements of mask, with its top left
+        corner at x, y, to colour c.  The mask is clipped to the buffer.
+        """
+        h, w = mask.shape
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = self.pixels[y0:y1, x0:x1]
+        region[mask[y0 - y : y1 - y, x0 - x : x1 - x] != 0] = self._value(c)
+
+    def _unwrapped(self) -> bool:
+        """
+        Returns True while no clip rectangle, origin, dirty tracking, recording or
+        profiling wraps the primitives, so whole shapes can be drawn as masks.  Recording
+        replaces the inherited and internal primitives alike, so it is checked separately.
+        """
+        return (
+            self._recording is None
+            and self._fill_rect == self.fill_rect
+            and self._hline == self.hline
+        )
+
+    # framebuf primitives
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if c is None:
+                return int(self.pixels[y, x])
+            self.pixels[y, x] = self._value(c)
+        return None
+
+    def fill(self, c):
+        self.pixels[:] = self._value(c)
+
+    def fill_rect(self, x, y, w, h, c):
+        self._clipped_rect(x, y, w, h, c)
+
+    def _clipped_rect(self, x, y, w, h, c):
+        # shared by the public methods so that they do not dispatch through each other.
+        if w < 1 or h < 1:
+            return
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        if x0 < x1 and y0 < y1:
+            self.pixels[y0:y1, x0:x1] = self._value(c)
+
+    def hline(self, x, y, w, c):
+        self._clipped_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self._clipped_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self._clipped_rect(x, y, w, h, c)
+        else:
+            self._clipped_rect(x, y, w, 1, c)
+            self._clipped_rect(x, y + h - 1, w, 1, c)
+            self._clipped_rect(x, y, 1, h, c)
+            self._clipped_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = abs(y2 - y1)
+        steep = dy > dx
+        if steep:
+            dx, dy = dy, dx
+        # the same pixels as framebuf's Bresenham loop: the minor axis steps at step i
+        # of the major axis by (2 * dy * i + dx) // (2 * dx).
+        i = np.arange(dx)
+        major = i
+        minor = (2 * dy * i + dx) // (2 * dx) if dx else i
+        if steep:
+            xs = x1 + np.sign(x2 - x1) * minor
+            ys = y1 + (1 if y2 > y1 else -1) * major
+        else:
+            xs = x1 + (1 if x2 > x1 else -1) * major
+            ys = y1 + np.sign(y2 - y1) * minor
+        xs = np.append(xs, x2)
+        ys = np.append(ys, y2)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.pixels[ys[inside], xs[inside]] = self._value(c)
+
+    def scroll(self, xstep, ystep):
+        width = self.width
+        height = self.height
+        if -xstep >= width or xstep >= width or -ystep >= height or ystep >= height:
+            return
+        # the area scrolled away from keeps its pixels, as with framebuf.
+        x0 = max(0, xstep)
+        x1 = min(width, width + xstep)
+        y0 = max(0, ystep)
+        y1 = min(height, height + ystep)
+        pixels = self.pixels
+        pixels[y0:y1, x0:x1] = pixels[y0 - ystep : y1 - ystep, x0 - xstep : x1 - xstep].copy()
+
+    def text(self, s, x0, y0, c=1):
+        if isinstance(s, str):
+            s = s.encode()
+        if not s:
+            return
+        codes = np.frombuffer(bytes(s), dtype=np.uint8).astype(np.int32)
+        codes[(codes < 32) | (codes > 127)] = 127
+        glyphs = _glyphs(0)[codes - 32]
+        self._paint(glyphs.transpose(1, 0, 2).reshape(8, 8 * len(codes)), x0, y0, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        source = _source_pixels(fbuf)
+        sh, sw = source.shape
+        if x >= self.width or y >= self.height or -x >= sw or -y >= sh:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + sw)
+        y1 = min(self.height, y + sh)
+        values = source[y0 - y : y1 - y, x0 - x : x1 - x]
+        if palette is not None:
+            values = _source_pixels(palette)[0][values]
+        region = self.pixels[y0:y1, x0:x1]
+        if key == -1:
+            region[:] = self._values(values)
+        else:
+            # the key is compared with the source colour, after the palette.
+            copy = values != key
+            region[copy] = self._values(values[copy])
+
+    # framebuf2 methods drawn as masks
+
+    def large_text(self, s, x, y, m, c: int = 1, r: int = 0, t=None):
+        if not self._unwrapped() or self.font is not None:
+            super().large_text(s, x, y, m, c, r, t)
+            return
+        n = len(s)
+        if m < 1:
+            super().large_text(s, x, y, m, c, r, t)
+            return
+        if n == 0:
+            return
+        r = r % 360 // 90
+        t = r if t is None else t % 360 // 90
+        if r in (2, 3):
+            s = s[::-1]
+        codes = [_glyph_offset(character) >> 3 for character in s]
+        glyphs = _glyphs(t)[codes]
+        if r in (0, 2):
+            mask = glyphs.transpose(1, 0, 2).reshape(8, 8 * n)
+        else:
+            mask = glyphs.reshape(8 * n, 8)
+        if m > 1:
+            mask = mask.repeat(m, axis=0).repeat(m, axis=1)
+        self._paint(mask, x, y, c)
+
+    def _fill_spans(self, x0, y0, table, c):
+        if not self._unwrapped():
+            super()._fill_spans(x0, y0, table, c)
+            return
+        n = len(table)
+        widths = np.array(table, dtype=np.int32)
+        widths = np.concatenate((widths[:0:-1], widths))
+        reach = int(widths.max())
+        offsets = np.arange(-reach, reach + 1)
+        mask = np.abs(offsets)[None, :] <= widths[:, None]
+        self._paint(mask, x0 - reach, y0 - n + 1, c)
+
+    def triangle(self, x0, y0, x1, y1, x2, y2, c, f: bool = None):
+        if f is None or f != True or not self._unwrapped():
+            super().triangle(x0, y0, x1, y1, x2, y2, c, f)
+            return
+        if y0 > y1:
+            y0, y1 = y1, y0
+            x0, x1 = x1, x0
+        if y1 > y2:
+            y2, y1 = y1, y2
+            x2, x1 = x1, x2
+        if y0 > y1:
+            y0, y1 = y1, y0
+            x0, x1 = x1, x0
+        if y0 == y2:
+            super().triangle(x0, y0, x1, y1, x2, y2, c, f)
+            return
+        # the spans of framebuf2's triangle(), computed for every row at once.
+        first = max(y0, 0)
+        end = min(y2, self.height - 1)
+        if first > end:
+            return
+        last = y1 - 1 if y0 == y1 else y1
+        ys = np.arange(first, end + 1)
+        upper = x0 + (x1 - x0) * (ys - y0) // max(y1 - y0, 1)
+        lower = x1 + (x2 - x1) * (ys - y1) // max(y2 - y1, 1)
+        a = np.where(ys <= last, upper, lower)
+        b = x0 + (x2 - x0) * (ys - y0) // (y2 - y0)
+        left = np.minimum(a, b)
+        right = np.maximum(a, b)
+        start = max(int(left.min()), 0)
+        stop = min(int(right.max()), self.width - 1)
+        if start > stop:
+            return
+        xs = np.arange(start, stop + 1)
+        mask = (xs[None, :] >= left[:, None]) & (xs[None, :] <= right[:, None])
+        self._paint(mask, start, first, c)
+
+
+def _source_pixels(fbuf) -> np.ndarray:
+    """
+    Returns the pixels of a blit source or palette: a FrameBuffer of this module, any
+    other framebuf FrameBuffer, or a (buffer, width, height, format [, stride]) tuple.
+    """
+    if isinstance(fbuf, FrameBuffer):
+        return fbuf.pixels
+    if isinstance(fbuf, tuple):
+        width = fbuf[1]
+        height = fbuf[2]
+        return unpack(*fbuf)[:height, :width]
+    return unpack(fbuf._buf, fbuf._width, fbuf._height, fbuf._format, fbuf._stride)[
+        : fbuf._height, : fbuf._width
+    ]
+
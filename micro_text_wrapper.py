@@ -13,7 +13,7 @@ class MicroTextWrapper:
 
     """
 
-    def wrap_text(self, unwrapped_text: str, max_line_chars:int) -> list[str]:
+    def wrap_text(self, unwrapped_text: str, max_line_chars:int, advance=None) -> list[str]:
         """
         Takes a unwrapped_text and word wraps it to fit within the specified space.
 
@@ -21,76 +21,129 @@ class MicroTextWrapper:
 
         unwrapped_text -- The text to wrap.
         max_line_chars -- The maximum number of characters that are allowed in a word.
+        advance -- Optional function returning the width of a character, as for wrap_spans.
 
         Returns a list of lines that have been word-wrapped.
 
         """
         wrapped = []
-                
-        more = True
-        fragment = unwrapped_text
-        while(more):
-            newline_idx = self._find_newline(fragment, max_line_chars)
+        for start, end, hyphenate in self.wrap_spans(unwrapped_text, max_line_chars, advance):
+            if hyphenate:
+                wrapped.append(unwrapped_text[start:end] + HYPHEN)
+            else:
+                wrapped.append(unwrapped_text[start:end])
+        return wrapped
+
+    def wrap_spans(self, text: str, max_line_chars: int, advance=None):
+        """
+        Generator that word wraps text in a single pass without copying it.
+
+        Arguments:
+
+        text -- The text to wrap.
+        max_line_chars -- The maximum number of characters that are allowed in a line.
+        advance -- Optional function returning the width of a character, for proportional
+                fonts.  When given, max_line_chars is the maximum width of a line in the same
+                units, and every line holds at least one character.
+
+        Yields a (start, end, hyphenate) tuple for each line: the line is text[start:end],
+        followed by a hyphen if hyphenate is True.  Lines are produced on demand, so a
+        caller can stop as soon as it has all the lines it needs.
+
+        """
+        n = len(text)
+        start = 0
+        while True:
+            if advance is None:
+                limit = start + max_line_chars
+            else:
+                limit = self._find_limit(text, start, max_line_chars, advance)
+            count = limit - start
+            newline_idx = self._find_newline(text, count, start)
             if (newline_idx != -1):
-                # Handle embedded line breaks.                            
-                line = fragment[0:newline_idx]
-                wrapped.append(line)
-                fragment = fragment[newline_idx+1:len(fragment)]
-                if (fragment.strip == ""):
-                    more = False
-            elif (len(fragment) <= max_line_chars):
+                # Handle embedded line breaks.
+                yield (start, newline_idx, False)
+                start = newline_idx + 1
+            elif (n <= limit):
                 # nothing to wrap
-                wrapped.append(fragment)
-                more = False
-            elif (fragment[max_line_chars] in WHITESPACE):
+                yield (start, n, False)
+                return
+            elif (text[limit] in WHITESPACE):
                 # we are line wrapping at whitespace.
-                pos = max_line_chars
-                line = fragment[0:pos]
-                wrapped.append(line)
-                fragment = fragment[pos+1:len(fragment)]
-                if (fragment.strip == ""):
-                    more = False
+                yield (start, limit, False)
+                start = limit + 1
             else:
                 # need to find the last word delimiter and break there.
-                pos = self._find_word_break(fragment[0:max_line_chars])
-                if (pos == max_line_chars):
-                    # we did not find a word break. Force a hyphen and move on.
-                    line = fragment[0:max_line_chars - 1] + HYPHEN
-                    wrapped.append(line)
-                    fragment = fragment[max_line_chars - 1:len(fragment)]
-                else:
-                    if not (fragment[pos] in WHITESPACE):
-                        line = fragment[0:pos+1]
-                        wrapped.append(line)
-                        fragment = fragment[pos+1:len(fragment)]
+                pos = self._find_word_break(text, start, limit)
+                if (pos == limit):
+                    if (count == 1):
+                        # no room for a hyphen: break after every character.
+                        yield (start, limit, False)
+                        start = limit
                     else:
-                        line = fragment[0:pos]
+                        # we did not find a word break. Force a hyphen and move on.
+                        end = limit - 1
+                        if advance is not None:
+                            end = self._hyphen_break(text, start, end, max_line_chars, advance)
+                        yield (start, end, True)
+                        start = end
+                elif not (text[pos] in WHITESPACE):
+                    yield (start, pos + 1, False)
+                    start = pos + 1
+                else:
+                    yield (start, pos, False)
+                    start = pos + 1
 
-                        wrapped.append(line)
-                        fragment = fragment[pos+1:len(fragment)]
-                        
-                    if (fragment.strip == ""):
-                        more = False
-        return wrapped
+    def _find_limit(self, text: str, start: int, max_width: int, advance) -> int:
+        """
+        Returns the end of the longest run of characters from start that is no wider than
+        max_width, and at least start + 1 unless start is the end of text.  Line breaks are
+        not counted.
+        """
+        n = len(text)
+        width = 0
+        i = start
+        while i < n:
+            character = text[i]
+            if character != '\r' and character != '\n':
+                width += advance(character)
+                if width > max_width and i > start:
+                    break
+            i += 1
+        return i
 
-    def _find_word_break(self, sentence: str) -> int:
+    def _hyphen_break(self, text: str, start: int, end: int, max_width: int, advance) -> int:
+        """
+        Moves end back until text[start:end] followed by a hyphen is no wider than max_width,
+        keeping at least one character.
         """
-        Find the position of the last word break in the input string.  If a word break is not found,
-        the length of the input string is returned.
+        width = advance(HYPHEN)
+        for i in range(start, end):
+            width += advance(text[i])
+        while end > start + 1 and width > max_width:
+            end -= 1
+            width -= advance(text[end])
+        return end
+
+    def _find_word_break(self, sentence: str, start: int = 0, end: int = -1) -> int:
         """
-        for i in range(len(sentence) - 1, -1, -1):
+        Find the position of the last word break in sentence[start:end].  If a word break is not found,
+        end is returned.  end defaults to the length of the input string.
+        """
+        if end < 0:
+            end = len(sentence)
+        for i in range(end - 1, start - 1, -1):
             if sentence[i] in WORD_DELIM:
                 return i
         # if we got this far, a word delimiter was not found, return end of the input string.
-        return len(sentence)
+        return end
     
-    def _find_newline(self, sentence, max_line_chars) -> int:
+    def _find_newline(self, sentence, max_line_chars, start: int = 0) -> int:
         """
-        returns the position of a newline provided it is within the max length.  returns -1 if not found in that criteria.
+        returns the position of a newline provided it is within max_line_chars of start.  returns -1 if not found in that criteria.
         """
-        i = sentence[0:max_line_chars].find('\r')
+        end = start + max_line_chars
+        i = sentence.find('\r', start, end)
         if (i == -1):
-            i = sentence[0:max_line_chars].find('\n')
-        # print("sentence=" + sentence[0:max_line_chars] + " *newline index = " + str(i))
+            i = sentence.find('\n', start, end)
         return i
-
@@ -0,0 +1,38 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+import bench_framebuf2
+
+
+class BenchmarkTestSuite(unittest.TestCase):
+    """
+    Tests for the framebuf2 benchmark harness.
+    """
+
+    def test_counting_class(self):
+        """
+        The instrumented frame buffer counts primitive calls made by the extension methods.
+        """
+        cls = bench_framebuf2.counting_class(bench_framebuf2.framebuf2.FrameBuffer)
+        fb = cls(bytearray(8 * 8), 8, 8, bench_framebuf2.framebuf2.MONO_HLSB)
+        fb.reset_counts()
+        fb.large_text("-", 0, 0, 1)
+        self.assertEqual(fb.counts["hline"], 1)
+
+    def test_compare_flags_regressions(self):
+        """
+        Slower cases and cases that make more primitive calls are reported.
+        """
+        old = {
+            "a": {"seconds": 1.0, "primitives": {"hline": 4}, "allocated": 0},
+            "b": {"seconds": 1.0, "primitives": {"hline": 4}, "allocated": 0},
+        }
+        new = {
+            "a": {"seconds": 1.05, "primitives": {"hline": 4}, "allocated": 0},
+            "b": {"seconds": 2.0, "primitives": {"hline": 5}, "allocated": 0},
+        }
+        regressions = bench_framebuf2.compare(old, new, 0.1)
+        self.assertEqual([name for name, reason in regressions], ["b", "b"])
@@ -0,0 +1,701 @@
+import unittest
+import asyncio
+import json
+import math
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+import framebuf_host
+
+
+def make_buffer(w=64, h=64, fmt=framebuf2.MONO_HLSB):
+    buf = bytearray(w * h * 2)
+    return buf, framebuf2.FrameBuffer(buf, w, h, fmt)
+
+
+class FrameBuffer2TestSuite(unittest.TestCase):
+    """
+    Tests for the framebuf2 FrameBuffer extensions.
+    """
+
+    def test_large_text_scales_font(self):
+        """
+        Every pixel of text() becomes an m x m block in large_text().
+        """
+        buf, small = make_buffer()
+        small.text("Hi!", 0, 0, 1)
+        buf, large = make_buffer()
+        large.large_text("Hi!", 0, 0, 2, 1)
+        for y in range(16):
+            for x in range(48):
+                self.assertEqual(large.pixel(x, y), small.pixel(x // 2, y // 2))
+
+    def test_large_text_rotation(self):
+        """
+        A character rotated by 180 degrees is the upright character flipped both ways.
+        """
+        buf, upright = make_buffer()
+        upright.large_text("F", 0, 0, 1, 1)
+        buf, rotated = make_buffer()
+        rotated.large_text("F", 0, 0, 1, 1, 180)
+        for y in range(8):
+            for x in range(8):
+                self.assertEqual(rotated.pixel(7 - x, 7 - y), upright.pixel(x, y))
+
+    def test_glyph_cache(self):
+        """
+        Cached glyphs are drawn exactly as uncached ones, and the counters track reuse.
+        """
+        for fmt in (framebuf2.MONO_VLSB, framebuf2.RGB565, framebuf2.GS4_HMSB):
+            plain_buf, plain = make_buffer(fmt=fmt)
+            cached_buf, cached = make_buffer(fmt=fmt)
+            cached.set_glyph_cache(2048)
+            for fb in (plain, cached):
+                fb.large_text("1:11", 3, 5, 2, 3)
+                fb.large_text("10", 1, 30, 3, 0, 90)
+            self.assertEqual(plain_buf, cached_buf)
+        stats = cached.glyph_cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 4)
+        self.assertTrue(stats["bytes"] <= 2048)
+
+    def test_glyph_cache_eviction(self):
+        """
+        The least recently used glyph is evicted when the cache is full.
+        """
+        buf, fb = make_buffer()
+        fb.set_glyph_cache(16)
+        fb.large_text("ABC", 0, 0, 1)
+        stats = fb.glyph_cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["glyphs"], 2)
+
+    def test_large_text_calls(self):
+        """
+        Run merging needs far fewer calls than one per pixel.
+        """
+        per_pixel, merged = framebuf2.large_text_calls("HUGE")
+        self.assertEqual(per_pixel, 109)
+        self.assertTrue(merged * 4 < per_pixel)
+
+    def test_circle_and_triangle(self):
+        """
+        Filled shapes cover their centre and stay within their bounds.
+        """
+        buf, fb = make_buffer()
+        fb.circle(32, 32, 10, 1, True)
+        self.assertEqual(fb.pixel(32, 32), 1)
+        self.assertEqual(fb.pixel(32, 42), 1)
+        self.assertEqual(fb.pixel(32, 43), 0)
+        fb.fill(0)
+        fb.triangle(0, 0, 0, 20, 20, 20, 1, True)
+        self.assertEqual(fb.pixel(1, 19), 1)
+        self.assertEqual(fb.pixel(19, 1), 0)
+
+    def test_filled_shapes_draw_each_pixel_once(self):
+        """
+        Filled circles, ellipses, rings and pies cover exactly the pixels they draw.
+        """
+
+        class Counting(framebuf2.FrameBuffer):
+            area = 0
+
+            def fill_rect(self, x, y, w, h, c):
+                self.area += w * h
+                super().fill_rect(x, y, w, h, c)
+
+            def hline(self, x, y, w, c):
+                self.area += w
+                super().hline(x, y, w, c)
+
+        for draw in (
+            lambda fb: fb.circle(32, 32, 25, 1, True),
+            lambda fb: fb.ellipse(32, 32, 30, 11, 1, True),
+            lambda fb: fb.ring(32, 32, 20, 5, 1),
+            lambda fb: fb.arc(32, 32, 20, -30, 200, 1, 3),
+            lambda fb: fb.pie(32, 32, 20, 100, 10, 1),
+        ):
+            buf = bytearray(64 * 64)
+            fb = Counting(buf, 64, 64, framebuf2.GS8)
+            draw(fb)
+            self.assertEqual(fb.area, sum(buf))
+
+    def test_ring_and_pie(self):
+        """
+        A ring is a disc without the inner disc, and a pie is the part of a disc in its sector.
+        """
+        disc_buf, disc = make_buffer(fmt=framebuf2.GS8)
+        disc.circle(32, 32, 20, 1, True)
+        hole_buf, hole = make_buffer(fmt=framebuf2.GS8)
+        hole.circle(32, 32, 14, 1, True)
+        ring_buf, ring = make_buffer(fmt=framebuf2.GS8)
+        ring.ring(32, 32, 20, 6, 1)
+        pie_buf, pie = make_buffer(fmt=framebuf2.GS8)
+        pie.pie(32, 32, 20, 30, 120, 1)
+        for y in range(64):
+            for x in range(64):
+                inside = disc.pixel(x, y)
+                self.assertEqual(ring.pixel(x, y), inside and not hole.pixel(x, y))
+                if inside and (x, y) != (32, 32):
+                    angle = math.degrees(math.atan2(y - 32, x - 32)) % 360
+                    if 31 < angle < 119:
+                        self.assertEqual(pie.pixel(x, y), 1)
+                    elif angle < 29 or angle > 121:
+                        self.assertEqual(pie.pixel(x, y), 0)
+                elif not inside:
+                    self.assertEqual(pie.pixel(x, y), 0)
+        pie.fill(0)
+        pie.pie(32, 32, 20, 45, 405, 1)
+        self.assertEqual(pie_buf, disc_buf)
+
+    def test_ellipse(self):
+        """
+        The ellipse outline lies within the filled ellipse, which spans both radii.
+        """
+        outline_buf, outline = make_buffer(fmt=framebuf2.GS8)
+        outline.ellipse(32, 32, 25, 9, 1)
+        filled_buf, filled = make_buffer(fmt=framebuf2.GS8)
+        filled.ellipse(32, 32, 25, 9, 1, True)
+        for i in range(len(outline_buf)):
+            self.assertTrue(filled_buf[i] or not outline_buf[i])
+        self.assertEqual(filled.pixel(7, 32), 1)
+        self.assertEqual(filled.pixel(6, 32), 0)
+        self.assertEqual(filled.pixel(32, 41), 1)
+        self.assertEqual(filled.pixel(32, 42), 0)
+
+    def test_ellipse_matches_framebuf(self):
+        """
+        Degenerate, thin and negative radii and the quadrant mask draw the same pixels as
+        framebuf_host's port of MicroPython's ellipse().
+        """
+        radii = [(0, 0), (0, 5), (5, 0), (1, 4), (4, 1), (1, 9), (2, 13), (13, 2), (-3, 2), (0, -3)]
+        for xr, yr in radii:
+            for f in (False, True):
+                for m in (0b1111, 0b0011, 0b0101, 0b1000, 0):
+                    ref_buf = bytearray(32 * 32)
+                    ref = framebuf_host.FrameBuffer(ref_buf, 32, 32, framebuf_host.GS8)
+                    ref.ellipse(15, 15, xr, yr, 1, f, m)
+                    buf = bytearray(32 * 32)
+                    fb = framebuf2.FrameBuffer(buf, 32, 32, framebuf2.GS8)
+                    fb.ellipse(15, 15, xr, yr, 1, f, m)
+                    self.assertEqual(buf, ref_buf, (xr, yr, f, m))
+        fb.fill(0)
+        fb.ellipse(15, 15, 0, 5, 1, True)
+        self.assertEqual(sum(buf), 3)
+
+    def test_polygon_fill_matches_triangle(self):
+        """
+        A filled three point polygon covers exactly the pixels of a filled triangle, also when clipped.
+        """
+        for points in ((5, 3, 60, 20, 20, 58), (-10, 40, 70, -5, 30, 90), (0, 10, 50, 10, 25, 10)):
+            tri_buf, tri = make_buffer(fmt=framebuf2.GS8)
+            tri.triangle(*points, 1, True)
+            poly_buf, poly = make_buffer(fmt=framebuf2.GS8)
+            poly.polygon(points, 1, True)
+            self.assertEqual(poly_buf, tri_buf)
+
+    def test_polygon_fill_rules(self):
+        """
+        The centre of a five point star is a hole with EVEN_ODD and filled with NON_ZERO.
+        """
+        star = [(32, 2), (50, 60), (3, 24), (61, 24), (14, 60)]
+        buf, fb = make_buffer()
+        fb.polygon(star, 1, True)
+        self.assertEqual(fb.pixel(32, 36), 0)
+        self.assertEqual(fb.pixel(32, 10), 1)
+        fb.fill(0)
+        fb.polygon(star, 1, True, framebuf2.NON_ZERO)
+        self.assertEqual(fb.pixel(32, 36), 1)
+        # a concave arrow, as a flat list of coordinates
+        arrow = [0, 20, 40, 20, 40, 5, 63, 32, 40, 59, 40, 44, 0, 44]
+        fb.fill(0)
+        fb.polygon(arrow, 1, True)
+        self.assertEqual(fb.pixel(20, 10), 0)
+        self.assertEqual(fb.pixel(20, 30), 1)
+        self.assertEqual(fb.pixel(42, 10), 1)
+        outline_buf, outline = make_buffer()
+        outline.polygon(arrow, 1)
+        for i in range(0, len(arrow), 2):
+            self.assertEqual(fb.pixel(arrow[i], arrow[i + 1]), 1)
+            self.assertEqual(outline.pixel(arrow[i], arrow[i + 1]), 1)
+        self.assertEqual(outline.pixel(20, 30), 0)
+        with self.assertRaises(ValueError):
+            fb.polygon([1, 2, 3], 1)
+
+    def test_clip(self):
+        """
+        Clipped drawing matches unclipped drawing inside the clip rectangle and leaves the rest alone.
+        """
+        for draw in (
+            lambda fb: fb.large_text("clip me", -5, 20, 2, 1, 90),
+            lambda fb: fb.circle(30, 30, 25, 1, True),
+            lambda fb: fb.pie(30, 30, 25, 0, 300, 1, False),
+            lambda fb: fb.polygon([(0, 0), (63, 10), (20, 63)], 1, True),
+            lambda fb: fb.triangle(0, 0, 63, 10, 20, 63, 1),
+        ):
+            full_buf, full = make_buffer(fmt=framebuf2.GS8)
+            draw(full)
+            clipped_buf, clipped = make_buffer(fmt=framebuf2.GS8)
+            clipped.set_glyph_cache(1024)
+            clipped.set_clip(10, 12, 30, 20)
+            self.assertEqual(clipped.get_clip(), (10, 12, 30, 20))
+            draw(clipped)
+            for y in range(64):
+                for x in range(64):
+                    inside = 10 <= x < 40 and 12 <= y < 32
+                    self.assertEqual(clipped.pixel(x, y), full.pixel(x, y) if inside else 0)
+        clipped.set_clip()
+        self.assertEqual(clipped.get_clip(), (0, 0, 64, 64))
+        # with the clip rectangle back to the buffer the primitives are no longer wrapped.
+        self.assertEqual(clipped._fill_rect, clipped.fill_rect)
+
+    def test_clip_culls_text(self):
+        """
+        Only the characters inside the clip rectangle are drawn.
+        """
+
+        class Counting(framebuf2.FrameBuffer):
+            calls = 0
+
+            def hline(self, x, y, w, c):
+                self.calls += 1
+                super().hline(x, y, w, c)
+
+        buf = bytearray(64 * 64 // 8)
+        fb = Counting(buf, 64, 64, framebuf2.MONO_HLSB)
+        fb.large_text("X" * 1000, -4000, 0, 1)
+        visible = fb.calls
+        fb.calls = 0
+        fb.large_text("X" * 8, 0, 0, 1)
+        self.assertEqual(visible, fb.calls)
+        fb.calls = 0
+        fb.set_clip(0, 0, 16, 64)
+        fb.large_text("X" * 1000, 0, 0, 1)
+        fb.large_text("X" * 1000, 0, 64, 1)
+        self.assertEqual(visible, fb.calls * 4)
+
+    def test_display_list(self):
+        """
+        Replaying a display list draws what was recorded, optionally offset or limited to an area.
+        """
+
+        def screen(fb):
+            fb.rect(0, 0, 64, 64, 1)
+            fb.large_text("12", 4, 4, 2, 1)
+            fb.circle(40, 40, 10, 1, True)
+            fb.triangle(2, 60, 20, 30, 30, 62, 1)
+            fb.text("ok", 40, 4, 1)
+            fb.pixel(63, 63, 0)
+
+        expected_buf, expected = make_buffer()
+        screen(expected)
+        buf, fb = make_buffer()
+        fb.begin_record()
+        screen(fb)
+        display_list = fb.end_record()
+        self.assertEqual(buf, bytearray(len(buf)))
+        self.assertTrue(len(display_list) > 0)
+        display_list.replay(fb)
+        self.assertEqual(buf, expected_buf)
+
+        moved_buf, moved = make_buffer(80, 80)
+        display_list.replay(moved, 10, 16)
+        for y in range(64):
+            for x in range(64):
+                self.assertEqual(moved.pixel(x + 10, y + 16), expected.pixel(x, y))
+
+        # only the commands touching the top rows are replayed.
+        top_buf, top = make_buffer()
+        display_list.replay(top, area=(0, 0, 64, 3))
+        self.assertEqual(top.pixel(4, 4), 0)
+        self.assertEqual(top.pixel(0, 40), 1)
+        self.assertEqual(top.pixel(40, 40), 0)
+
+    def test_display_list_clipped_blit(self):
+        """
+        A replayed blit cut by the clip rectangle compares the key after the palette, as blit does.
+        """
+        source = (bytearray(range(16)), 4, 4, framebuf2.GS8)
+        palette = (bytearray([7, 3] * 8), 16, 1, framebuf2.GS8)
+        buf, fb = make_buffer(16, 16, framebuf2.GS8)
+        fb.blit(source, 2, 2, 3, palette)
+        expected = bytes(buf)
+        fb.fill(0)
+        fb.begin_record()
+        fb.blit(source, 2, 2, 3, palette)
+        display_list = fb.end_record()
+        fb.set_clip(0, 0, 4, 16)
+        display_list.replay(fb)
+        for y in range(16):
+            for x in range(16):
+                self.assertEqual(buf[y * 16 + x], expected[y * 16 + x] if x < 4 else 0)
+
+    def test_display_list_clip(self):
+        """
+        Commands are recorded unclipped and clipped by the buffer they are replayed on.
+        """
+        buf, fb = make_buffer()
+        fb.set_clip(0, 0, 8, 8)
+        fb.begin_record()
+        fb.fill_rect(4, 4, 20, 2, 1)
+        fb.hline(30, 30, 4, 1)
+        display_list = fb.end_record()
+        self.assertEqual(len(display_list), 2)
+        fb.set_clip()
+        display_list.replay(fb)
+        self.assertEqual(fb.pixel(23, 5), 1)
+        self.assertEqual(fb.pixel(33, 30), 1)
+        fb.fill(0)
+        fb.set_clip(0, 0, 8, 8)
+        display_list.replay(fb)
+        self.assertEqual(fb.pixel(7, 5), 1)
+        self.assertEqual(fb.pixel(8, 5), 0)
+        self.assertEqual(fb.pixel(33, 30), 0)
+
+    def test_display_list_errors(self):
+        """
+        Recording cannot be nested or scroll the buffer.
+        """
+        buf, fb = make_buffer()
+        with self.assertRaises(ValueError):
+            fb.end_record()
+        fb.begin_record()
+        with self.assertRaises(ValueError):
+            fb.begin_record()
+        with self.assertRaises(ValueError):
+            fb.scroll(1, 0)
+        fb.end_record()
+        fb.scroll(1, 0)
+
+    def test_set_origin(self):
+        """
+        With the origin moved, every drawing method draws moved by it.
+        """
+        expected_buf, expected = make_buffer()
+        expected.fill_rect(2, 3, 4, 5, 1)
+        expected.large_text("A", 10, 20, 2)
+        expected.circle(40, 40, 8, 1, True)
+        buf, fb = make_buffer()
+        fb.set_origin(-5, 7)
+        fb.fill_rect(-3, 10, 4, 5, 1)
+        fb.large_text("A", 5, 27, 2)
+        fb.circle(35, 47, 8, 1, True)
+        self.assertEqual(fb.get_clip(), (-5, 7, 64, 64))
+        self.assertEqual(buf, expected_buf)
+
+    def test_render_bands(self):
+        """
+        A frame drawn band by band, from a function or a display list, matches one drawn whole.
+        """
+
+        def frame(fb):
+            fb.rect(0, 0, 96, 80, 1)
+            fb.large_text("band", 3, 13, 3)
+            fb.circle(60, 50, 25, 1, True)
+            fb.triangle(0, 79, 30, 30, 50, 79, 1, True)
+            fb.text("edge", 20, 44, 1)
+
+        expected_buf, expected = make_buffer(96, 80)
+        frame(expected)
+        recorder = framebuf2.FrameBuffer(bytearray(96 * 80 // 8), 96, 80, framebuf2.MONO_HLSB)
+        recorder.begin_record()
+        frame(recorder)
+        display_list = recorder.end_record()
+        for source in (frame, display_list):
+            out_buf, out = make_buffer(96, 80)
+            bands = []
+
+            def sink(band, x, y, w, h):
+                bands.append((x, y, w, h))
+                out.blit(band, x, y)
+
+            band = framebuf2.FrameBuffer(bytearray(96 * 16 // 8), 96, 16, framebuf2.MONO_HLSB)
+            band.render_bands(source, sink, 96, 80)
+            self.assertEqual(bands, [(0, y, 96, 16) for y in range(0, 80, 16)])
+            self.assertEqual(out_buf, expected_buf)
+            self.assertEqual(band.get_clip(), (0, 0, 96, 16))
+
+    def test_mono_direct_writes(self):
+        """
+        Byte writes to MONO_HLSB and MONO_VLSB buffers match drawing through framebuf.
+        """
+
+        def frame(fb):
+            fb.large_text("8x", -5, 3, 8, 1)
+            fb.large_text("1", 61, 12, 16, 1, 90)
+            fb.fill_rect(3, 2, 70, 29, 1)
+            fb.fill_rect(11, 9, 40, 17, 0)
+            fb.circle(50, 50, 30, 1, True)
+            fb.triangle(0, 90, 95, 60, 40, 5, 0, True)
+
+        for fmt in (framebuf2.MONO_HLSB, framebuf2.MONO_VLSB):
+            buf, fb = make_buffer(100, 90, fmt)
+            self.assertIsNotNone(fb._direct)
+            frame(fb)
+            expected_buf, expected = make_buffer(100, 90, fmt)
+            expected._direct = None
+            expected._rebind()
+            frame(expected)
+            self.assertEqual(buf, expected_buf)
+
+        class Counting(framebuf2.FrameBuffer):
+            def fill_rect(self, *args):
+                super().fill_rect(*args)
+
+        counting = Counting(bytearray(64 * 64), 64, 64, framebuf2.MONO_HLSB)
+        self.assertEqual(counting._fill_rect, counting.fill_rect)
+        rgb = framebuf2.FrameBuffer(bytearray(64 * 64 * 2), 64, 64, framebuf2.RGB565)
+        self.assertIsNone(rgb._direct)
+        # the native framebuf fills whole bytes itself.
+        framebuf2._HOST_FRAMEBUF = False
+        try:
+            native = framebuf2.FrameBuffer(bytearray(64 * 64), 64, 64, framebuf2.MONO_HLSB)
+        finally:
+            framebuf2._HOST_FRAMEBUF = True
+        self.assertIsNone(native._direct)
+
+    def test_profile(self):
+        """
+        Profiling counts the outermost drawing calls by region and is removed when turned off.
+        """
+        buf, fb = make_buffer(128, 64)
+        self.assertIsNone(fb.profiler)
+        with fb.region("ignored"):
+            fb.circle(10, 10, 5, 1, True)
+        profiler = fb.profile()
+        self.assertIs(fb.profile(), profiler)
+        with fb.region("header"):
+            fb.large_text("Hi", 0, 0, 2)
+            fb.large_text_fit("hello there world", 0, 16, 4, 128, 48, 1)
+        with fb.region("gauge"):
+            fb.circle(100, 40, 20, 1, True)
+            fb.fill_rect(0, 0, 4, 4, 1)
+        fb.large_text_wrap("abc def", 0, 0, 1, 1, 40)
+        self.assertIsNone(profiler.current_region)
+        stats = profiler.stats
+        self.assertEqual(
+            set(stats),
+            {
+                ("header", "large_text"),
+                ("header", "large_text_fit"),
+                ("gauge", "circle"),
+                (None, "large_text_wrap"),
+            },
+        )
+        # the lines of large_text_wrap are not counted again as large_text calls.
+        self.assertEqual(stats[(None, "large_text_wrap")][0], 1)
+        self.assertEqual(stats[("header", "large_text")][0], 1)
+        self.assertGreater(stats[("gauge", "circle")][2], 0)
+        # a filled circle draws each of its pixels once.
+        disc_buf, disc = make_buffer()
+        disc.circle(30, 30, 20, 1, True)
+        drawn = sum(disc.pixel(x, y) for y in range(64) for x in range(64))
+        self.assertEqual(stats[("gauge", "circle")][3], drawn)
+        self.assertEqual(profiler.regions()["header"][0], 2)
+        self.assertTrue(profiler.trace[0].startswith("factor = 4"))
+        self.assertIn("gauge", profiler.report())
+        results = json.loads(profiler.to_json())["results"]
+        self.assertEqual(len(results), 4)
+        self.assertEqual(fb.profile(False), None)
+        self.assertNotIn("large_text", fb.__dict__)
+        self.assertEqual(fb._hline, fb.hline)
+
+    def test_async_drawing(self):
+        """
+        The async methods yield to the event loop and draw the same pixels as the synchronous ones.
+        """
+        text = "the quick brown fox jumps over the lazy dog"
+        calls = (
+            ("large_text", ("Async", -6, 3, 3, 1, 270, 90)),
+            ("large_text_wrap", (text, 0, 20, 2, 1, 100)),
+            ("large_text_fit", (text, 4, 8, 5, 120, 56, 1)),
+            ("circle", (60, 40, 30, 1, True)),
+            ("circle", (20, 20, 12, 1)),
+            ("triangle", (-10, 5, 90, 60, 40, -20, 1, True)),
+        )
+        expected_buf, expected = make_buffer(128, 64)
+        expected.set_clip(3, 2, 120, 55)
+        buf, fb = make_buffer(128, 64)
+        fb.set_clip(3, 2, 120, 55)
+        for name, args in calls:
+            getattr(expected, name)(*args)
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        async def draw():
+            task = asyncio.create_task(ticker())
+            for name, args in calls:
+                await getattr(fb, name + "_async")(*args, budget_us=0)
+            task.cancel()
+            return await fb.large_text_fit_async(text, 4, 8, 5, 120, 56, 1, budget_us=0)
+
+        self.assertEqual(asyncio.run(draw()), expected.large_text_fit(text, 4, 8, 5, 120, 56, 1))
+        self.assertEqual(buf, expected_buf)
+        self.assertGreater(len(ticks), 20)
+
+        # async text is not counted as one large_text call per character.
+        profiler = fb.profile()
+        asyncio.run(fb.large_text_async("hello", 0, 0, 2, 1))
+        asyncio.run(fb.large_text_wrap_async(text, 0, 20, 2, 1, 100))
+        self.assertEqual(profiler.results(), [])
+        fb.large_text("hello", 0, 0, 2, 1)
+        self.assertEqual([result["calls"] for result in profiler.results()], [1])
+
+    def test_blit_scaled(self):
+        """
+        Sources are scaled, rotated, keyed and mapped through a palette pixel by pixel,
+        with one primitive call per run.
+        """
+        sbuf = bytearray(6 * 4)
+        source = framebuf2.FrameBuffer(sbuf, 6, 4, framebuf2.GS8)
+        for j in range(4):
+            for i in range(6):
+                source.pixel(i, j, (i * j) % 3)
+        palette = framebuf2.FrameBuffer(bytearray(b"\x05\x00\x09"), 3, 1, framebuf2.GS8)
+        for rotation in (0, 90, 180, 270):
+            expected_buf, expected = make_buffer(32, 32, framebuf2.GS8)
+            for j in range(4):
+                for i in range(6):
+                    c = palette.pixel(source.pixel(i, j), 0)
+                    if c == 0:
+                        continue
+                    x, y, w, h = i, j, 6, 4
+                    for _ in range(rotation // 90):
+                        x, y, w, h = h - 1 - y, x, h, w
+                    expected.fill_rect(3 + 3 * x, 2 + 3 * y, 3, 3, c)
+            buf, fb = make_buffer(32, 32, framebuf2.GS8)
+            fb.blit_scaled(source, 3, 2, 3, rotation, 0, palette)
+            self.assertEqual(buf, expected_buf)
+            sprite = framebuf2.Sprite((sbuf, 6, 4, framebuf2.GS8), 0, palette)
+            buf, fb = make_buffer(32, 32, framebuf2.GS8)
+            fb.blit_scaled(sprite, 3, 2, 3, rotation)
+            self.assertEqual(buf, expected_buf)
+        # without rotation or scaling it draws as blit does.
+        buf, fb = make_buffer(32, 32, framebuf2.GS8)
+        fb.blit(source, -2, 5, 1)
+        expected = bytes(buf)
+        fb.fill(0)
+        fb.blit_scaled(source, -2, 5, 1, 0, 1)
+        self.assertEqual(buf, expected)
+        with self.assertRaises(ValueError):
+            fb.blit_scaled(sprite, 0, 0, 1, 0, 1)
+
+    def test_dirty_tracking_off(self):
+        """
+        With tracking off nothing is recorded and the primitives are not wrapped.
+        """
+        buf, fb = make_buffer()
+        fb.large_text("A", 0, 0, 2)
+        self.assertEqual(fb.take_dirty(), [])
+        self.assertNotIn("fill_rect", fb.__dict__)
+        fb.track_dirty()
+        self.assertIn("fill_rect", fb.__dict__)
+        fb.track_dirty(False)
+        self.assertNotIn("fill_rect", fb.__dict__)
+
+    def test_dirty_tracking_merges(self):
+        """
+        Overlapping areas are merged and separate areas are kept apart.
+        """
+        buf, fb = make_buffer()
+        fb.track_dirty()
+        fb.large_text("12", 4, 4, 2)
+        fb.fill_rect(30, 10, 10, 10, 1)
+        fb.pixel(60, 60, 1)
+        self.assertEqual(sorted(fb.take_dirty()), [(4, 4, 36, 16), (60, 60, 1, 1)])
+        self.assertEqual(fb.take_dirty(), [])
+
+    def test_dirty_tracking_covers_drawing(self):
+        """
+        Every pixel changed by a drawing method lies inside a reported area.
+        """
+        buf, fb = make_buffer(fmt=framebuf2.MONO_VLSB)
+        fb.track_dirty()
+        before = bytearray(buf)
+        fb.circle(20, 20, 6, 1, True)
+        fb.triangle(40, 50, 60, 40, 50, 63, 1, True)
+        fb.large_text("ok", 0, 40, 1, 1, 90)
+        fb.line(63, 0, 50, 9, 1)
+        # framebuf still draws two sides of an outline with no width or a negative height.
+        fb.rect(4, 26, 0, 7, 1)
+        fb.rect(30, 4, 5, -1, 1)
+        areas = fb.take_dirty()
+        old = framebuf2.FrameBuffer(before, 64, 64, framebuf2.MONO_VLSB)
+        for y in range(64):
+            for x in range(64):
+                if fb.pixel(x, y) != old.pixel(x, y):
+                    self.assertTrue(
+                        any(
+                            a[0] <= x < a[0] + a[2] and a[1] <= y < a[1] + a[3]
+                            for a in areas
+                        )
+                    )
+        for area in areas:
+            self.assertEqual(area[1] % 8, 0)
+            self.assertEqual(area[3] % 8, 0)
+
+    def test_measure_text(self):
+        """
+        measure_text reports the wrapped line count and the area covered.
+        """
+        buf, fb = make_buffer()
+        lines, width, height = fb.measure_text("my little pony", 1, 72)
+        self.assertEqual((lines, width, height), (2, 72, 20))
+        lines, width, height = fb.measure_text("abcdefghij", 2, 64)
+        self.assertEqual((lines, width, height), (3, 64, 56))
+
+    def test_large_text_fit(self):
+        """
+        large_text_fit picks the largest factor that fits, without printing, and returns it.
+        """
+        buf, fb = make_buffer(128, 64)
+        m = fb.large_text_fit("big text", 0, 0, 6, 128, 64, 1)
+        self.assertEqual(m, 2)
+        expected_buf, expected = make_buffer(128, 64)
+        expected.large_text_wrap("big text", 0, 0, 2, 1, 128)
+        self.assertEqual(buf, expected_buf)
+        with self.assertRaises(ValueError):
+            fb.large_text_fit("x" * 200, 0, 0, 2, 64, 16, 1)
+
+    def test_layout_cache(self):
+        """
+        Cached layouts draw the same text, and repeated calls are served from the cache.
+        """
+        text = "status: all systems nominal"
+        plain_buf, plain = make_buffer(128, 64)
+        cached_buf, cached = make_buffer(128, 64)
+        cached.set_layout_cache(512)
+        for i in range(3):
+            plain.large_text_wrap(text, 0, 0, 1, 1, 64)
+            cached.large_text_wrap(text, 0, 0, 1, 1, 64)
+            self.assertEqual(plain.large_text_fit(text, 0, 32, 3, 128, 32, 1),
+                             cached.large_text_fit(text, 0, 32, 3, 128, 32, 1))
+        self.assertEqual(plain_buf, cached_buf)
+        stats = cached.layout_cache.stats()
+        self.assertEqual(stats["hits"], 4)
+        self.assertEqual(stats["layouts"], 2)
+        cached.layout_cache.invalidate_text(text)
+        self.assertEqual(cached.layout_cache.stats()["layouts"], 0)
+
+    def test_text_field(self):
+        """
+        A text field redraws only changed cells and reports them as damage.
+        """
+        buf, fb = make_buffer(128, 32)
+        clock = fb.text_field(0, 0, 2, 8)
+        self.assertEqual(clock.set("12:34:56"), 8)
+        self.assertEqual(clock.damage(), [(0, 0, 128, 16)])
+        self.assertEqual(clock.set("12:34:57"), 1)
+        self.assertEqual(clock.damage(), [(112, 0, 16, 16)])
+        expected_buf, expected = make_buffer(128, 32)
+        expected.large_text("12:34:57", 0, 0, 2)
+        self.assertEqual(buf, expected_buf)
+        self.assertEqual(clock.set("9"), 8)
+        self.assertEqual(clock.value, "9       ")
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+import framebuf_batch
+
+TITLES = ("Settings", "Einstellungen", "Paramètres", "Impostazioni")
+
+
+def menu(title):
+    return [
+        ("large_text_fit", (title, 0, 0, 4, 96, 32, 1)),
+        ("large_text_wrap", ("Back Next", 0, 34, 1, 1, 96)),
+        ("circle", (85, 52, 8, 1, True)),
+        ("triangle", (0, 63, 10, 50, 20, 63, 1, True)),
+    ]
+
+
+class FrameBufferBatchTestSuite(unittest.TestCase):
+    """
+    Tests for the batch renderer.
+    """
+
+    def test_render_frames(self):
+        """
+        Frames drawn in worker processes match frames drawn one by one.
+        """
+        frames = [menu(title) for title in TITLES * 3]
+        expected = []
+        for commands in frames:
+            buf = bytearray(96 * 64 // 8)
+            fb = framebuf2.FrameBuffer(buf, 96, 64, framebuf2.MONO_VLSB)
+            for name, args in commands:
+                getattr(fb, name)(*args)
+            expected.append(bytes(buf))
+        for processes in (1, 2):
+            rendered = framebuf_batch.render_frames(
+                frames, 96, 64, framebuf2.MONO_VLSB, processes, glyph_cache=4096
+            )
+            self.assertEqual(rendered, expected)
+        self.assertEqual(framebuf_batch.render_frames([], 96, 64, framebuf2.MONO_VLSB), [])
+
+    def test_background_and_errors(self):
+        """
+        Frames are cleared to bg, and commands outside COMMANDS raise ValueError.
+        """
+        rendered = framebuf_batch.render_frames([[]], 4, 2, framebuf2.GS8, 1, bg=7)
+        self.assertEqual(rendered, [bytes([7] * 8)])
+        with self.assertRaises(ValueError):
+            framebuf_batch.render_frames([[("scroll", (1, 0))]], 8, 8, framebuf2.GS8, 1)
@@ -0,0 +1,167 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+import framebuf_bdf
+
+# a 7 pixel font with a 5 pixel ascent: a space, a narrow "i" and a "g" with a descender.
+BDF = """STARTFONT 2.1
+FONT -test-small
+SIZE 6 75 75
+FONTBOUNDINGBOX 5 7 0 -2
+STARTPROPERTIES 2
+FONT_ASCENT 5
+FONT_DESCENT 2
+ENDPROPERTIES
+CHARS 3
+STARTCHAR space
+ENCODING 32
+DWIDTH 3 0
+BBX 0 0 0 0
+BITMAP
+ENDCHAR
+STARTCHAR i
+ENCODING 105
+DWIDTH 2 0
+BBX 1 5 0 0
+BITMAP
+80
+00
+80
+80
+80
+ENDCHAR
+STARTCHAR g
+ENCODING 103
+DWIDTH 5 0
+BBX 4 5 0 -2
+BITMAP
+70
+90
+70
+10
+E0
+ENDCHAR
+ENDFONT
+"""
+
+
+def builtin_font() -> bytes:
+    """
+    The built-in 8x8 font as a packed font.
+    """
+    table = framebuf2._font_table(0)
+    glyphs = {}
+    for code in range(32, 128):
+        glyphs[code] = (list(table[(code - 32) * 8 : (code - 31) * 8]), 8, 8)
+    return framebuf_bdf.pack_font(8, glyphs, 32, 127, 127)
+
+
+class FrameBufferBdfTestSuite(unittest.TestCase):
+    """
+    Tests for packed fonts and the BDF converter.
+    """
+
+    def test_read_bdf(self):
+        """
+        Glyphs are placed on the font's baseline with their advance widths.
+        """
+        height, glyphs = framebuf_bdf.read_bdf(BDF.splitlines())
+        self.assertEqual(height, 7)
+        self.assertEqual(glyphs[105], ([1, 0, 1, 1, 1, 0, 0], 2, 2))
+        self.assertEqual(glyphs[103], ([0, 0, 14, 9, 14, 8, 7], 5, 5))
+        self.assertEqual(glyphs[32], ([0] * 7, 3, 3))
+        with self.assertRaises(ValueError):
+            framebuf_bdf.read_bdf(["hello"])
+
+    def test_packed_font_sources(self):
+        """
+        A font reads the same from bytes, a file name and an open file.
+        """
+        folder = tempfile.mkdtemp()
+        bdf_path = os.path.join(folder, "small.bdf")
+        font_path = os.path.join(folder, "small.fnt")
+        with open(bdf_path, "w") as f:
+            f.write(BDF)
+        size = framebuf_bdf.convert(bdf_path, font_path)
+        with open(font_path, "rb") as f:
+            data = f.read()
+        self.assertEqual(size, len(data))
+        sources = (data, font_path, open(font_path, "rb"))
+        for source in sources:
+            font = framebuf2.PackedFont(source)
+            self.assertEqual((font.height, font.max_width, font.first, font.count), (7, 5, 32, 95))
+            self.assertEqual(font.glyph("g"), ([0, 0, 14, 9, 14, 8, 7], 5, 7, 5))
+            self.assertEqual(font.advance("i"), 2)
+            # characters not in the font use the default glyph, here the space.
+            self.assertEqual(font.glyph("x"), font.glyph(" "))
+            self.assertEqual(font.glyph("i", 1), ([0b1011100, 0], 7, 2, 2))
+            font.close()
+        with self.assertRaises(ValueError):
+            framebuf2.PackedFont(b"not a font at all")
+
+    def test_draw_with_packed_font(self):
+        """
+        large_text draws packed glyphs at their advance widths, and text wraps by width.
+        """
+        height, glyphs = framebuf_bdf.read_bdf(BDF.splitlines())
+        font = framebuf2.PackedFont(framebuf_bdf.pack_font(height, glyphs))
+        fb = framebuf2.FrameBuffer(bytearray(32 * 16), 32, 16, framebuf2.GS8)
+        fb.set_font(font)
+        fb.large_text("gi", 1, 0, 2, 9)
+        lit = set((x, y) for y in range(16) for x in range(32) if fb.pixel(x, y))
+        self.assertIn((3, 4), lit)
+        self.assertIn((11, 0), lit)
+        self.assertNotIn((11, 2), lit)
+        self.assertEqual(len(lit), 4 * (12 + 4))
+        self.assertEqual(fb.measure_text("ii ii ii", 1, 7), (3, 4, 2 * (7 + 4) + 7))
+        fb.set_font()
+        self.assertEqual(fb.measure_text("ii", 1, 16), (1, 16, 8))
+
+    def test_text_field_packed_font(self):
+        """
+        A text field lays out a proportional packed font by advance width, redrawing the
+        cells after a character whose width changed.
+        """
+        font = framebuf2.PackedFont(framebuf_bdf.pack_font(*framebuf_bdf.read_bdf(BDF.splitlines())))
+        buf = bytearray(32 * 16 // 8)
+        fb = framebuf2.FrameBuffer(buf, 32, 16, framebuf2.MONO_HLSB)
+        fb.set_font(font)
+        field = fb.text_field(0, 0, 1, 3)
+        self.assertEqual(field.set("gig"), 3)
+        self.assertEqual(field.damage(), [(0, 0, 15, 7)])
+        self.assertEqual(field.set("gii"), 1)
+        self.assertEqual(field.damage(), [(7, 0, 5, 7)])
+        self.assertEqual(field.set("iii"), 3)
+        self.assertEqual(field.damage(), [(0, 0, 9, 7)])
+        expected_buf = bytearray(32 * 16 // 8)
+        expected = framebuf2.FrameBuffer(expected_buf, 32, 16, framebuf2.MONO_HLSB)
+        expected.set_font(font)
+        expected.large_text("iii", 0, 0, 1)
+        self.assertEqual(buf, expected_buf)
+        fb.set_font()
+        self.assertEqual(field.set("iii"), 3)
+        self.assertEqual(field.damage(), [(0, 0, 24, 8)])
+
+    def test_builtin_font_packed(self):
+        """
+        The built-in font, packed, draws exactly as the built-in font does.
+        """
+        font = framebuf2.PackedFont(builtin_font())
+        text = "the quick brown fox jumps over the lazy dog"
+        buffers = []
+        for use in (None, font):
+            buf = bytearray(96 * 64 // 8)
+            fb = framebuf2.FrameBuffer(buf, 96, 64, framebuf2.MONO_VLSB)
+            fb.set_font(use)
+            fb.set_clip(2, 3, 90, 58)
+            fb.large_text("Ag~", 70, -3, 2, 1, 90, 180)
+            fb.large_text("Up", 50, 40, 1, 1, 270)
+            fb.large_text_wrap(text, 0, 8, 1, 1, 60)
+            self.assertEqual(fb.large_text_fit(text, 0, 30, 3, 96, 64, 1), 1)
+            buffers.append(buf)
+        self.assertEqual(buffers[0], buffers[1])
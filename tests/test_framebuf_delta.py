@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+import framebuf_delta
+
+
+def unpackbits(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        control = data[i]
+        i += 1
+        if control < 128:
+            out += data[i : i + control + 1]
+            i += control + 1
+        elif control > 128:
+            out += bytes((data[i],)) * (257 - control)
+            i += 1
+    return bytes(out)
+
+
+class FrameBufferDeltaTestSuite(unittest.TestCase):
+    """
+    Tests for the frame-delta encoder and decoder.
+    """
+
+    def test_packbits(self):
+        """
+        PackBits output decodes to its input, and long runs become repeats.
+        """
+        for data in (b"", b"a", b"aab", b"aaab", b"abc" * 60, bytes(300), bytes(range(256))):
+            self.assertEqual(unpackbits(framebuf_delta.packbits(data)), data)
+        self.assertEqual(framebuf_delta.packbits(bytes(300)), b"\x81\x00\x81\x00\xd5\x00")
+
+    def test_delta_stream(self):
+        """
+        Streams fed in chunks of any size keep the receiving buffer equal to the sender's.
+        """
+        rand = random.Random(7)
+        for fmt in (framebuf2.MONO_VLSB, framebuf2.MONO_HLSB, framebuf2.RGB565, framebuf2.GS4_HMSB):
+            size = framebuf2._buffer_bytes(60, 30, fmt)
+            sent = bytearray(size)
+            received = bytearray(rand.getrandbits(8) for _ in range(size))
+            fb = framebuf2.FrameBuffer(sent, 60, 30, fmt)
+            encoder = framebuf_delta.DeltaEncoder(sent, 60, 30, fmt)
+            decoder = framebuf_delta.DeltaDecoder(received, 60, 30, fmt)
+            for frame in range(8):
+                fb.large_text(str(frame * 7), rand.randint(0, 40), rand.randint(0, 20), 2, frame)
+                fb.pixel(rand.randint(0, 59), rand.randint(0, 29), 1)
+                stream = b"".join(encoder.encode())
+                i = 0
+                completed = 0
+                while i < len(stream):
+                    k = rand.choice((1, 2, 5, 64))
+                    completed += decoder.feed(stream[i : i + k])
+                    i += k
+                self.assertEqual(completed, 1)
+                self.assertEqual(received, sent)
+            self.assertEqual(decoder.frames, 8)
+
+    def test_unchanged_frame(self):
+        """
+        An unchanged frame is just the frame header and end marker, until reset() sends it all.
+        """
+        buf = bytearray(128 * 64 // 8)
+        fb = framebuf2.FrameBuffer(buf, 128, 64, framebuf2.MONO_VLSB)
+        encoder = framebuf_delta.DeltaEncoder(buf, 128, 64, framebuf2.MONO_VLSB)
+        fb.large_text("12:34", 4, 30, 3)
+        full = b"".join(encoder.encode())
+        self.assertEqual(len(b"".join(encoder.encode())), 7)
+        fb.large_text("5", 100, 30, 3)
+        self.assertTrue(len(b"".join(encoder.encode())) < len(full) // 3)
+        encoder.reset()
+        received = bytearray(len(buf))
+        framebuf_delta.DeltaDecoder(received, 128, 64, framebuf2.MONO_VLSB).feed(
+            b"".join(encoder.encode())
+        )
+        self.assertEqual(received, buf)
+
+    def test_bad_stream(self):
+        """
+        Streams for another buffer, or not starting with a frame header, raise ValueError.
+        """
+        buf = bytearray(16 * 16 // 8)
+        stream = b"".join(framebuf_delta.DeltaEncoder(buf, 16, 16, framebuf2.MONO_HLSB).encode())
+        with self.assertRaises(ValueError):
+            framebuf_delta.DeltaDecoder(bytearray(32), 8, 32, framebuf2.MONO_HLSB).feed(stream)
+        with self.assertRaises(ValueError):
+            framebuf_delta.DeltaDecoder(buf, 16, 16, framebuf2.MONO_HLSB).feed(b"\x00" * 8)
+        with self.assertRaises(ValueError):
+            framebuf_delta.DeltaDecoder(buf, 16, 16, framebuf2.MONO_HLSB).feed(
+                stream[:5] + b"\x10\x00\x00\x00\x01\x00"
+            )
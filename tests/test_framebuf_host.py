@@ -0,0 +1,245 @@
+import unittest
+import sys
+import os
+import random
+from array import array
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf_host as framebuf
+
+FORMATS = (
+    (framebuf.MONO_VLSB, 1),
+    (framebuf.MONO_HLSB, 1),
+    (framebuf.MONO_HMSB, 1),
+    (framebuf.RGB565, 0xFFFF),
+    (framebuf.GS2_HMSB, 3),
+    (framebuf.GS4_HMSB, 15),
+    (framebuf.GS8, 255),
+)
+
+
+def lit(fb, w, h) -> list:
+    """
+    Returns the rows of fb as strings, with "#" for each set pixel.
+    """
+    return ["".join("#" if fb.pixel(x, y) else "." for x in range(w)) for y in range(h)]
+
+
+class FrameBufferHostTestSuite(unittest.TestCase):
+    """
+    Tests for the pure-Python framebuf reference backend.
+    """
+
+    def test_pixel_layout(self):
+        """
+        Pixels must land in the same bit of the same byte as on MicroPython.
+        """
+        buf = bytearray(8)
+        fb = framebuf.FrameBuffer(buf, 8, 8, framebuf.MONO_VLSB)
+        fb.pixel(1, 2, 1)
+        self.assertEqual(buf[1], 0x04)
+
+        buf = bytearray(2)
+        fb = framebuf.FrameBuffer(buf, 16, 1, framebuf.MONO_HLSB)
+        fb.pixel(0, 0, 1)
+        fb.pixel(9, 0, 1)
+        self.assertEqual(buf, bytearray((0x80, 0x40)))
+
+        buf = bytearray(2)
+        fb = framebuf.FrameBuffer(buf, 16, 1, framebuf.MONO_HMSB)
+        fb.pixel(0, 0, 1)
+        fb.pixel(9, 0, 1)
+        self.assertEqual(buf, bytearray((0x01, 0x02)))
+
+        buf = bytearray(4)
+        fb = framebuf.FrameBuffer(buf, 2, 1, framebuf.RGB565)
+        fb.pixel(1, 0, 0x1234)
+        self.assertEqual(buf, bytearray((0, 0, 0x34, 0x12)))
+
+        buf = bytearray(1)
+        fb = framebuf.FrameBuffer(buf, 2, 1, framebuf.GS4_HMSB)
+        fb.pixel(0, 0, 0xA)
+        fb.pixel(1, 0, 0x5)
+        self.assertEqual(buf[0], 0xA5)
+
+        buf = bytearray(1)
+        fb = framebuf.FrameBuffer(buf, 4, 1, framebuf.GS2_HMSB)
+        fb.pixel(1, 0, 2)
+        self.assertEqual(buf[0], 0x08)
+        self.assertEqual(fb.pixel(1, 0), 2)
+        self.assertIsNone(fb.pixel(4, 0))
+
+    def test_fill_rect_matches_pixels(self):
+        """
+        The byte-level fill_rect fast paths must match drawing every pixel, including clipping.
+        """
+        rnd = random.Random(7)
+        for fmt, max_colour in FORMATS:
+            for trial in range(50):
+                w = rnd.randint(1, 37)
+                h = rnd.randint(1, 21)
+                fast = bytearray(w * h * 2 + 16)
+                slow = bytearray(len(fast))
+                fb_fast = framebuf.FrameBuffer(fast, w, h, fmt)
+                fb_slow = framebuf.FrameBuffer(slow, w, h, fmt)
+                for k in range(4):
+                    x = rnd.randint(-5, w)
+                    y = rnd.randint(-5, h)
+                    rw = rnd.randint(0, w + 5)
+                    rh = rnd.randint(0, h + 5)
+                    c = rnd.randint(0, max_colour)
+                    fb_fast.fill_rect(x, y, rw, rh, c)
+                    for j in range(y, y + rh):
+                        for i in range(x, x + rw):
+                            fb_slow.pixel(i, j, c)
+                self.assertEqual(fast, slow, "format " + str(fmt))
+
+    def test_text(self):
+        """
+        Text is drawn from the built-in font, one column byte at a time.
+        """
+        buf = bytearray(8)
+        fb = framebuf.FrameBuffer(buf, 8, 8, framebuf.MONO_VLSB)
+        fb.text("A", 0, 0, 1)
+        self.assertEqual(bytes(buf), framebuf.FONT_8X8[(65 - 32) * 8 : (66 - 32) * 8])
+        fb.fill(0)
+        fb.text("\x80", 0, 0, 1)
+        self.assertEqual(bytes(buf), framebuf.FONT_8X8[-8:])
+
+    def test_line(self):
+        """
+        Lines include both end points.
+        """
+        buf = bytearray(8 * 8)
+        fb = framebuf.FrameBuffer(buf, 8, 8, framebuf.GS8)
+        fb.line(0, 0, 7, 3, 1)
+        self.assertEqual(fb.pixel(0, 0), 1)
+        self.assertEqual(fb.pixel(7, 3), 1)
+        self.assertEqual(sum(buf), 8)
+
+    def test_ellipse(self):
+        """
+        Ellipses follow MicroPython's midpoint algorithm, including degenerate radii and
+        the quadrant mask.
+        """
+        fb = framebuf.FrameBuffer(bytearray(11 * 7), 11, 7, framebuf.GS8)
+        fb.ellipse(5, 3, 4, 2, 1)
+        outline = [
+            "...........",
+            "...#####...",
+            "..#.....#..",
+            ".#.......#.",
+            "..#.....#..",
+            "...#####...",
+            "...........",
+        ]
+        self.assertEqual(lit(fb, 11, 7), outline)
+        fb.fill(0)
+        fb.ellipse(5, 3, 4, 2, 1, True, 0b0101)
+        self.assertEqual(
+            lit(fb, 11, 7),
+            [
+                "...........",
+                ".....###...",
+                ".....####..",
+                ".#########.",
+                "..####.....",
+                "...###.....",
+                "...........",
+            ],
+        )
+        # the four quadrants together make the whole ellipse.
+        fb.fill(0)
+        for m in (1, 2, 4, 8):
+            fb.ellipse(5, 3, 4, 2, 1, False, m)
+        self.assertEqual(lit(fb, 11, 7), outline)
+        # with a zero radius only the centre and the two ends are drawn, even when filled.
+        fb.fill(0)
+        fb.ellipse(5, 3, 0, 3, 1, True)
+        self.assertEqual(sum(fb.pixel(x, y) for y in range(7) for x in range(11)), 3)
+        self.assertEqual((fb.pixel(5, 0), fb.pixel(5, 3), fb.pixel(5, 6)), (1, 1, 1))
+        fb.fill(0)
+        fb.ellipse(5, 3, 0, 0, 1, False, 0)
+        self.assertEqual(sum(fb.pixel(x, y) for y in range(7) for x in range(11)), 0)
+
+    def test_poly(self):
+        """
+        Polygons are outlined with lines or filled by scan line as on MicroPython.
+        """
+        fb = framebuf.FrameBuffer(bytearray(10 * 8), 10, 8, framebuf.GS8)
+        fb.poly(1, 1, array("h", [0, 0, 8, 0, 8, 6, 4, 2, 0, 6]), 1, True)
+        self.assertEqual(
+            lit(fb, 10, 8),
+            [
+                "..........",
+                ".#########",
+                ".#########",
+                ".#########",
+                ".####.####",
+                ".###...###",
+                ".##.....##",
+                ".#.......#",
+            ],
+        )
+        fb.fill(0)
+        fb.poly(1, 1, array("h", [0, 0, 6, 0, 0, 6, 3]), 1)
+        self.assertEqual(
+            lit(fb, 10, 8),
+            [
+                "..........",
+                ".#######..",
+                ".#....#...",
+                ".#...#....",
+                ".#..#.....",
+                ".#.#......",
+                ".##.......",
+                ".#........",
+            ],
+        )
+        fb.fill(0)
+        fb.poly(0, 0, array("h", [0, 0, 4, 0, 4, 4, 0, 4]), 1, True)
+        self.assertEqual(sum(fb.pixel(x, y) for y in range(8) for x in range(10)), 25)
+        fb.poly(0, 0, array("h"), 1, True)
+
+    def test_scroll(self):
+        """
+        Scrolling moves pixels and leaves the uncovered area unchanged.
+        """
+        buf = bytearray(4 * 4)
+        fb = framebuf.FrameBuffer(buf, 4, 4, framebuf.GS8)
+        fb.pixel(0, 0, 9)
+        fb.scroll(1, 2)
+        self.assertEqual(fb.pixel(1, 2), 9)
+        self.assertEqual(fb.pixel(0, 0), 9)
+
+    def test_blit(self):
+        """
+        Blit honours the transparent key and palette.
+        """
+        src = framebuf.FrameBuffer(bytearray(2), 2, 2, framebuf.GS4_HMSB)
+        src.pixel(0, 0, 1)
+        src.pixel(1, 1, 2)
+        palette = framebuf.FrameBuffer(bytearray(3), 3, 1, framebuf.GS8)
+        palette.pixel(1, 0, 100)
+        palette.pixel(2, 0, 200)
+        dst = framebuf.FrameBuffer(bytearray(9), 3, 3, framebuf.GS8)
+        dst.fill(5)
+        dst.blit(src, 1, 1, 0, palette)
+        self.assertEqual(dst.pixel(1, 1), 100)
+        self.assertEqual(dst.pixel(2, 2), 200)
+        self.assertEqual(dst.pixel(2, 1), 5)
+
+        copy = framebuf.FrameBuffer(bytearray(18), 3, 3, framebuf.RGB565)
+        rgb = framebuf.FrameBuffer(bytearray(8), 2, 2, framebuf.RGB565)
+        rgb.fill(0xBEEF)
+        copy.blit(rgb, 2, -1)
+        self.assertEqual(copy.pixel(2, 0), 0xBEEF)
+        self.assertEqual(copy.pixel(1, 0), 0)
+
+    def test_buffer_too_small(self):
+        """
+        Creating a frame buffer over a short buffer raises ValueError.
+        """
+        with self.assertRaises(ValueError):
+            framebuf.FrameBuffer(bytearray(7), 8, 8, framebuf.MONO_HLSB)
@@ -0,0 +1,162 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import framebuf2
+
+try:
+    import numpy
+    import framebuf_numpy
+except ImportError:
+    numpy = None
+
+FORMATS = (
+    (framebuf2.MONO_VLSB, 1),
+    (framebuf2.MONO_HLSB, 1),
+    (framebuf2.MONO_HMSB, 1),
+    (framebuf2.RGB565, 0xF81F),
+    (framebuf2.GS2_HMSB, 3),
+    (framebuf2.GS4_HMSB, 15),
+    (framebuf2.GS8, 255),
+)
+
+
+def scene(fb, c):
+    fb.fill_rect(3, 4, 20, 9, c)
+    fb.rect(-2, 30, 15, 40, c)
+    fb.line(0, 69, 60, 33, c)
+    fb.line(50, -3, 43, 70, c)
+    fb.text("fb2 ~\x01", 20, 60, c)
+    fb.large_text("Ag", 25, 2, 3, c)
+    fb.large_text("90", 60, 40, 2, c, 90, 180)
+    fb.large_text("Up", 40, 30, 1, c, 270)
+    fb.circle(30, 35, 12, c, True)
+    fb.circle(45, 45, 30, c)
+    fb.ellipse(40, 20, 25, 7, c, True)
+    fb.triangle(-5, 60, 40, 25, 70, 68, c, True)
+    fb.triangle(10, 10, 10, 40, 35, 10, 0, True)
+    fb.scroll(3, -2)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class FrameBufferNumpyTestSuite(unittest.TestCase):
+    """
+    Tests for the NumPy rendering engine.
+    """
+
+    def test_matches_reference(self):
+        """
+        Every format packs to the same bytes as framebuf2 on the reference backend.
+        """
+        for fmt, c in FORMATS:
+            for stride in (None, 70):
+                expected_buf = bytearray(70 * 72 * 2)
+                expected = framebuf2.FrameBuffer(expected_buf, 67, 71, fmt, stride)
+                buf = bytearray(70 * 72 * 2)
+                fb = framebuf_numpy.FrameBuffer(buf, 67, 71, fmt, stride)
+                scene(expected, c)
+                scene(fb, c)
+                self.assertIs(fb.pack(), buf)
+                self.assertEqual(buf, expected_buf)
+                self.assertEqual(fb.pixel(30, 35), expected.pixel(30, 35))
+
+    def test_clip_and_origin(self):
+        """
+        Shapes drawn through a clip rectangle and an origin match the reference.
+        """
+        for setup in (
+            lambda fb: fb.set_clip(5, 8, 40, 30),
+            lambda fb: fb.set_origin(-6, 9),
+        ):
+            expected_buf = bytearray(64 * 64 // 8)
+            expected = framebuf2.FrameBuffer(expected_buf, 64, 64, framebuf2.MONO_VLSB)
+            buf = bytearray(64 * 64 // 8)
+            fb = framebuf_numpy.FrameBuffer(buf, 64, 64, framebuf2.MONO_VLSB)
+            for target in (expected, fb):
+                setup(target)
+                scene(target, 1)
+            fb.pack()
+            self.assertEqual(buf, expected_buf)
+
+    def test_record_and_replay(self):
+        """
+        Drawing is recorded rather than painted while recording, and replays on either
+        engine as the reference draws it.
+        """
+
+        def draw(fb):
+            fb.large_text("Ag", 25, 2, 3, 1)
+            fb.circle(30, 35, 12, 1, True)
+            fb.ellipse(40, 20, 25, 7, 1, True)
+            fb.triangle(-5, 60, 40, 25, 70, 68, 1, True)
+
+        expected_buf = bytearray(70 * 72 // 8)
+        draw(framebuf2.FrameBuffer(expected_buf, 67, 71, framebuf2.MONO_VLSB))
+        buf = bytearray(70 * 72 // 8)
+        fb = framebuf_numpy.FrameBuffer(buf, 67, 71, framebuf2.MONO_VLSB)
+        fb.begin_record()
+        draw(fb)
+        display_list = fb.end_record()
+        self.assertEqual(fb.pixels.sum(), 0)
+        host_buf = bytearray(70 * 72 // 8)
+        display_list.replay(framebuf2.FrameBuffer(host_buf, 67, 71, framebuf2.MONO_VLSB))
+        self.assertEqual(host_buf, expected_buf)
+        display_list.replay(fb)
+        fb.pack()
+        self.assertEqual(buf, expected_buf)
+
+    def test_blit(self):
+        """
+        Blits from tuples and frame buffers, with key colours and palettes, match the reference.
+        """
+        rand = random.Random(5)
+        source = bytearray(rand.getrandbits(8) for _ in range(12 * 9))
+        palette = (bytearray(rand.getrandbits(8) for _ in range(512)), 256, 1, framebuf2.RGB565)
+        for fmt, c in FORMATS:
+            expected_buf = bytearray(32 * 32 * 2)
+            expected = framebuf2.FrameBuffer(expected_buf, 32, 32, fmt)
+            buf = bytearray(32 * 32 * 2)
+            fb = framebuf_numpy.FrameBuffer(buf, 32, 32, fmt)
+            host_source = framebuf2.FrameBuffer(bytearray(source), 12, 9, framebuf2.GS4_HMSB)
+            for target in (expected, fb):
+                target.blit((source, 12, 9, framebuf2.GS8), -3, 25)
+                target.blit(host_source, 20, 2, 3)
+                target.blit((source, 12, 9, framebuf2.GS8), 5, 10, 0x1234, palette)
+            fb.pack()
+            self.assertEqual(buf, expected_buf)
+        copy = framebuf_numpy.FrameBuffer(bytearray(32 * 32 * 2), 32, 32, framebuf2.RGB565)
+        copy.blit(fb, 0, 0)
+        self.assertTrue((copy.pixels == fb.pixels).all())
+
+    def test_unpack(self):
+        """
+        The array starts with the image already in the buffer, and unpack() reads it again.
+        """
+        buf = bytearray(16 * 2)
+        fb = framebuf2.FrameBuffer(buf, 16, 16, framebuf2.MONO_HLSB)
+        fb.text("A", 0, 0, 1)
+        engine = framebuf_numpy.FrameBuffer(buf, 16, 16, framebuf2.MONO_HLSB)
+        self.assertEqual(engine.pixels.sum(), sum(fb.pixel(x, y) for x in range(16) for y in range(16)))
+        fb.fill(0)
+        engine.unpack()
+        self.assertEqual(engine.pixels.sum(), 0)
+
+    def test_to_pnm(self):
+        """
+        Images export as binary PBM, PGM and PPM.
+        """
+        mono = framebuf_numpy.FrameBuffer(bytearray(16 * 2), 10, 2, framebuf2.MONO_VLSB)
+        mono.pixel(0, 0, 1)
+        mono.pixel(9, 1, 1)
+        self.assertEqual(mono.to_pnm(), b"P4\n10 2\n\x80\x00\x00\x40")
+        self.assertEqual(mono.to_pnm(True), b"P4\n10 2\n\x7f\xc0\xff\x80")
+        grey = framebuf_numpy.FrameBuffer(bytearray(4), 2, 2, framebuf2.GS4_HMSB)
+        grey.pixel(1, 1, 15)
+        self.assertEqual(grey.to_pnm(), b"P5\n2 2\n15\n\x00\x00\x00\x0f")
+        colour = framebuf_numpy.FrameBuffer(bytearray(2), 1, 1, framebuf2.RGB565)
+        colour.pixel(0, 0, 0xF800)
+        self.assertEqual(colour.to_pnm(), b"P6\n1 1\n255\n\xff\x00\x00")
+
@@ -11,6 +11,17 @@ class MicroTextWrapperTestSuite(unittest.TestCase):
     Tests for MicroTextWrapper class
     """
 
+    def test_word_wrap_advance(self):
+        """
+        With an advance function lines are wrapped by width, hyphens included.
+        """
+        widths = {"i": 1, "m": 5, " ": 2, "-": 2}
+        wrapper = micro_text_wrapper.MicroTextWrapper()
+        lines = wrapper.wrap_text("iiii mm iiiiiiiiiiii", 10, widths.get)
+        self.assertEqual(lines, ["iiii", "mm", "iiiiiiii-", "iiii"])
+        # a character wider than the line still gets a line of its own.
+        self.assertEqual(wrapper.wrap_text("mm", 3, widths.get), ["m", "m"])
+
     def test_find_word_break(self):
         """
         make sure we can walk backwards in a sentence to find the last word brake position
@@ -103,6 +114,35 @@ class MicroTextWrapperTestSuite(unittest.TestCase):
         self.assertEqual(lines[6],"cannot.")
         self.assertEqual(lines[7],"pronounce")
 
+    def test_wrap_spans(self):
+        """
+        The span generator yields indexes into the original string rather than copies.
+        """
+        test_string = "my little pony has a verylongname"
+        line_len = 9
+        wrapper = micro_text_wrapper.MicroTextWrapper()
+        spans = list(wrapper.wrap_spans(test_string, line_len))
+        self.assertEqual(spans[0], (0, 9, False))
+        self.assertEqual(spans[3], (21, 29, True))
+        self.assertEqual(test_string[spans[4][0]:spans[4][1]], "name")
+
+    def test_wrap_spans_stop_early(self):
+        """
+        Lines are computed on demand, so a consumer can stop after the first few.
+        """
+        wrapper = micro_text_wrapper.MicroTextWrapper()
+        spans = wrapper.wrap_spans("word " * 10000, 10)
+        self.assertEqual(next(spans), (0, 9, False))
+        self.assertEqual(next(spans), (10, 19, False))
+
+    def test_word_wrap_single_char_lines(self):
+        """
+        A line width of one character breaks long words without hyphens instead of looping forever.
+        """
+        wrapper = micro_text_wrapper.MicroTextWrapper()
+        lines = wrapper.wrap_text("abc d", 1)
+        self.assertEqual(lines, ["a", "b", "c", "d"])
+
     def test_word_wrap_blank_lines(self):
         """
         Validates that blank lines in the string are respected in the wrapped output.